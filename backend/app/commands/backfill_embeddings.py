@@ -0,0 +1,304 @@
+"""
+Fill in missing image embeddings (and attribute bitsets) on existing sightings.
+
+create_sighting keeps a report without embeddings when Vertex fails, and
+rows created before two-stage search or per-photo embeddings lack those
+too. This walks active and draft sightings in primary-key order (keyset
+pagination, so it never re-scans what it already did) and, for each chunk:
+
+- embeds the photos that need it, several sightings at a time, through
+  embedding_service (Vertex calls go through the outbound governor, image
+  downloads through the pooled HTTP client);
+- writes image_embedding (and image_embedding_coarse, which only the
+  two_stage search mode reads: filled under VECTOR_SEARCH_MODE=two_stage
+  or with --coarse) with one batched UPDATE that never overwrites an existing value, per-photo embeddings with one
+  batched INSERT, and missing attribute_bits;
+- saves a checkpoint (last id + counters), so the command can be killed
+  and started again where it stopped.
+
+Sightings whose photos still fail are skipped and counted; run again with
+--restart to retry them. Running API instances pick up the new embeddings
+when their search indexes next reload.
+
+Usage:
+    python -m app.commands.backfill_embeddings
+    python -m app.commands.backfill_embeddings --chunk-size 200 --concurrency 16
+    python -m app.commands.backfill_embeddings --restart --dry-run
+    python -m app.commands.backfill_embeddings --coarse
+"""
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from sqlalchemy import bindparam, exists, false, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.config import settings
+from app.database import engine
+from app.models.dog_sighting import DogSighting, DogSightingImageEmbedding
+from app.services.embedding_service import embedding_service
+from app.services.vocabulary_service import vocabulary_service
+
+
+DEFAULT_CHECKPOINT = ".backfill_embeddings.checkpoint.json"
+
+sightings = DogSighting.__table__
+photo_embeddings = DogSightingImageEmbedding.__table__
+
+
+def load_checkpoint(path: str) -> dict:
+    """Saved progress, or a fresh one."""
+    if os.path.exists(path):
+        with open(path) as f:
+            checkpoint = json.load(f)
+        print(f"🔄 Resuming after {checkpoint['last_id']} ({checkpoint['processed']} sightings done)")
+        return checkpoint
+    return {"last_id": None, "processed": 0, "embedded": 0, "photos": 0, "bits": 0, "failed": 0, "seconds": 0.0}
+
+
+def save_checkpoint(path: str, checkpoint: dict) -> None:
+    """Write progress atomically (a kill mid-write keeps the previous file)."""
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(temporary, path)
+
+
+def needs_coarse_filter(coarse: bool):
+    """A missing coarse embedding is only work when coarse embeddings are wanted."""
+    return sightings.c.image_embedding_coarse.is_(None) if coarse else false()
+
+
+def missing_work_filter(coarse: bool):
+    """Rows with anything left to fill."""
+    has_photo_embeddings = exists().where(photo_embeddings.c.sighting_id == sightings.c.id)
+    return or_(
+        sightings.c.image_embedding.is_(None),
+        needs_coarse_filter(coarse),
+        sightings.c.attribute_bits.is_(None),
+        ~has_photo_embeddings,
+    )
+
+
+def fetch_chunk(last_id: Optional[str], chunk_size: int, statuses: List[str], coarse: bool) -> List[dict]:
+    """
+    Next chunk of sightings needing work, after last_id in id order.
+    Only flags are selected, never the vectors themselves.
+    """
+    has_photo_embeddings = exists().where(photo_embeddings.c.sighting_id == sightings.c.id)
+    query = select(
+        sightings.c.id,
+        sightings.c.image_urls,
+        sightings.c.attributes,
+        sightings.c.image_embedding.is_(None).label("needs_full"),
+        needs_coarse_filter(coarse).label("needs_coarse"),
+        sightings.c.attribute_bits.is_(None).label("needs_bits"),
+        (~has_photo_embeddings).label("needs_photos"),
+    ).where(
+        sightings.c.status.in_(statuses),
+        func.cardinality(sightings.c.image_urls) > 0,
+        missing_work_filter(coarse),
+    ).order_by(sightings.c.id).limit(chunk_size)
+
+    if last_id is not None:
+        query = query.where(sightings.c.id > uuid.UUID(last_id))
+
+    with engine.connect() as conn:
+        return [dict(row._mapping) for row in conn.execute(query)]
+
+
+async def embed_sighting(row: dict, semaphore: asyncio.Semaphore) -> Optional[List[Dict[str, Optional[List[float]]]]]:
+    """Embeddings for every photo (coarse for the first), or None if not needed."""
+    if not (row["needs_full"] or row["needs_coarse"] or row["needs_photos"]):
+        return None
+
+    # Only the first photo is needed unless per-photo rows are missing
+    image_urls = row["image_urls"] if row["needs_photos"] else row["image_urls"][:1]
+    async with semaphore:
+        return await embedding_service.generate_image_embeddings(
+            image_urls, include_coarse=row["needs_coarse"]
+        )
+
+
+def write_chunk(rows: List[dict], results: list, dry_run: bool) -> Dict[str, int]:
+    """
+    Batched writes for one chunk, in one transaction.
+
+    Returns:
+        Counters: embedded (sightings that got image_embedding), photos
+        (per-photo rows inserted), bits (attribute_bits filled), failed
+    """
+    vector_updates = []
+    photo_rows = []
+    bits_updates = []
+    failed = 0
+
+    for row, embeddings in zip(rows, results):
+        if row["needs_bits"]:
+            bits_updates.append({
+                "sighting_id": row["id"],
+                "bits": vocabulary_service.encode_attributes(row["attributes"] or []),
+            })
+        if embeddings is None:
+            continue
+        if embeddings[0]["full"] is None:
+            failed += 1
+        elif row["needs_full"] or row["needs_coarse"]:
+            vector_updates.append({
+                "sighting_id": row["id"],
+                "full": embeddings[0]["full"],
+                "coarse": embeddings[0]["coarse"],
+            })
+        if row["needs_photos"]:
+            photo_rows += [
+                {"id": uuid.uuid4(), "sighting_id": row["id"], "position": position, "embedding": photo["full"]}
+                for position, photo in enumerate(embeddings)
+                if photo["full"] is not None
+            ]
+
+    if not dry_run:
+        with engine.begin() as conn:
+            if vector_updates:
+                # COALESCE: a concurrent create/backfill that got there first wins
+                conn.execute(
+                    update(sightings)
+                    .where(sightings.c.id == bindparam("sighting_id"))
+                    .values(
+                        image_embedding=func.coalesce(
+                            sightings.c.image_embedding,
+                            bindparam("full", type_=sightings.c.image_embedding.type)
+                        ),
+                        image_embedding_coarse=func.coalesce(
+                            sightings.c.image_embedding_coarse,
+                            bindparam("coarse", type_=sightings.c.image_embedding_coarse.type)
+                        ),
+                    ),
+                    vector_updates
+                )
+            if photo_rows:
+                # A concurrent backfill may have stored the same photos already
+                conn.execute(
+                    insert(photo_embeddings).on_conflict_do_nothing(
+                        index_elements=[photo_embeddings.c.sighting_id, photo_embeddings.c.position]
+                    ),
+                    photo_rows
+                )
+            if bits_updates:
+                conn.execute(
+                    update(sightings)
+                    .where(sightings.c.id == bindparam("sighting_id"))
+                    .values(attribute_bits=bindparam("bits")),
+                    bits_updates
+                )
+
+    return {
+        "embedded": len(vector_updates),
+        "photos": len(photo_rows),
+        "bits": len(bits_updates),
+        "failed": failed,
+    }
+
+
+async def backfill(
+    chunk_size: int,
+    concurrency: int,
+    statuses: List[str],
+    checkpoint_path: str,
+    restart: bool,
+    dry_run: bool,
+    limit: Optional[int],
+    coarse: bool = False
+) -> dict:
+    """
+    Run the backfill until no rows are left (or limit sightings were processed).
+
+    Args:
+        coarse: Also fill missing image_embedding_coarse values
+
+    Returns:
+        Final checkpoint counters
+    """
+    if restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = load_checkpoint(checkpoint_path)
+
+    vocabulary_service.load()
+    semaphore = asyncio.Semaphore(concurrency)
+    processed_this_run = 0
+
+    while limit is None or processed_this_run < limit:
+        size = chunk_size if limit is None else min(chunk_size, limit - processed_this_run)
+        rows = await asyncio.to_thread(fetch_chunk, checkpoint["last_id"], size, statuses, coarse)
+        if not rows:
+            break
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*[embed_sighting(row, semaphore) for row in rows])
+        counters = await asyncio.to_thread(write_chunk, rows, results, dry_run)
+        seconds = time.perf_counter() - started
+
+        checkpoint["last_id"] = str(rows[-1]["id"])
+        checkpoint["processed"] += len(rows)
+        checkpoint["seconds"] += seconds
+        for name, value in counters.items():
+            checkpoint[name] += value
+        if not dry_run:
+            save_checkpoint(checkpoint_path, checkpoint)
+        processed_this_run += len(rows)
+
+        images = sum(len(result) for result in results if result)
+        print(
+            f"✅ {len(rows)} sightings in {seconds:.1f}s "
+            f"({len(rows) / seconds:.1f} sightings/s, {images / seconds:.1f} images/s): "
+            f"{counters['embedded']} embedded, {counters['photos']} photos, "
+            f"{counters['bits']} bitsets, {counters['failed']} failed"
+        )
+
+    await embedding_service.close()
+    return checkpoint
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=100, help="Sightings per keyset chunk and write batch")
+    parser.add_argument("--concurrency", type=int, default=8, help="Sightings embedded at once")
+    parser.add_argument("--statuses", nargs="+", default=["active", "draft"])
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Progress file used to resume")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from the first id")
+    parser.add_argument("--limit", type=int, help="Stop after this many sightings (this run)")
+    parser.add_argument("--dry-run", action="store_true", help="Embed but write nothing (no checkpoint either)")
+    parser.add_argument(
+        "--coarse",
+        action="store_true",
+        default=settings.vector_search_mode == "two_stage",
+        help="Also fill missing coarse embeddings (default when VECTOR_SEARCH_MODE=two_stage)"
+    )
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    checkpoint = asyncio.run(backfill(
+        chunk_size=args.chunk_size,
+        concurrency=args.concurrency,
+        statuses=args.statuses,
+        checkpoint_path=args.checkpoint,
+        restart=args.restart,
+        dry_run=args.dry_run,
+        limit=args.limit,
+        coarse=args.coarse
+    ))
+    elapsed = time.perf_counter() - started
+
+    rate = checkpoint["processed"] / checkpoint["seconds"] if checkpoint["seconds"] else 0.0
+    print(
+        f"🏁 {checkpoint['processed']} sightings processed ({rate:.1f}/s overall, this run {elapsed:.1f}s): "
+        f"{checkpoint['embedded']} embedded, {checkpoint['photos']} photo embeddings, "
+        f"{checkpoint['bits']} bitsets, {checkpoint['failed']} failed"
+    )
+
+
+if __name__ == "__main__":
+    main()
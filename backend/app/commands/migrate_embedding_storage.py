@@ -0,0 +1,115 @@
+"""
+Convert stored image embeddings between vector (float32) and halfvec (float16).
+
+Rewrites dog_sightings.image_embedding and the per-photo
+dog_sighting_image_embeddings.embedding in place with a cast and rebuilds their
+HNSW indexes with the matching operator class. Run it before changing
+EMBEDDING_STORAGE.
+
+Also resizes the columns to settings.embedding_dimension after switching
+EMBEDDING_BACKEND. Vectors from another model cannot be converted, so in
+that case the stored embeddings (full, coarse and per-photo) are cleared;
+refill them with python -m app.commands.backfill_embeddings.
+
+Usage:
+    python -m app.commands.migrate_embedding_storage --to halfvec
+    python -m app.commands.migrate_embedding_storage --to vector
+    EMBEDDING_BACKEND=local python -m app.commands.migrate_embedding_storage --to vector
+"""
+import argparse
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import engine
+
+
+EMBEDDING_DIMENSION = settings.embedding_dimension
+# (table, column, HNSW index name)
+EMBEDDING_COLUMNS = [
+    ("dog_sightings", "image_embedding", "ix_dog_sightings_image_embedding_hnsw"),
+    ("dog_sighting_image_embeddings", "embedding", "ix_dog_sighting_image_embeddings_embedding_hnsw"),
+]
+
+
+def current_column_type(conn) -> tuple:
+    """Return the current column type name ("vector" or "halfvec") and dimension."""
+    column_type = conn.execute(text("""
+        SELECT format_type(atttypid, atttypmod)
+        FROM pg_attribute
+        WHERE attrelid = 'dog_sightings'::regclass AND attname = 'image_embedding'
+    """)).scalar()
+    name, _, dimension = column_type.partition("(")
+    return name, int(dimension.rstrip(")")) if dimension else None
+
+
+def table_sizes(conn) -> dict:
+    """Table (with TOAST) and HNSW index sizes in bytes, summed over both tables."""
+    sizes = {"table": 0, "index": 0}
+    for table, _, index_name in EMBEDDING_COLUMNS:
+        sizes["table"] += conn.execute(text("SELECT pg_table_size(:table)"), {"table": table}).scalar()
+        sizes["index"] += conn.execute(
+            text("SELECT COALESCE(pg_relation_size(to_regclass(:name)), 0)"),
+            {"name": index_name}
+        ).scalar()
+    return sizes
+
+
+def migrate(target: str) -> None:
+    """
+    Change the embedding column types and rebuild their HNSW indexes.
+
+    Args:
+        target: "vector" or "halfvec"
+    """
+    with engine.begin() as conn:
+        current, dimension = current_column_type(conn)
+        if current == target and dimension == EMBEDDING_DIMENSION:
+            print(f"✅ image_embedding is already {target}({EMBEDDING_DIMENSION}), nothing to do")
+            return
+
+        before = table_sizes(conn)
+        for _, _, index_name in EMBEDDING_COLUMNS:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+
+        if dimension == EMBEDDING_DIMENSION:
+            print(f"🔄 Converting image_embedding: {current} -> {target}...")
+        else:
+            print(
+                f"🔄 Resizing image_embedding: {current}({dimension}) -> {target}({EMBEDDING_DIMENSION}), "
+                f"clearing embeddings from the previous backend..."
+            )
+            conn.execute(text("DELETE FROM dog_sighting_image_embeddings"))
+            conn.execute(text("UPDATE dog_sightings SET image_embedding_coarse = NULL"))
+
+        for table, column, _ in EMBEDDING_COLUMNS:
+            cast = f"{column}::{target}({EMBEDDING_DIMENSION})" if dimension == EMBEDDING_DIMENSION else "NULL"
+            conn.execute(text(
+                f"ALTER TABLE {table} ALTER COLUMN {column} "
+                f"TYPE {target}({EMBEDDING_DIMENSION}) "
+                f"USING {cast}"
+            ))
+
+        print("🔄 Rebuilding HNSW indexes...")
+        for table, column, index_name in EMBEDDING_COLUMNS:
+            conn.execute(text(
+                f"CREATE INDEX {index_name} ON {table} "
+                f"USING hnsw ({column} {target}_cosine_ops) "
+                f"WITH (m = {settings.hnsw_m}, ef_construction = {settings.hnsw_ef_construction})"
+            ))
+
+        after = table_sizes(conn)
+
+    for name in ("table", "index"):
+        print(f"📦 {name}: {before[name] / 1024 / 1024:.1f} MB -> {after[name] / 1024 / 1024:.1f} MB")
+
+    if settings.embedding_storage != target:
+        print(f"⚠️  Set EMBEDDING_STORAGE={target} before restarting the API")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--to", choices=["vector", "halfvec"], default="halfvec")
+    args = parser.parse_args()
+
+    migrate(args.to)
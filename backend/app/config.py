@@ -5,6 +5,9 @@ Reads from .env file automatically.
 from typing import List
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+# Output size of Vertex AI multimodalembedding@001
+VERTEX_EMBEDDING_DIMENSION = 1408
+
 
 class Settings(BaseSettings):
     """Application settings loaded from environment variables."""
@@ -20,6 +23,44 @@ class Settings(BaseSettings):
     # LLM
     google_api_key: str
     gemini_model: str = "gemini-1.5-flash"
+    # Per-call Gemini timeout (including time queued) and max in-flight calls
+    llm_timeout_seconds: float = 30.0
+    llm_max_concurrency: int = 8
+    # Outbound governor (app/services/outbound_governor.py): requests per
+    # second and burst per provider, Vertex concurrency cap (Gemini uses
+    # llm_max_concurrency), queued callers before 503, retries on 429
+    gemini_rate_per_second: float = 10.0
+    gemini_burst: int = 20
+    vertex_rate_per_second: float = 10.0
+    vertex_burst: int = 20
+    vertex_max_concurrency: int = 16
+    outbound_max_queue: int = 200
+    outbound_max_retries: int = 3
+    outbound_retry_base_seconds: float = 0.5
+    # Image downloads for URL embedding sources (pooled, keep-alive)
+    http_timeout_seconds: float = 30.0
+    http_max_connections: int = 32
+    http_keepalive_seconds: float = 30.0
+    http_max_concurrent_fetches: int = 16
+    http_max_download_mb: float = 10.0
+    # Offline extractor for text-only searches: used when it understands at
+    # least this share of the description's content words; a sample of its
+    # answers is re-checked against Gemini in the background
+    local_extractor_enabled: bool = True
+    local_extractor_min_coverage: float = 0.8
+    local_extractor_shadow_rate: float = 0.05
+    # Description -> attributes cache (in-process tier; the database tier is unbounded)
+    description_cache_max_entries: int = 5000
+    description_cache_ttl_seconds: int = 86400
+    # Gemini results / embeddings keyed by image SHA-256 (entries per cache)
+    image_cache_max_entries: int = 2000
+    image_cache_ttl_seconds: int = 3600
+    # Uploads are oriented, stripped of metadata, downsized to this long edge
+    # and re-encoded ("JPEG" or "WEBP") before GCS, Gemini and Vertex see them
+    image_preprocessing_enabled: bool = True
+    image_max_edge_px: int = 1024
+    image_output_format: str = "JPEG"
+    image_quality: int = 85
     
     # Geocoding (optional)
     mapbox_api_key: str | None = None
@@ -29,12 +70,69 @@ class Settings(BaseSettings):
     environment: str = "development"
     debug: bool = True
     cors_origins: str = "http://localhost:3000"
-    
+    # Client warm-up at startup (Gemini, GCS, embedding backend, search
+    # indexes): "background" = serve as soon as the database is ready and warm
+    # up concurrently, "blocking" = warm up everything (concurrently) before
+    # serving, "lazy" = create each client on its first use
+    startup_warmup: str = "background"
+
     # Limits
     max_images_per_sighting: int = 3
     max_image_size_mb: int = 5
     search_radius_km: int = 10
     min_match_score: float = 0.3
+
+    # Vector search
+    # "ann" = pgvector HNSW index, "memory" = in-process NumPy index,
+    # "two_stage" = in-process coarse index + full-vector re-scoring,
+    # "exact" = full scan with Python cosine similarity
+    vector_search_mode: str = "ann"
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 64
+    hnsw_ef_search: int = 40
+    # Radius-filtered HNSW searches: "relaxed_order" / "strict_order" keep
+    # scanning the graph until enough rows pass the filter (pgvector >= 0.8,
+    # at most hnsw_max_scan_tuples rows); "off", or an older pgvector, orders
+    # radius searches exactly in SQL over the bounding box instead
+    hnsw_iterative_scan: str = "relaxed_order"
+    hnsw_max_scan_tuples: int = 20000
+    # Embedding backend (app/services/embedding_backends.py): "vertex", or
+    # "local" for an ONNX image encoder on CPU (needs onnxruntime). The
+    # backend's dimension sizes the vector columns: after switching, run
+    # migrate_embedding_storage and then backfill_embeddings.
+    embedding_backend: str = "vertex"
+    local_embedding_model_path: str | None = None
+    local_embedding_dimension: int = 512
+    local_embedding_image_size: int = 224
+    local_embedding_batch_size: int = 16
+    local_embedding_batch_wait_ms: float = 5.0
+    local_embedding_workers: int = 2
+    local_embedding_threads: int = 2
+    # Embedding storage: "vector" (float32) or "halfvec" (float16, half the table and
+    # HNSW index size). Switch with: python -m app.commands.migrate_embedding_storage
+    embedding_storage: str = "vector"
+    # In-memory index matrix: "float32", "float16" or "int8" (scalar quantized).
+    # Memory options, not speed-ups: NumPy upcasts float16/int8 to float32 on
+    # every query, so int8 scores at roughly float32 speed with 1/4 of the
+    # memory and float16 is several times slower with 1/2
+    embedding_index_dtype: str = "float32"
+    # Candidates fetched from a less precise index than storage (int8, or
+    # float16 over "vector" storage); those near the top-k cut-off are
+    # re-scored against the stored vectors
+    rescore_pool_size: int = 100
+    # Two-stage search: short embedding (128/256/512) scanned first, then the
+    # best coarse_candidate_pool candidates are re-scored with the full vector
+    coarse_embedding_dimension: int = 256
+    coarse_candidate_pool: int = 300
+    # "index" = in-memory inverted attribute index, "scan" = Jaccard against every active row
+    attribute_search_mode: str = "index"
+    # Full reload interval for in-memory indexes (picks up other instances' writes)
+    search_index_ttl_seconds: int = 300
+    # Search result cache (entries are also dropped when a sighting is written
+    # inside their radius); geo precision 3 decimals = ~110 m cells
+    search_cache_max_entries: int = 1000
+    search_cache_ttl_seconds: int = 300
+    search_cache_geo_precision: int = 3
     
     # Security (optional)
     secret_key: str = "dev-secret-key-change-in-production"
@@ -53,6 +151,13 @@ class Settings(BaseSettings):
         """Parse CORS origins from comma-separated string."""
         return [origin.strip() for origin in self.cors_origins.split(",")]
     
+    @property
+    def embedding_dimension(self) -> int:
+        """Dimension of the configured embedding backend (size of the vector columns)."""
+        if self.embedding_backend == "local":
+            return self.local_embedding_dimension
+        return VERTEX_EMBEDDING_DIMENSION
+    
     @property
     def is_production(self) -> bool:
         """Check if running in production environment."""
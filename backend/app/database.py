@@ -2,7 +2,7 @@
 Database configuration and session management.
 Supports both Cloud SQL (production) and local PostgreSQL (development).
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from typing import Generator
@@ -47,5 +47,39 @@ def init_db() -> None:
     """
     Initialize database - create all tables.
     Call this on application startup.
+
+    Also adds nullable columns and creates indexes declared on a model that
+    are missing from an existing table (create_all only builds new tables),
+    e.g. the HNSW index on dog_sightings.image_embedding.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+
+    Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def _add_missing_columns() -> None:
+    """
+    Add nullable model columns missing from existing tables.
+    Non-nullable columns need a real migration and are left alone.
     """
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    inspector = inspect(engine)
+
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(
+                    f"ALTER TABLE {table.name} ADD COLUMN IF NOT EXISTS {column.name} {column_type}"
+                ))
+                print(f"🗄️  Added column {table.name}.{column.name} ({column_type})")
@@ -0,0 +1,21 @@
+"""
+Attribute vocabulary model - canonical integer ids for LLM attribute tokens.
+"""
+from sqlalchemy import Column, Integer, Text, DateTime, func
+
+from app.database import Base
+
+
+class AttributeToken(Base):
+    """
+    One attribute token (e.g. "pastor_aleman", "pelo_largo").
+    The id is the token's bit position in DogSighting.attribute_bits.
+    """
+    __tablename__ = "attribute_vocabulary"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    token = Column(Text, nullable=False, unique=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<AttributeToken(id={self.id}, token={self.token})>"
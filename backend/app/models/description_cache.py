@@ -0,0 +1,25 @@
+"""
+Description cache model - persisted Gemini attribute extractions for search text.
+"""
+from sqlalchemy import Column, String, Text, DateTime, func
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.database import Base
+
+
+class DescriptionAttributeCache(Base):
+    """
+    Attributes Gemini extracted from a normalized search description.
+    Rows written under an older prompt/model version are never read again.
+    """
+    __tablename__ = "description_attribute_cache"
+
+    # sha256(prompt_version + normalized description)
+    key = Column(String(64), primary_key=True)
+    prompt_version = Column(String(64), nullable=False, index=True)
+    description = Column(Text, nullable=False)
+    attributes = Column(JSONB, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<DescriptionAttributeCache(description={self.description}, attributes={self.attributes})>"
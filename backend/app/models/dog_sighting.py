@@ -1,14 +1,23 @@
 """
 Dog Sighting model - represents a found dog report.
 """
-from sqlalchemy import Column, String, Text, ARRAY, Float, DateTime, func
+from sqlalchemy import Column, String, Text, ARRAY, Float, DateTime, Index, Integer, ForeignKey, LargeBinary, func, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
-from pgvector.sqlalchemy import Vector
+from sqlalchemy.orm import deferred, relationship
+from pgvector.sqlalchemy import Vector, HALFVEC
 import uuid
 
+from app.config import settings
 from app.database import Base
 
 
+# Column type for image embeddings, see settings.embedding_storage
+EMBEDDING_TYPES = {
+    "vector": Vector,
+    "halfvec": HALFVEC,
+}
+
+
 class DogSighting(Base):
     """
     Represents a report of a found dog.
@@ -28,8 +37,25 @@ class DogSighting(Base):
     # Example: ["labrador", "amarillo", "grande", "adulto", "collar_rojo"]
     attributes = Column(JSONB, nullable=False)
 
-    # Image embedding for similarity search (1408 dimensions for Vertex AI)
-    image_embedding = Column(Vector(1408), nullable=True)
+    # Same attributes as a little-endian bitset over attribute_vocabulary ids
+    # (bit i set = token id i present), for popcount Jaccard
+    attribute_bits = Column(LargeBinary, nullable=True)
+
+    # Image embedding for similarity search (settings.embedding_dimension,
+    # 1408 for Vertex AI). Deferred: ~5.6 KB per row at 1408-d and only vector
+    # search needs it. Load it with undefer(DogSighting.image_embedding) or by
+    # selecting the column explicitly.
+    image_embedding = deferred(Column(EMBEDDING_TYPES[settings.embedding_storage](settings.embedding_dimension), nullable=True))
+
+    # Short embedding from the same model for the first pass of two-stage search
+    image_embedding_coarse = deferred(Column(Vector(settings.coarse_embedding_dimension), nullable=True))
+
+    # One embedding per photo (image_embedding above is the first photo's)
+    image_embeddings = relationship(
+        "DogSightingImageEmbedding",
+        order_by="DogSightingImageEmbedding.position",
+        cascade="all, delete-orphan",
+    )
 
     # Location
     latitude = Column(Float, nullable=True)
@@ -54,5 +80,73 @@ class DogSighting(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    __table_args__ = (
+        # Approximate nearest neighbour index for cosine distance (<=>) searches
+        Index(
+            "ix_dog_sightings_image_embedding_hnsw",
+            "image_embedding",
+            postgresql_using="hnsw",
+            postgresql_with={
+                "m": settings.hnsw_m,
+                "ef_construction": settings.hnsw_ef_construction,
+            },
+            postgresql_ops={"image_embedding": f"{settings.embedding_storage}_cosine_ops"},
+        ),
+        # Bounding-box prefilter for radius searches over active sightings
+        Index(
+            "ix_dog_sightings_active_location",
+            "latitude",
+            "longitude",
+            postgresql_where=text("status = 'active'"),
+        ),
+    )
+
+    def __repr__(self):
+        return f"<DogSighting(id={self.id}, attributes={self.attributes}, status={self.status})>"
+
+
+class DogSightingImageEmbedding(Base):
+    """
+    Embedding of one photo of a sighting, used for max-similarity search
+    across all reported photos.
+    """
+    __tablename__ = "dog_sighting_image_embeddings"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    sighting_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("dog_sightings.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+
+    # Index into DogSighting.image_urls
+    position = Column(Integer, nullable=False)
+    embedding = Column(EMBEDDING_TYPES[settings.embedding_storage](settings.embedding_dimension), nullable=False)
+
+    __table_args__ = (
+        # One row per photo, so concurrent backfills cannot duplicate them. A
+        # unique index rather than a constraint: init_db also builds it on
+        # existing tables, and ON CONFLICT (sighting_id, position) infers it.
+        Index(
+            "uq_dog_sighting_image_embeddings_sighting_position",
+            "sighting_id",
+            "position",
+            unique=True,
+        ),
+        # Approximate nearest neighbour index over every photo, so ANN searches
+        # match any photo of a sighting rather than only the first one
+        Index(
+            "ix_dog_sighting_image_embeddings_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={
+                "m": settings.hnsw_m,
+                "ef_construction": settings.hnsw_ef_construction,
+            },
+            postgresql_ops={"embedding": f"{settings.embedding_storage}_cosine_ops"},
+        ),
+    )
+
     def __repr__(self):
-        return f"<DogSighting(id={self.id}, attributes={self.attributes}, status={self.status})>"
\ No newline at end of file
+        return f"<DogSightingImageEmbedding(sighting_id={self.sighting_id}, position={self.position})>"
@@ -0,0 +1,444 @@
+"""
+In-memory inverted attribute index for Jaccard search.
+Maps each attribute token id to the sightings that have it, so a search only
+touches sightings sharing at least one attribute with the query. Candidates
+are verified in one vectorized popcount over packed attribute bitsets.
+
+Radius searches can instead start from a coarse location grid (rows per
+cell) when the cells around the search point hold fewer rows than the
+attribute postings, so a small radius is not paid for with city-wide postings.
+"""
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+import itertools
+import math
+import threading
+import time
+import uuid
+import numpy as np
+
+from app.models.dog_sighting import DogSighting
+from app.services.embedding_index import EARTH_RADIUS_KM, haversine_km
+from app.services.vocabulary_service import vocabulary_service
+
+WORD_BITS = 64
+# Location grid cell size (~1.1 km of latitude)
+CELL_DEGREES = 0.01
+# Slack when dropping cells outside a radius: the clamped corner is only
+# approximately the cell's nearest point on the sphere
+CELL_DISTANCE_MARGIN = 1.01
+
+# Grid cell of a location; None holds sightings without coordinates
+Cell = Optional[Tuple[int, int]]
+
+
+def _cell(latitude: float, longitude: float) -> Cell:
+    """Grid cell containing a location (None if it is unknown)."""
+    if latitude is None or longitude is None or math.isnan(latitude) or math.isnan(longitude):
+        return None
+    return math.floor(latitude / CELL_DEGREES), math.floor(longitude / CELL_DEGREES)
+
+
+def _bounding_box(latitude: float, radius_km: float) -> Tuple[float, float]:
+    """
+    Half-height and half-width in degrees of the box around a radius, exact
+    on the sphere haversine_km uses, so the box never cuts into the circle.
+    """
+    angle = radius_km / EARTH_RADIUS_KM
+    lat_delta = math.degrees(angle)
+    lon_delta = math.degrees(math.asin(min(1.0, math.sin(angle) / max(math.cos(math.radians(latitude)), 0.01))))
+    return lat_delta, lon_delta
+
+
+class AttributeIndex:
+    """
+    Token id → posting list (set of rows), plus one bitset row per sighting and
+    a location grid (cell → set of rows).
+    """
+
+    def __init__(self, initial_capacity: int = 1024, initial_words: int = 4):
+        # Reentrant: writes made during a load are replayed while holding it
+        self._lock = threading.RLock()
+        self._postings: Dict[int, Set[int]] = {}
+        self._cells: Dict[Cell, Set[int]] = {}
+        self._rows: Dict[uuid.UUID, int] = {}
+        self._ids: List[uuid.UUID] = []
+        self._bits = np.zeros((initial_capacity, initial_words), dtype=np.uint64)
+        self._sizes = np.zeros(initial_capacity, dtype=np.int32)
+        self._latitudes = np.full(initial_capacity, np.nan)
+        self._longitudes = np.full(initial_capacity, np.nan)
+        self.loaded_at: Optional[float] = None
+        # Upserts/removals made while load() builds new contents, replayed on them
+        self._journal: Optional[list] = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def loaded(self) -> bool:
+        """True once the index has been filled from the database."""
+        return self.loaded_at is not None
+
+    def is_stale(self, ttl_seconds: int) -> bool:
+        """
+        Check whether the index should be reloaded from the database.
+
+        Writes handled by other instances are only picked up on reload.
+        """
+        return not self.loaded or time.monotonic() - self.loaded_at > ttl_seconds
+
+    def _reserve(self, rows: int, max_token_id: int) -> None:
+        """Grow storage to hold `rows` rows and token ids up to max_token_id. Caller holds the lock."""
+        capacity, words = self._bits.shape
+        needed_words = max(words, max_token_id // WORD_BITS + 1)
+        if rows <= capacity and needed_words == words:
+            return
+
+        new_capacity = max(capacity, rows)
+        if rows > capacity:
+            new_capacity = max(rows, capacity * 2)
+
+        bits = np.zeros((new_capacity, needed_words), dtype=np.uint64)
+        bits[:len(self), :words] = self._bits[:len(self)]
+        self._bits = bits
+
+        if new_capacity > capacity:
+            self._sizes = np.resize(self._sizes, new_capacity)
+            self._latitudes = np.resize(self._latitudes, new_capacity)
+            self._longitudes = np.resize(self._longitudes, new_capacity)
+
+    def upsert(
+        self,
+        sighting_id: uuid.UUID,
+        token_ids: Optional[Iterable[int]],
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None
+    ) -> None:
+        """
+        Add or replace a sighting in the index.
+
+        Args:
+            sighting_id: DogSighting id
+            token_ids: Vocabulary ids of the sighting's attributes
+            latitude, longitude: Optional sighting location
+        """
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((self.upsert, (sighting_id, token_ids, latitude, longitude)))
+
+        token_set = set(token_ids or [])
+        if not token_set:
+            self.remove(sighting_id)
+            return
+
+        with self._lock:
+            self._remove_postings(sighting_id)
+            row = self._rows.get(sighting_id)
+            if row is None:
+                row = len(self._ids)
+                self._reserve(row + 1, max(token_set))
+                self._ids.append(sighting_id)
+                self._rows[sighting_id] = row
+            else:
+                self._reserve(len(self._ids), max(token_set))
+                self._remove_cell(row)
+
+            self._bits[row] = 0
+            for token_id in token_set:
+                self._bits[row, token_id // WORD_BITS] |= np.uint64(1 << (token_id % WORD_BITS))
+                self._postings.setdefault(token_id, set()).add(row)
+            self._sizes[row] = len(token_set)
+            self._latitudes[row] = latitude if latitude is not None else np.nan
+            self._longitudes[row] = longitude if longitude is not None else np.nan
+            self._cells.setdefault(_cell(latitude, longitude), set()).add(row)
+
+    def remove(self, sighting_id: uuid.UUID) -> None:
+        """Remove a sighting from the index (no-op if absent)."""
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((self.remove, (sighting_id,)))
+
+            row = self._rows.get(sighting_id)
+            if row is None:
+                return
+            self._remove_postings(sighting_id)
+            self._remove_cell(row)
+
+            # Move the last row into the freed slot
+            last = len(self._ids) - 1
+            if row != last:
+                for token_id in self._row_token_ids(last):
+                    posting = self._postings[token_id]
+                    posting.discard(last)
+                    posting.add(row)
+                self._remove_cell(last)
+                self._cells.setdefault(
+                    _cell(self._latitudes[last], self._longitudes[last]), set()
+                ).add(row)
+                moved_id = self._ids[last]
+                self._ids[row] = moved_id
+                self._rows[moved_id] = row
+                self._bits[row] = self._bits[last]
+                self._sizes[row] = self._sizes[last]
+                self._latitudes[row] = self._latitudes[last]
+                self._longitudes[row] = self._longitudes[last]
+
+            self._ids.pop()
+            del self._rows[sighting_id]
+
+    def _remove_postings(self, sighting_id: uuid.UUID) -> None:
+        """Drop a sighting from every posting list. Caller holds the lock."""
+        row = self._rows.get(sighting_id)
+        if row is None:
+            return
+        for token_id in self._row_token_ids(row):
+            posting = self._postings.get(token_id)
+            if posting is None:
+                continue
+            posting.discard(row)
+            if not posting:
+                del self._postings[token_id]
+
+    def _remove_cell(self, row: int) -> None:
+        """Drop a row from its grid cell. Caller holds the lock."""
+        cell = _cell(self._latitudes[row], self._longitudes[row])
+        rows = self._cells.get(cell)
+        if rows is None:
+            return
+        rows.discard(row)
+        if not rows:
+            del self._cells[cell]
+
+    def _cells_within(self, latitude: float, longitude: float, radius_km: float) -> List[Cell]:
+        """
+        Occupied grid cells that can hold rows inside the radius (their nearest
+        point is within it), plus the cell of sightings without coordinates.
+        Caller holds the lock.
+        """
+        lat_delta, lon_delta = _bounding_box(latitude, radius_km)
+        lat_cells = range(
+            math.floor((latitude - lat_delta) / CELL_DEGREES),
+            math.floor((latitude + lat_delta) / CELL_DEGREES) + 1
+        )
+        lon_cells = range(
+            math.floor((longitude - lon_delta) / CELL_DEGREES),
+            math.floor((longitude + lon_delta) / CELL_DEGREES) + 1
+        )
+        if len(lat_cells) * len(lon_cells) > len(self._cells):
+            cells = [
+                cell for cell in self._cells
+                if cell is not None and cell[0] in lat_cells and cell[1] in lon_cells
+            ]
+        else:
+            cells = [cell for cell in itertools.product(lat_cells, lon_cells) if cell in self._cells]
+
+        if cells:
+            corners = np.array(cells, dtype=np.float64) * CELL_DEGREES
+            nearest_latitudes = np.clip(latitude, corners[:, 0], corners[:, 0] + CELL_DEGREES)
+            nearest_longitudes = np.clip(longitude, corners[:, 1], corners[:, 1] + CELL_DEGREES)
+            distances = haversine_km(latitude, longitude, nearest_latitudes, nearest_longitudes)
+            cells = [cell for cell, near in zip(cells, (distances <= radius_km * CELL_DISTANCE_MARGIN).tolist()) if near]
+        return cells + [None]
+
+    def _row_token_ids(self, row: int) -> List[int]:
+        """Token ids set in a row's bitset."""
+        bits = np.unpackbits(self._bits[row].astype("<u8").view(np.uint8), bitorder="little")
+        return np.flatnonzero(bits).tolist()
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._postings.clear()
+            self._cells.clear()
+            self._rows.clear()
+            self._ids.clear()
+
+    def load(self, db: Session, batch_size: int = 1000) -> int:
+        """
+        Rebuild the index from all active sightings.
+
+        Sightings stored before attribute_bits existed are encoded from their
+        attribute list, interning any tokens the vocabulary has not seen.
+        The new contents are built in a separate index and swapped in under
+        the lock, so concurrent searches never see a half-built index; writes
+        made during the load are replayed on the new contents.
+
+        Args:
+            db: Database session
+            batch_size: Rows fetched per round trip
+
+        Returns:
+            int: Number of indexed sightings
+        """
+        staging = AttributeIndex(initial_capacity=max(len(self), 1024), initial_words=self._bits.shape[1])
+        with self._lock:
+            self._journal = []
+        try:
+            rows = db.query(
+                DogSighting.id,
+                DogSighting.attributes,
+                DogSighting.attribute_bits,
+                DogSighting.latitude,
+                DogSighting.longitude
+            ).filter(
+                DogSighting.status == "active"
+            ).yield_per(batch_size)
+
+            rows = iter(rows)
+            while batch := list(itertools.islice(rows, batch_size)):
+                # Intern the batch's legacy tokens in one round trip
+                legacy_tokens = {
+                    token
+                    for _, attributes, attribute_bits, _, _ in batch
+                    if attribute_bits is None
+                    for token in attributes or []
+                }
+                if legacy_tokens:
+                    vocabulary_service.intern(legacy_tokens)
+
+                for sighting_id, attributes, attribute_bits, latitude, longitude in batch:
+                    if attribute_bits is not None:
+                        token_ids = vocabulary_service.decode(attribute_bits)
+                    else:
+                        token_ids = vocabulary_service.intern(attributes)
+                    staging.upsert(sighting_id, token_ids, latitude, longitude)
+        except BaseException:
+            with self._lock:
+                self._journal = None
+            raise
+
+        with self._lock:
+            journal, self._journal = self._journal, None
+            self._postings = staging._postings
+            self._cells = staging._cells
+            self._rows = staging._rows
+            self._ids = staging._ids
+            self._bits = staging._bits
+            self._sizes = staging._sizes
+            self._latitudes = staging._latitudes
+            self._longitudes = staging._longitudes
+            for write, args in journal:
+                write(*args)
+            self.loaded_at = time.monotonic()
+
+        print(f"🧠 Attribute index loaded: {len(self)} sightings, {len(self._postings)} attributes")
+        return len(self)
+
+    def search(
+        self,
+        token_ids: Iterable[int],
+        min_score: float,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        radius_km: Optional[float] = None,
+        unknown_tokens: int = 0,
+        stats: Optional[dict] = None
+    ) -> List[Tuple[uuid.UUID, float, Optional[float]]]:
+        """
+        Find sightings whose Jaccard similarity with the query reaches min_score.
+
+        Uses prefix filtering: a candidate needs an overlap of at least
+        ceil(min_score * |Q|), so it must share one of the |Q| - overlap + 1
+        rarest query attributes. Only those postings are enumerated, or, for
+        a radius search whose grid cells hold fewer rows, the rows of those
+        cells. The radius filter (bounding box, then exact Haversine) drops
+        distant candidates, and the rest are scored together with
+        popcount(AND) / popcount(OR) over their bitsets, with size and
+        overlap filtering dropping unreachable ones.
+
+        Args:
+            token_ids: Vocabulary ids of the query attributes
+            min_score: Minimum Jaccard similarity (0 disables pruning)
+            latitude, longitude: Optional search point; sightings without
+                coordinates are never excluded by the radius filter
+            radius_km: Radius for location filtering
+            unknown_tokens: Query attributes missing from the vocabulary; no
+                sighting has them, so they only enlarge the union
+            stats: Optional dict that receives "candidates", the number of
+                sightings enumerated from the postings or grid cells, and
+                "source" ("postings" or "cells"), for benchmarks
+
+        Returns:
+            List of tuples: (sighting_id, jaccard_score, distance_km), unsorted
+        """
+        query = set(token_ids or [])
+        query_size = len(query) + unknown_tokens
+        if stats is not None:
+            stats["candidates"] = 0
+        if not query:
+            return []
+
+        with self._lock:
+            # Rarest attributes first so the prefix enumerates the fewest postings
+            ordered = sorted(query, key=lambda token_id: len(self._postings.get(token_id, ())))
+            # Unknown tokens have empty postings, so they always lead the prefix
+            ordered = [None] * unknown_tokens + ordered
+
+            if min_score > 0:
+                # Epsilon guards against float error, e.g. 0.3 * 10 == 3.0000000000000004
+                min_overlap = max(1, math.ceil(min_score * query_size - 1e-9))
+                min_size = min_score * query_size - 1e-9
+                max_size = query_size / min_score + 1e-9
+            else:
+                min_overlap, min_size, max_size = 1, 0, math.inf
+
+            if min_overlap > query_size:
+                return []
+
+            prefix = [
+                self._postings.get(token_id, ())
+                for token_id in ordered[:query_size - min_overlap + 1]
+                if token_id is not None
+            ]
+            sources = prefix
+            if latitude and longitude and radius_km is not None:
+                cells = [self._cells.get(cell, ()) for cell in self._cells_within(latitude, longitude, radius_km)]
+                if sum(map(len, cells)) < sum(map(len, prefix)):
+                    # Rows without a query attribute fail the overlap check below
+                    sources = cells
+
+            candidates: Set[int] = set().union(*sources)
+            if stats is not None:
+                stats["candidates"] = len(candidates)
+                stats["source"] = "cells" if sources is not prefix else "postings"
+            if not candidates:
+                return []
+
+            rows = np.fromiter(candidates, dtype=np.intp, count=len(candidates))
+
+            distances = None
+            if latitude and longitude:
+                latitudes, longitudes = self._latitudes[rows], self._longitudes[rows]
+                if radius_km is not None:
+                    # NaN comparisons are False, so rows without coordinates stay
+                    lat_delta, lon_delta = _bounding_box(latitude, radius_km)
+                    outside = (np.abs(latitudes - latitude) > lat_delta) | (np.abs(longitudes - longitude) > lon_delta)
+                    rows, latitudes, longitudes = rows[~outside], latitudes[~outside], longitudes[~outside]
+                distances = haversine_km(latitude, longitude, latitudes, longitudes)
+                if radius_km is not None:
+                    inside = ~(distances > radius_km)
+                    rows, distances = rows[inside], distances[inside]
+
+            words = self._bits.shape[1]
+            query_bits = np.zeros(words, dtype=np.uint64)
+            for token_id in query:
+                if token_id // WORD_BITS < words:
+                    query_bits[token_id // WORD_BITS] |= np.uint64(1 << (token_id % WORD_BITS))
+
+            sizes = self._sizes[rows]
+            intersections = np.bitwise_count(self._bits[rows] & query_bits).sum(axis=1, dtype=np.int32)
+            scores = intersections / (sizes + query_size - intersections)
+            keep = (
+                (sizes >= min_size)
+                & (sizes <= max_size)
+                & (intersections >= min_overlap)
+                & (scores >= min_score)
+            )
+
+            kept_distances = [None] * int(keep.sum()) if distances is None else [
+                None if np.isnan(distance) else distance for distance in distances[keep].tolist()
+            ]
+            return [
+                (self._ids[row], score, distance_km)
+                for row, score, distance_km in zip(rows[keep].tolist(), scores[keep].tolist(), kept_distances)
+            ]
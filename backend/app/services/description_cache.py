@@ -0,0 +1,129 @@
+"""
+Two-tier cache for description -> attributes extraction.
+An in-process LRU in front of the description_attribute_cache table, keyed on
+the normalized text and a version hash of the prompts and model, so editing a
+prompt or switching models invalidates every entry.
+"""
+from typing import List, Optional
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+import hashlib
+import re
+import unicodedata
+
+from app.config import settings
+from app.database import engine
+from app.models.description_cache import DescriptionAttributeCache
+from app.utils.ttl_cache import TTLCache
+
+
+def normalize_description(description: str) -> str:
+    """
+    Canonical form of a search description: Unicode NFKC, case-folded,
+    whitespace collapsed. "Perro  CAFÉ mediano" == "perro café mediano".
+    """
+    text = unicodedata.normalize("NFKC", description).casefold()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def prompt_version(*parts: str) -> str:
+    """Hash of everything that shapes Gemini's answer (prompt templates, model name)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class DescriptionCache:
+    """Memory + database cache of extracted search attributes."""
+
+    def __init__(self, version: str):
+        """
+        Args:
+            version: prompt_version() of the current prompts and model
+        """
+        self.version = version
+        self._memory = TTLCache(
+            max_entries=settings.description_cache_max_entries,
+            ttl_seconds=settings.description_cache_ttl_seconds
+        )
+        self.database_hits = 0
+
+    def _key(self, normalized: str) -> str:
+        return hashlib.sha256(f"{self.version}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, description: str) -> Optional[List[str]]:
+        """
+        Cached attributes for a description, or None.
+
+        Database hits are promoted to the in-process tier.
+        """
+        normalized = normalize_description(description)
+        key = self._key(normalized)
+
+        attributes = self._memory.get(key)
+        if attributes is not None:
+            return attributes
+
+        try:
+            with engine.connect() as conn:
+                attributes = conn.execute(
+                    select(DescriptionAttributeCache.attributes)
+                    .where(DescriptionAttributeCache.key == key)
+                ).scalar()
+        except Exception as e:
+            print(f"⚠️  Description cache lookup failed: {e}")
+            return None
+
+        if attributes is not None:
+            self.database_hits += 1
+            self._memory.set(key, attributes)
+        return attributes
+
+    def set(self, description: str, attributes: List[str]) -> None:
+        """Store a successful extraction in both tiers (empty results are not cached)."""
+        if not attributes:
+            return
+
+        normalized = normalize_description(description)
+        key = self._key(normalized)
+        self._memory.set(key, attributes)
+
+        try:
+            with engine.begin() as conn:
+                conn.execute(
+                    insert(DescriptionAttributeCache)
+                    .values(
+                        key=key,
+                        prompt_version=self.version,
+                        description=normalized,
+                        attributes=attributes
+                    )
+                    .on_conflict_do_update(
+                        index_elements=["key"],
+                        set_={"attributes": attributes}
+                    )
+                )
+        except Exception as e:
+            print(f"⚠️  Description cache write failed: {e}")
+
+    def purge_stale(self) -> int:
+        """
+        Delete rows written under other prompt/model versions.
+
+        Returns:
+            int: Number of deleted rows
+        """
+        with engine.begin() as conn:
+            deleted = conn.execute(
+                delete(DescriptionAttributeCache)
+                .where(DescriptionAttributeCache.prompt_version != self.version)
+            ).rowcount
+        if deleted:
+            print(f"🗑️  Purged {deleted} description cache entries from older prompts")
+        return deleted
+
+    def stats(self) -> dict:
+        """Counters for the health endpoint."""
+        return {**self._memory.stats(), "database_hits": self.database_hits}
@@ -0,0 +1,292 @@
+"""
+Embedding backends: what turns image bytes into vectors.
+
+EmbeddingService handles sources, preprocessing and caching; a backend only
+embeds. Selected with settings.embedding_backend:
+
+- "vertex": Vertex AI multimodalembedding@001 (1408-d, network call per image
+  and output dimension, through the outbound governor)
+- "local": an ONNX image encoder (e.g. a CLIP visual tower) run on CPU with
+  onnxruntime, batching concurrent requests into one inference call. Needs
+  `pip install onnxruntime` and settings.local_embedding_model_path.
+
+Each backend declares its dimension, which is what settings.embedding_dimension
+(used for the Vector columns) reports for it. The local backend checks that
+its model really outputs that dimension; switching backends on an existing
+database goes through migrate_embedding_storage.
+"""
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import io
+
+import numpy as np
+from PIL import Image as PILImage
+
+from app.config import settings, VERTEX_EMBEDDING_DIMENSION
+from app.services.outbound_governor import vertex_governor
+
+# CLIP image normalization (RGB mean / std)
+CLIP_MEAN = np.array([0.48145466, 0.4578275, 0.40821073], dtype=np.float32)
+CLIP_STD = np.array([0.26862954, 0.26130258, 0.27577711], dtype=np.float32)
+
+
+class EmbeddingBackend(ABC):
+    """Interface of an embedding backend."""
+
+    name = "base"
+    dimension = 0
+
+    @abstractmethod
+    async def embed(self, images: List[bytes], dimensions: List[int]) -> List[Dict[int, List[float]]]:
+        """
+        Embed images at several output dimensions.
+
+        Args:
+            images: Image bytes (already preprocessed)
+            dimensions: Output dimensions; self.dimension is the full vector
+
+        Returns:
+            One {dimension: vector} dict per image, in order
+        """
+
+    async def embed_uri(self, uri: str, dimensions: List[int]) -> Dict[int, List[float]]:
+        """
+        Embed an image the service cannot download itself (e.g. gs://).
+
+        Raises:
+            ValueError: If the backend cannot read such URIs
+        """
+        raise ValueError(f"The {self.name} embedding backend only embeds image bytes")
+
+    async def close(self) -> None:
+        """Release backend resources."""
+
+
+class VertexEmbeddingBackend(EmbeddingBackend):
+    """Vertex AI multimodal embeddings (one call per image and dimension)."""
+
+    name = "vertex"
+    dimension = VERTEX_EMBEDDING_DIMENSION
+
+    def __init__(self):
+        """Initialize Vertex AI and load the embedding model."""
+        import vertexai
+        from vertexai.vision_models import MultiModalEmbeddingModel, Image
+
+        vertexai.init(project=settings.gcp_project_id, location="us-central1")
+        self.model = MultiModalEmbeddingModel.from_pretrained("multimodalembedding@001")
+        self._image_class = Image
+
+    async def _embed_image(self, image, dimensions: List[int]) -> Dict[int, List[float]]:
+        """One concurrent Vertex call per output dimension (128, 256, 512 or 1408)."""
+        embeddings = await asyncio.gather(*[
+            vertex_governor.call(asyncio.to_thread, self.model.get_embeddings, image=image, dimension=dimension)
+            for dimension in dimensions
+        ])
+        return {
+            dimension: result.image_embedding
+            for dimension, result in zip(dimensions, embeddings)
+        }
+
+    async def embed(self, images: List[bytes], dimensions: List[int]) -> List[Dict[int, List[float]]]:
+        return await asyncio.gather(*[
+            self._embed_image(self._image_class(image_bytes=image_bytes), dimensions)
+            for image_bytes in images
+        ])
+
+    async def embed_uri(self, uri: str, dimensions: List[int]) -> Dict[int, List[float]]:
+        image = await asyncio.to_thread(self._image_class.load_from_file, uri)
+        return await self._embed_image(image, dimensions)
+
+
+class LocalOnnxEmbeddingBackend(EmbeddingBackend):
+    """
+    CPU image encoder with micro-batching.
+
+    Concurrent embed() calls are queued and run as batches of up to
+    settings.local_embedding_batch_size images (waiting at most
+    settings.local_embedding_batch_wait_ms for a batch to fill), on
+    settings.local_embedding_workers worker threads. Shorter output
+    dimensions (two-stage search) are fixed random projections of the full
+    vector, which preserve cosine similarity approximately.
+    """
+
+    name = "local"
+
+    def __init__(self):
+        """Load the ONNX model."""
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise RuntimeError("EMBEDDING_BACKEND=local needs onnxruntime (pip install onnxruntime)") from e
+        if not settings.local_embedding_model_path:
+            raise RuntimeError("EMBEDDING_BACKEND=local needs LOCAL_EMBEDDING_MODEL_PATH")
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = settings.local_embedding_threads
+        self.session = onnxruntime.InferenceSession(
+            settings.local_embedding_model_path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        self.image_size = settings.local_embedding_image_size
+
+        self.dimension = settings.local_embedding_dimension
+        output_dimension = self.session.get_outputs()[0].shape[-1]
+        if isinstance(output_dimension, int) and output_dimension != self.dimension:
+            raise RuntimeError(
+                f"Model outputs {output_dimension}-d vectors, LOCAL_EMBEDDING_DIMENSION is {self.dimension}"
+            )
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.local_embedding_workers,
+            thread_name_prefix="local-embedding"
+        )
+        self._projections: Dict[int, np.ndarray] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._workers: Optional[asyncio.Semaphore] = None
+        self._running = set()
+
+    def _pixels(self, image_bytes: bytes) -> np.ndarray:
+        """Decode, resize (shorter side), center-crop and normalize to CHW float32."""
+        image = PILImage.open(io.BytesIO(image_bytes)).convert("RGB")
+        scale = self.image_size / min(image.size)
+        image = image.resize(
+            (max(self.image_size, round(image.width * scale)), max(self.image_size, round(image.height * scale))),
+            PILImage.Resampling.BICUBIC
+        )
+        left = (image.width - self.image_size) // 2
+        top = (image.height - self.image_size) // 2
+        image = image.crop((left, top, left + self.image_size, top + self.image_size))
+
+        pixels = np.asarray(image, dtype=np.float32) / 255.0
+        pixels = (pixels - CLIP_MEAN) / CLIP_STD
+        return pixels.transpose(2, 0, 1)
+
+    def _infer(self, batch: np.ndarray) -> np.ndarray:
+        """Run the model on a batch and L2-normalize the outputs."""
+        vectors = self.session.run(None, {self.input_name: batch})[0].astype(np.float32)
+        # Models with a symbolic output shape are only checked here
+        if vectors.shape[-1] != self.dimension:
+            raise RuntimeError(
+                f"Model outputs {vectors.shape[-1]}-d vectors, LOCAL_EMBEDDING_DIMENSION is {self.dimension}"
+            )
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
+
+    def _projection(self, dimension: int) -> np.ndarray:
+        """Fixed (seeded) Gaussian projection from the full dimension down to `dimension`."""
+        if dimension not in self._projections:
+            rng = np.random.default_rng(dimension)
+            self._projections[dimension] = rng.standard_normal(
+                (self.dimension, dimension)
+            ).astype(np.float32) / np.sqrt(dimension)
+        return self._projections[dimension]
+
+    def _start_batcher(self) -> None:
+        """Create the queue and batching task inside the running event loop."""
+        if self._batcher is None or self._batcher.done():
+            self._queue = asyncio.Queue()
+            self._workers = asyncio.Semaphore(settings.local_embedding_workers)
+            self._batcher = asyncio.create_task(self._batch_loop())
+
+    async def _batch_loop(self) -> None:
+        """Collect queued images into batches and hand them to the worker threads."""
+        loop = asyncio.get_running_loop()
+        wait_seconds = settings.local_embedding_batch_wait_ms / 1000
+
+        while True:
+            batch: List[Tuple[np.ndarray, asyncio.Future]] = [await self._queue.get()]
+            deadline = loop.time() + wait_seconds
+            while len(batch) < settings.local_embedding_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._workers.acquire()
+            task = asyncio.create_task(self._run_batch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, batch: List[Tuple[np.ndarray, asyncio.Future]]) -> None:
+        try:
+            pixels = np.stack([item[0] for item in batch])
+            vectors = await asyncio.get_running_loop().run_in_executor(self._executor, self._infer, pixels)
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._workers.release()
+
+    async def embed(self, images: List[bytes], dimensions: List[int]) -> List[Dict[int, List[float]]]:
+        self._start_batcher()
+        loop = asyncio.get_running_loop()
+
+        all_pixels = await asyncio.gather(*[
+            loop.run_in_executor(self._executor, self._pixels, image_bytes)
+            for image_bytes in images
+        ])
+        futures = []
+        for pixels in all_pixels:
+            future = loop.create_future()
+            self._queue.put_nowait((pixels, future))
+            futures.append(future)
+        vectors = await asyncio.gather(*futures)
+
+        results = []
+        for vector in vectors:
+            embeddings = {}
+            for dimension in dimensions:
+                if dimension == self.dimension:
+                    embeddings[dimension] = vector.tolist()
+                else:
+                    projected = vector @ self._projection(dimension)
+                    projected /= max(float(np.linalg.norm(projected)), 1e-12)
+                    embeddings[dimension] = projected.tolist()
+            results.append(embeddings)
+        return results
+
+    async def close(self) -> None:
+        if self._batcher is not None:
+            self._batcher.cancel()
+            self._batcher = None
+        self._executor.shutdown(wait=False)
+
+
+BACKENDS = {
+    "vertex": VertexEmbeddingBackend,
+    "local": LocalOnnxEmbeddingBackend,
+}
+
+
+def create_embedding_backend(name: Optional[str] = None) -> EmbeddingBackend:
+    """
+    Build the configured backend.
+
+    Args:
+        name: Backend name (default settings.embedding_backend)
+
+    Raises:
+        ValueError: If the name is unknown
+        RuntimeError: If the local model's output dimension does not match
+            settings.local_embedding_dimension
+    """
+    name = name or settings.embedding_backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{name}'. Options: {', '.join(BACKENDS)}")
+
+    backend = BACKENDS[name]()
+    print(f"🧠 Embedding backend: {name} ({backend.dimension} dimensions)")
+    return backend
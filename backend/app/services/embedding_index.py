@@ -0,0 +1,522 @@
+"""
+In-memory embedding index for batched cosine scoring.
+Keeps active sightings' embeddings as a pre-normalized matrix so a search is
+one matrix-vector product instead of a Python loop per candidate.
+
+With slots > 1 every sighting keeps one row per photo (zero-padded), and a
+search with several query photos scores all query x photo pairs in a single
+matrix product, keeping the best pair per sighting (max-similarity).
+
+The matrix can be stored as float32, float16 (2x smaller) or scalar-quantized
+int8 with a per-row scale (4x smaller). Quantized scores are approximate, so
+callers should re-score the top candidates with the stored vectors.
+"""
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+import itertools
+import threading
+import time
+import uuid
+import numpy as np
+
+from app.models.dog_sighting import DogSighting, DogSightingImageEmbedding
+
+
+EARTH_RADIUS_KM = 6371.0
+
+# Rows scored per matrix product (float32 matrix)
+SCORE_BLOCK_ROWS = 8192
+# Rows per block when a float16/int8 matrix is upcast to float32 for scoring:
+# small enough that the temporary stays in CPU cache between cast and product
+UPCAST_BLOCK_ROWS = 256
+
+# Quantized first-stage scores may undershoot the exact cosine by this much
+QUANTIZATION_SCORE_MARGIN = 0.02
+
+INDEX_DTYPES = {
+    "float32": np.float32,
+    "float16": np.float16,
+    "int8": np.int8,
+}
+
+
+def to_float_array(vector) -> np.ndarray:
+    """
+    Convert a stored embedding (list, numpy array or pgvector HalfVector) to float32.
+
+    Args:
+        vector: Embedding value as returned by the database or an embedding service
+
+    Returns:
+        np.ndarray: float32 vector
+    """
+    if hasattr(vector, "to_numpy"):
+        vector = vector.to_numpy()
+    return np.asarray(vector, dtype=np.float32)
+
+
+def cosine_similarities(query, vectors: List) -> np.ndarray:
+    """
+    Exact cosine similarity between a query and several vectors, clipped to [0, 1]
+    like MatchingService.calculate_cosine_similarity.
+
+    Args:
+        query: Query embedding
+        vectors: Candidate embeddings (same dimension as the query)
+
+    Returns:
+        np.ndarray: One similarity per candidate
+    """
+    if not len(vectors):
+        return np.zeros(0, dtype=np.float32)
+
+    query = to_float_array(query)
+    matrix = np.stack([to_float_array(vector) for vector in vectors])
+
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = np.where(norms > 0, (matrix @ query) / norms, 0.0)
+
+    return np.clip(scores, 0.0, 1.0)
+
+
+def rescore_pool(hits: List[Tuple], limit: int) -> List[Tuple]:
+    """
+    The quantized hits (best first) that can still reach the exact top-`limit`.
+
+    Quantized scores are within QUANTIZATION_SCORE_MARGIN of the exact ones,
+    so a hit more than twice the margin below the limit-th hit cannot
+    overtake it; only the rest need their stored vectors re-scored.
+    """
+    if len(hits) <= limit:
+        return hits
+    floor = hits[limit - 1][1] - 2 * QUANTIZATION_SCORE_MARGIN
+    return [hit for hit in hits if hit[1] >= floor]
+
+
+def _normalize_rows(vectors) -> np.ndarray:
+    """Stack vectors into a float32 matrix of unit rows (zero rows stay zero)."""
+    matrix = np.atleast_2d(np.stack([to_float_array(vector) for vector in vectors]))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def max_cosine_similarity(queries: List, vectors: List) -> float:
+    """
+    Best cosine similarity over every query x candidate vector pair, clipped to [0, 1].
+
+    Args:
+        queries: Query embeddings (one per query photo)
+        vectors: Candidate embeddings (one per sighting photo)
+
+    Returns:
+        float: Max-similarity score
+    """
+    if not len(queries) or not len(vectors):
+        return 0.0
+
+    scores = _normalize_rows(queries) @ _normalize_rows(vectors).T
+    return float(np.clip(scores.max(), 0.0, 1.0))
+
+
+def haversine_km(
+    latitude: float,
+    longitude: float,
+    latitudes: np.ndarray,
+    longitudes: np.ndarray
+) -> np.ndarray:
+    """Vectorized Haversine distance from one point to many (NaN where unknown)."""
+    lat1 = np.radians(latitude)
+    lat2 = np.radians(latitudes)
+    dlat = lat2 - lat1
+    dlon = np.radians(longitudes - longitude)
+
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+class EmbeddingIndex:
+    """
+    Contiguous (rows x slots x dimension) matrix of unit-length embeddings plus
+    parallel id/location arrays. Unused slots are zero and never win a max.
+    """
+
+    def __init__(
+        self,
+        dimension: int = 1408,
+        dtype: str = "float32",
+        column: str = "image_embedding",
+        slots: int = 1,
+        initial_capacity: int = 1024
+    ):
+        """
+        Args:
+            dimension: Embedding dimension
+            dtype: Matrix storage type ("float32", "float16" or "int8")
+            column: DogSighting column loaded when slots == 1
+            slots: Embeddings kept per sighting; > 1 loads every photo's
+                embedding from dog_sighting_image_embeddings
+            initial_capacity: Preallocated rows
+        """
+        if dtype not in INDEX_DTYPES:
+            raise ValueError(f"Unknown embedding index dtype: {dtype}")
+
+        self.dimension = dimension
+        self.column = column
+        self.slots = slots
+        self.dtype_name = dtype
+        self.dtype = INDEX_DTYPES[dtype]
+        # Reentrant: writes made during a load are replayed while holding it
+        self._lock = threading.RLock()
+        self._matrix = np.zeros((initial_capacity, slots, dimension), dtype=self.dtype)
+        # Per-vector dequantization scale (only meaningful for int8)
+        self._scales = np.ones((initial_capacity, slots), dtype=np.float32)
+        self._latitudes = np.full(initial_capacity, np.nan, dtype=np.float64)
+        self._longitudes = np.full(initial_capacity, np.nan, dtype=np.float64)
+        self._ids: List[Optional[uuid.UUID]] = [None] * initial_capacity
+        self._positions: Dict[uuid.UUID, int] = {}
+        self._size = 0
+        self.loaded_at: Optional[float] = None
+        # Upserts/removals made while load() builds new contents, replayed on them
+        self._journal: Optional[list] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def quantized(self) -> bool:
+        """True when scores are approximate and should be re-scored."""
+        return self.dtype != np.float32
+
+    @property
+    def memory_bytes(self) -> int:
+        """Bytes used by the embedding matrix and its scales."""
+        return self._matrix.nbytes + self._scales.nbytes
+
+    @property
+    def loaded(self) -> bool:
+        """True once the index has been filled from the database."""
+        return self.loaded_at is not None
+
+    def is_stale(self, ttl_seconds: int) -> bool:
+        """
+        Check whether the index should be reloaded from the database.
+
+        Writes handled by other instances are only picked up on reload.
+        """
+        return not self.loaded or time.monotonic() - self.loaded_at > ttl_seconds
+
+    def _as_matrix(self, embeddings) -> Optional[np.ndarray]:
+        """
+        Normalize one vector or a list of vectors into a (k x dimension) float32
+        matrix of unit rows. Returns None if nothing usable remains.
+        """
+        if embeddings is None:
+            return None
+
+        # A single vector is a HalfVector or a sequence of numbers, not of vectors
+        single = hasattr(embeddings, "to_numpy") or (
+            len(embeddings) > 0
+            and not hasattr(embeddings[0], "to_numpy")
+            and np.ndim(embeddings[0]) == 0
+        )
+        if single:
+            embeddings = [embeddings]
+
+        vectors = [to_float_array(vector) for vector in embeddings if vector is not None]
+        vectors = [vector for vector in vectors if vector.shape == (self.dimension,)]
+        if not vectors:
+            return None
+
+        matrix = _normalize_rows(vectors)
+        matrix = matrix[np.linalg.norm(matrix, axis=1) > 0]
+        return matrix if len(matrix) else None
+
+    def _grow(self, capacity: int) -> None:
+        """Resize the backing arrays (amortized doubling)."""
+        matrix = np.zeros((capacity, self.slots, self.dimension), dtype=self.dtype)
+        matrix[:self._size] = self._matrix[:self._size]
+        scales = np.ones((capacity, self.slots), dtype=np.float32)
+        scales[:self._size] = self._scales[:self._size]
+        latitudes = np.full(capacity, np.nan, dtype=np.float64)
+        latitudes[:self._size] = self._latitudes[:self._size]
+        longitudes = np.full(capacity, np.nan, dtype=np.float64)
+        longitudes[:self._size] = self._longitudes[:self._size]
+
+        self._matrix = matrix
+        self._scales = scales
+        self._latitudes = latitudes
+        self._longitudes = longitudes
+        self._ids.extend([None] * (capacity - len(self._ids)))
+
+    def upsert(
+        self,
+        sighting_id: uuid.UUID,
+        embeddings,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None
+    ) -> None:
+        """
+        Add or replace a sighting in the index.
+
+        Args:
+            sighting_id: DogSighting id
+            embeddings: Raw (unnormalized) embedding, or a list of them (one
+                per photo; only the first `slots` are kept)
+            latitude, longitude: Optional sighting location
+        """
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((self.upsert, (sighting_id, embeddings, latitude, longitude)))
+
+        vectors = self._as_matrix(embeddings)
+        if vectors is None:
+            self.remove(sighting_id)
+            return
+        vectors = vectors[:self.slots]
+
+        scales = np.ones(len(vectors), dtype=np.float32)
+        if self.dtype == np.int8:
+            scales = np.abs(vectors).max(axis=1) / 127
+            vectors = np.round(vectors / scales[:, None])
+
+        with self._lock:
+            position = self._positions.get(sighting_id)
+            if position is None:
+                if self._size == len(self._ids):
+                    self._grow(max(2 * self._size, 1))
+                position = self._size
+                self._size += 1
+                self._positions[sighting_id] = position
+                self._ids[position] = sighting_id
+
+            self._matrix[position] = 0
+            self._matrix[position, :len(vectors)] = vectors
+            self._scales[position] = 1.0
+            self._scales[position, :len(vectors)] = scales
+            self._latitudes[position] = latitude if latitude is not None else np.nan
+            self._longitudes[position] = longitude if longitude is not None else np.nan
+
+    def remove(self, sighting_id: uuid.UUID) -> None:
+        """Remove a sighting from the index (no-op if absent)."""
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((self.remove, (sighting_id,)))
+
+            position = self._positions.pop(sighting_id, None)
+            if position is None:
+                return
+
+            # Move the last row into the freed slot to keep the matrix contiguous
+            last = self._size - 1
+            if position != last:
+                moved_id = self._ids[last]
+                self._matrix[position] = self._matrix[last]
+                self._scales[position] = self._scales[last]
+                self._latitudes[position] = self._latitudes[last]
+                self._longitudes[position] = self._longitudes[last]
+                self._ids[position] = moved_id
+                self._positions[moved_id] = position
+
+            self._ids[last] = None
+            self._latitudes[last] = np.nan
+            self._longitudes[last] = np.nan
+            self._size = last
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._positions.clear()
+            self._ids = [None] * len(self._ids)
+            self._latitudes.fill(np.nan)
+            self._longitudes.fill(np.nan)
+            self._size = 0
+
+    def _load_rows(self, db: Session, batch_size: int) -> Iterator[Tuple[uuid.UUID, list, Optional[float], Optional[float]]]:
+        """Yield (sighting_id, embeddings, latitude, longitude) for active sightings."""
+        if self.slots == 1:
+            embedding_column = getattr(DogSighting, self.column)
+            rows = db.query(
+                DogSighting.id,
+                embedding_column,
+                DogSighting.latitude,
+                DogSighting.longitude
+            ).filter(
+                DogSighting.status == "active",
+                embedding_column.isnot(None)
+            ).yield_per(batch_size)
+
+            for sighting_id, embedding, latitude, longitude in rows:
+                yield sighting_id, [embedding], latitude, longitude
+            return
+
+        # One row per photo; sightings reported before per-photo embeddings
+        # existed fall back to their primary image_embedding
+        rows = db.query(
+            DogSighting.id,
+            DogSighting.image_embedding,
+            DogSightingImageEmbedding.embedding,
+            DogSighting.latitude,
+            DogSighting.longitude
+        ).outerjoin(
+            DogSightingImageEmbedding,
+            DogSightingImageEmbedding.sighting_id == DogSighting.id
+        ).filter(
+            DogSighting.status == "active",
+            or_(
+                DogSighting.image_embedding.isnot(None),
+                DogSightingImageEmbedding.embedding.isnot(None)
+            )
+        ).order_by(
+            DogSighting.id,
+            DogSightingImageEmbedding.position
+        ).yield_per(batch_size)
+
+        for sighting_id, group in itertools.groupby(rows, key=lambda row: row[0]):
+            group = list(group)
+            _, primary, _, latitude, longitude = group[0]
+            embeddings = [row[2] for row in group if row[2] is not None] or [primary]
+            yield sighting_id, embeddings, latitude, longitude
+
+    def load(self, db: Session, batch_size: int = 1000) -> int:
+        """
+        Rebuild the index from all active sightings with an embedding.
+
+        The new contents are built in a separate index and swapped in under
+        the lock, so concurrent searches see either the old or the new
+        contents, never a half-built matrix. Writes made during the load are
+        replayed on the new contents.
+
+        Args:
+            db: Database session
+            batch_size: Rows fetched per round trip
+
+        Returns:
+            int: Number of indexed sightings
+        """
+        staging = EmbeddingIndex(
+            dimension=self.dimension,
+            dtype=self.dtype_name,
+            column=self.column,
+            slots=self.slots,
+            initial_capacity=max(self._size, 1024)
+        )
+        with self._lock:
+            self._journal = []
+        try:
+            for sighting_id, embeddings, latitude, longitude in self._load_rows(db, batch_size):
+                staging.upsert(sighting_id, embeddings, latitude, longitude)
+        except BaseException:
+            with self._lock:
+                self._journal = None
+            raise
+
+        with self._lock:
+            journal, self._journal = self._journal, None
+            self._matrix = staging._matrix
+            self._scales = staging._scales
+            self._latitudes = staging._latitudes
+            self._longitudes = staging._longitudes
+            self._ids = staging._ids
+            self._positions = staging._positions
+            self._size = staging._size
+            for write, args in journal:
+                write(*args)
+            self.loaded_at = time.monotonic()
+
+        print(
+            f"🧠 Embedding index ({self.column}, {self.slots} per sighting) loaded: {self._size} sightings "
+            f"({np.dtype(self.dtype).name}, {self.memory_bytes / (1024 * 1024):.1f} MB)"
+        )
+        return self._size
+
+    def search(
+        self,
+        query_embeddings,
+        limit: int = 20,
+        min_score: float = 0.0,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        radius_km: Optional[float] = None
+    ) -> List[Tuple[uuid.UUID, float, Optional[float]]]:
+        """
+        Score every indexed sighting against a query and return the top-k.
+
+        A sighting's score is the best cosine similarity over all query photo x
+        sighting photo pairs. Sightings without coordinates are never excluded
+        by the radius filter, matching MatchingService.find_matches_by_vectors_exact.
+
+        Args:
+            query_embeddings: Raw query vector, or a list of them (one per photo)
+            limit: Maximum results to return
+            min_score: Minimum cosine similarity
+            latitude, longitude: Optional search point
+            radius_km: Radius for location filtering
+
+        Returns:
+            List of tuples: (sighting_id, cosine_similarity, distance_km)
+            Sorted by similarity descending
+        """
+        queries = self._as_matrix(query_embeddings)
+        if limit <= 0 or queries is None:
+            return []
+
+        with self._lock:
+            size = self._size
+            if size == 0:
+                return []
+
+            scores = np.clip(self._scores(queries, size), 0.0, 1.0)
+            mask = scores >= min_score
+
+            distances = None
+            if latitude and longitude:
+                distances = haversine_km(
+                    latitude, longitude,
+                    self._latitudes[:size], self._longitudes[:size]
+                )
+                if radius_km is not None:
+                    # NaN distance (no coordinates) keeps the candidate
+                    mask &= ~(distances > radius_km)
+
+            candidates = np.flatnonzero(mask)
+            if len(candidates) > limit:
+                top = np.argpartition(-scores[candidates], limit - 1)[:limit]
+                candidates = candidates[top]
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+            return [
+                (
+                    self._ids[position],
+                    float(scores[position]),
+                    None if distances is None or np.isnan(distances[position])
+                    else float(distances[position])
+                )
+                for position in candidates
+            ]
+
+    def _scores(self, queries: np.ndarray, size: int) -> np.ndarray:
+        """
+        Max-similarity of every sighting against the (q x dimension) query
+        matrix, one matrix product per block. Caller holds the lock.
+        """
+        scores = np.empty(size, dtype=np.float32)
+        # NumPy has no float16/int8 matrix product: those blocks are upcast
+        # per query, which costs more than the product itself for float16
+        block_rows = SCORE_BLOCK_ROWS if self.dtype == np.float32 else UPCAST_BLOCK_ROWS
+
+        for start in range(0, size, block_rows):
+            end = min(start + block_rows, size)
+
+            # (rows * slots, dimension) @ (dimension, q)
+            block = self._matrix[start:end].reshape(-1, self.dimension)
+            if self.dtype != np.float32:
+                block = block.astype(np.float32)
+            pair_scores = (block @ queries.T).reshape(end - start, self.slots, len(queries))
+
+            if self.dtype == np.int8:
+                pair_scores *= self._scales[start:end, :, None]
+            scores[start:end] = pair_scores.max(axis=(1, 2))
+
+        return scores
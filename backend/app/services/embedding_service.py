@@ -1,24 +1,69 @@
 """
-Image embedding service using Vertex AI Multimodal Embeddings.
-Generates vector embeddings from images for similarity search.
+Image embedding service.
+Generates vector embeddings from images for similarity search, with the
+backend (Vertex AI or a local ONNX model) chosen by settings.embedding_backend.
 """
-from typing import List, Optional
-from vertexai.vision_models import MultiModalEmbeddingModel, Image
-import vertexai
+from typing import Dict, List, Optional, Union
 from app.config import settings
-import requests
+from app.services.embedding_backends import EmbeddingBackend, create_embedding_backend
+from app.services.image_cache import image_cache, image_digest
+from app.utils.image_preprocessing import preprocess_image
+from app.utils.readiness import readiness
+import asyncio
+import importlib.util
+import os
+import threading
 import base64
-from io import BytesIO
+import httpx
+
+# Where an image can come from: URL, local path, base64 data URI, or the
+# already-decoded bytes (bytes, bytearray or memoryview)
+ImageSource = Union[str, bytes, bytearray, memoryview]
+
+
+def _describe_source(image_source: ImageSource) -> str:
+    """Short printable form of an image source for log lines."""
+    if isinstance(image_source, str):
+        return f"{image_source[:100]}..."
+    return f"<{len(image_source)} bytes>"
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
 
 
 class EmbeddingService:
-    """Service for generating image embeddings using Vertex AI."""
+    """Service for generating image embeddings."""
 
     def __init__(self):
-        """Initialize Vertex AI and load the embedding model."""
-        vertexai.init(project=settings.gcp_project_id, location="us-central1")
-        self.model = MultiModalEmbeddingModel.from_pretrained("multimodalembedding@001")
-        self.dimension = 1408
+        """The backend is created on first use (see get_backend)."""
+        self._backend: Optional[EmbeddingBackend] = None
+        self._backend_lock = threading.Lock()
+        self.dimension = settings.embedding_dimension
+        self.coarse_dimension = settings.coarse_embedding_dimension
+
+        # Shared HTTP client for URL sources, created on first use inside the
+        # running event loop (see _get_http_client)
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._http_semaphore: Optional[asyncio.Semaphore] = None
+
+    def get_backend(self) -> EmbeddingBackend:
+        """
+        The configured backend, created on first use (vertexai.init and
+        from_pretrained, or loading the ONNX model).
+        """
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    self._backend = readiness.record("embeddings", create_embedding_backend)
+        return self._backend
+
+    async def _get_backend_async(self) -> EmbeddingBackend:
+        """get_backend() without blocking the event loop on the first call."""
+        if self._backend is not None:
+            return self._backend
+        return await asyncio.to_thread(self.get_backend)
 
     async def generate_embedding_from_url(self, image_url: str) -> List[float]:
         """
@@ -28,64 +73,233 @@ class EmbeddingService:
             image_url: GCS URL or HTTP URL of the image
 
         Returns:
-            List[float]: 1408-dimensional embedding vector
+            List[float]: Embedding vector (self.dimension values)
         """
         try:
-            image = Image.load_from_file(image_url)
-            embeddings = self.model.get_embeddings(
-                image=image,
-                dimension=self.dimension
-            )
-            return embeddings.image_embedding
+            image_bytes = await self._load_image_bytes(image_url)
+            if image_bytes is not None:
+                embeddings = await self._embed_image_bytes(image_bytes, [self.dimension])
+            else:
+                backend = await self._get_backend_async()
+                embeddings = await backend.embed_uri(image_url, [self.dimension])
+            return embeddings[self.dimension]
         except Exception as e:
             print(f"❌ Error generating embedding from URL: {e}")
             raise
 
-    async def generate_embedding_from_bytes(self, image_bytes: bytes) -> List[float]:
+    async def generate_embedding_from_bytes(self, image_bytes: Union[bytes, bytearray, memoryview]) -> List[float]:
         """
-        Generate embedding from image bytes.
+        Generate embedding from image bytes already in memory.
 
         Args:
-            image_bytes: Raw image bytes
+            image_bytes: Raw image bytes (bytes, bytearray or memoryview)
 
         Returns:
-            List[float]: 1408-dimensional embedding vector
+            List[float]: Embedding vector (self.dimension values)
         """
         try:
-            image = Image(image_bytes=image_bytes)
-            embeddings = self.model.get_embeddings(
-                image=image,
-                dimension=self.dimension
-            )
-            return embeddings.image_embedding
+            image_bytes = await self._load_image_bytes(image_bytes)
+            embeddings = await self._embed_image_bytes(image_bytes, [self.dimension])
+            return embeddings[self.dimension]
         except Exception as e:
             print(f"❌ Error generating embedding from bytes: {e}")
             raise
 
-    async def generate_embedding(self, image_source: str) -> Optional[List[float]]:
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """
+        Pooled keep-alive client for image downloads, HTTP/2 when the h2
+        package is installed (GCS supports it; one connection then carries
+        many concurrent fetches).
+        """
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                http2=importlib.util.find_spec("h2") is not None,
+                timeout=httpx.Timeout(settings.http_timeout_seconds),
+                limits=httpx.Limits(
+                    max_connections=settings.http_max_connections,
+                    max_keepalive_connections=settings.http_max_connections,
+                    keepalive_expiry=settings.http_keepalive_seconds,
+                ),
+                follow_redirects=True,
+            )
+            self._http_semaphore = asyncio.Semaphore(settings.http_max_concurrent_fetches)
+        return self._http_client
+
+    async def _fetch_image(self, url: str) -> bytes:
+        """
+        Download an image without blocking the event loop.
+
+        At most settings.http_max_concurrent_fetches downloads run at once.
+        The body is streamed and abandoned as soon as it exceeds
+        settings.http_max_download_mb.
+
+        Raises:
+            ValueError: If the image is larger than the cap
+            httpx.HTTPError: On connection errors and non-2xx responses
+        """
+        client = self._get_http_client()
+        max_bytes = int(settings.http_max_download_mb * 1024 * 1024)
+
+        async with self._http_semaphore:
+            async with client.stream("GET", url) as response:
+                response.raise_for_status()
+
+                declared = response.headers.get("content-length")
+                if declared is not None and declared.isdigit() and int(declared) > max_bytes:
+                    raise ValueError(f"Image too large: {int(declared)} bytes (max {max_bytes})")
+
+                chunks = []
+                received = 0
+                async for chunk in response.aiter_bytes():
+                    received += len(chunk)
+                    if received > max_bytes:
+                        raise ValueError(f"Image too large: over {max_bytes} bytes")
+                    chunks.append(chunk)
+
+        return b"".join(chunks)
+
+    async def close(self) -> None:
+        """Close pooled HTTP connections and release the backend."""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+        if self._backend is not None:
+            await self._backend.close()
+
+    async def _load_image_bytes(self, image_source: ImageSource) -> Optional[bytes]:
+        """
+        Normalized bytes of an in-memory buffer, base64 data URI, HTTP(S) URL
+        or local file. Returns None for sources only Vertex can read (e.g.
+        gs:// URIs).
+
+        Everything goes through preprocess_image (in a worker thread), which
+        leaves already-normalized images untouched.
         """
-        Generate embedding from URL, file path, or base64 data URI.
+        if isinstance(image_source, (bytes, bytearray, memoryview)):
+            image_bytes = bytes(image_source)
+        elif image_source.startswith('data:image'):
+            image_bytes = base64.b64decode(image_source.split(',', 1)[1])
+        elif image_source.startswith('http'):
+            image_bytes = await self._fetch_image(image_source)
+        elif os.path.isfile(image_source):
+            image_bytes = await asyncio.to_thread(_read_file, image_source)
+        else:
+            return None
+
+        if settings.image_preprocessing_enabled:
+            image_bytes, _ = await asyncio.to_thread(preprocess_image, image_bytes)
+        return image_bytes
+
+    async def _embed_image_bytes(self, image_bytes: bytes, dimensions: List[int]) -> Dict[int, List[float]]:
+        """
+        Embed image bytes at several output dimensions, reusing cached
+        embeddings of identical bytes (SHA-256) and calling the backend only
+        for the missing dimensions.
+        """
+        digest = image_digest(image_bytes)
+        embeddings = {
+            dimension: image_cache.get_embedding(digest, dimension)
+            for dimension in dimensions
+        }
+
+        missing = [dimension for dimension, embedding in embeddings.items() if embedding is None]
+        if missing:
+            backend = await self._get_backend_async()
+            computed = (await backend.embed([image_bytes], missing))[0]
+            for dimension, embedding in computed.items():
+                image_cache.set_embedding(digest, dimension, embedding)
+            embeddings.update(computed)
+        else:
+            print(f"⚡ Cached embeddings for image {digest[:12]}")
+
+        return embeddings
+
+    async def generate_embeddings(
+        self,
+        image_source: ImageSource,
+        include_coarse: Optional[bool] = None
+    ) -> Dict[str, Optional[List[float]]]:
+        """
+        Generate the full and coarse embeddings used by two-stage search.
+
+        Args:
+            image_source: Image URL (GCS or HTTP), local file path, base64 data URI
+                or image bytes
+            include_coarse: Also request the short embedding (one extra call on
+                Vertex). Defaults to whether two-stage search is enabled; rows
+                stored without it are filled by backfill_embeddings.
+
+        Returns:
+            Dict with "full" (self.dimension) and "coarse" (settings.coarse_embedding_dimension)
+            vectors; None values if embedding failed or coarse was not requested
+        """
+        if include_coarse is None:
+            include_coarse = settings.vector_search_mode == "two_stage"
+        try:
+            dimensions = [self.dimension, self.coarse_dimension] if include_coarse else [self.dimension]
+
+            image_bytes = await self._load_image_bytes(image_source)
+            if image_bytes is not None:
+                embeddings = await self._embed_image_bytes(image_bytes, dimensions)
+            else:
+                backend = await self._get_backend_async()
+                embeddings = await backend.embed_uri(image_source, dimensions)
+
+            return {
+                "full": embeddings[self.dimension],
+                "coarse": embeddings.get(self.coarse_dimension) if include_coarse else None,
+            }
+        except Exception as e:
+            print(f"❌ Failed to generate embeddings for {_describe_source(image_source)}: {e}")
+            return {"full": None, "coarse": None}
+
+    async def generate_image_embeddings(
+        self,
+        image_sources: List[ImageSource],
+        include_coarse: Optional[bool] = None
+    ) -> List[Dict[str, Optional[List[float]]]]:
+        """
+        Embed every photo of a sighting or search concurrently.
 
         Args:
-            image_source: Image URL (GCS or HTTP), local file path, or base64 data URI
+            image_sources: Image URLs, file paths, base64 data URIs or image bytes
+            include_coarse: Also compute the short embedding of the first photo
+                (default: only when two-stage search is enabled)
 
         Returns:
-            List[float]: 1408-dimensional embedding vector, or None if failed
+            One generate_embeddings() result per source, in order
+        """
+        if include_coarse is None:
+            include_coarse = settings.vector_search_mode == "two_stage"
+        return await asyncio.gather(*[
+            self.generate_embeddings(source, include_coarse=include_coarse and position == 0)
+            for position, source in enumerate(image_sources)
+        ])
+
+    async def generate_embedding(self, image_source: ImageSource) -> Optional[List[float]]:
+        """
+        Generate embedding from URL, file path, base64 data URI or image bytes.
+
+        Args:
+            image_source: Image URL (GCS or HTTP), local file path, base64 data URI
+                or image bytes
+
+        Returns:
+            List[float]: Embedding vector (self.dimension values), or None if failed
         """
         try:
-            if image_source.startswith('data:image'):
+            if isinstance(image_source, (bytes, bytearray, memoryview)):
+                return await self.generate_embedding_from_bytes(image_source)
+            elif image_source.startswith('data:image'):
                 base64_data = image_source.split(',', 1)[1]
                 image_bytes = base64.b64decode(base64_data)
                 return await self.generate_embedding_from_bytes(image_bytes)
             elif image_source.startswith('http'):
-                response = requests.get(image_source, timeout=30)
-                response.raise_for_status()
-                return await self.generate_embedding_from_bytes(response.content)
+                return await self.generate_embedding_from_bytes(await self._fetch_image(image_source))
             else:
                 return await self.generate_embedding_from_url(image_source)
         except Exception as e:
-            print(f"❌ Failed to generate embedding for {image_source[:100]}...: {e}")
+            print(f"❌ Failed to generate embedding for {_describe_source(image_source)}: {e}")
             return None
 
-
 embedding_service = EmbeddingService()
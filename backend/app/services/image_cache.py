@@ -0,0 +1,71 @@
+"""
+Content-hash cache for image analysis and embeddings.
+Keyed by the SHA-256 of the decoded image bytes, so a retried upload, a bot
+re-send or a search with an already-posted photo skips Gemini and Vertex.
+"""
+from typing import Any, Dict, List, Optional
+import copy
+import hashlib
+
+from app.config import settings
+from app.utils.ttl_cache import TTLCache
+
+
+def image_digest(image_bytes: bytes) -> str:
+    """SHA-256 hex digest of decoded image bytes."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+class ImageCache:
+    """Gemini results per image set and embeddings per image, in process."""
+
+    def __init__(self):
+        self._analysis = TTLCache(
+            max_entries=settings.image_cache_max_entries,
+            ttl_seconds=settings.image_cache_ttl_seconds
+        )
+        self._embeddings = TTLCache(
+            max_entries=settings.image_cache_max_entries,
+            ttl_seconds=settings.image_cache_ttl_seconds
+        )
+
+    @staticmethod
+    def analysis_key(digests: List[str], description: Optional[str], version: str) -> str:
+        """
+        Key for one Gemini analysis: the images (in order), the user
+        description that goes into the prompt, and the prompt/model version.
+        """
+        digest = hashlib.sha256()
+        for part in [version, description or "", *digests]:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get_analysis(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached Gemini result (es_perro, atributos, confianza), or None."""
+        result = self._analysis.get(key)
+        # Callers may mutate the dict; hand out a copy
+        return copy.deepcopy(result) if result is not None else None
+
+    def set_analysis(self, key: str, result: Dict[str, Any]) -> None:
+        """Store a parsed Gemini result."""
+        self._analysis.set(key, copy.deepcopy(result))
+
+    def get_embedding(self, digest: str, dimension: int) -> Optional[List[float]]:
+        """Cached embedding of an image at an output dimension, or None."""
+        return self._embeddings.get((digest, dimension))
+
+    def set_embedding(self, digest: str, dimension: int, embedding: List[float]) -> None:
+        """Store an embedding."""
+        self._embeddings.set((digest, dimension), embedding)
+
+    def stats(self) -> dict:
+        """Counters for the health endpoint."""
+        return {
+            "analysis": self._analysis.stats(),
+            "embeddings": self._embeddings.stats(),
+        }
+
+
+# Global instance
+image_cache = ImageCache()
@@ -3,16 +3,100 @@ LLM Service for extracting dog attributes using Gemini.
 """
 from typing import List, Dict, Any, Optional
 from fastapi import UploadFile
+import asyncio
 import json
-import google.generativeai as genai
+import random
+import threading
 from PIL import Image
 import io
 
 from app.config import settings
+from app.services.description_cache import DescriptionCache, prompt_version
+from app.services.image_cache import image_cache, image_digest
+from app.services.local_extractor import local_extractor
+from app.services.outbound_governor import gemini_governor, OutboundOverloadedError
+from app.utils.readiness import readiness
+
+# Gemini model, configured on first use (see get_model)
+GEMINI_MODEL = 'gemini-2.5-flash'
+_model = None
+_model_lock = threading.Lock()
+
+# Prompt for text-only search descriptions
+SEARCH_ATTRIBUTES_PROMPT = """
+Analiza la siguiente descripción de un perro y extrae los atributos relevantes.
+
+Descripción: {description}
+
+Extrae atributos como:
+- RAZA: raza aproximada (ej: labrador, mestizo, quiltro, pastor_aleman)
+- COLOR: color(es) del pelaje (ej: amarillo, negro, cafe, blanco)
+- TAMAÑO: pequeno, mediano, grande
+- EDAD: cachorro, joven, adulto, senior
+- CARACTERÍSTICAS ESPECIALES: collar, arnes, manchas, orejas_caidas, pelo_corto, pelo_largo, etc.
+
+Formato de respuesta (JSON estricto):
+{{
+  "atributos": ["raza", "color1", "color2", "tamano", "edad", "caracteristica1", ...]
+}}
+
+IMPORTANTE:
+- Atributos en minúsculas, sin tildes
+- Usa guiones bajos para espacios (ej: "pastor_aleman", "pelo_largo")
+- Incluye SOLO atributos mencionados o claramente inferibles de la descripción
+"""
+
+# Sampled shadow comparisons, referenced until done so they are not collected
+_background_tasks = set()
+
+
+def get_model():
+    """
+    Configured Gemini model, created on first use.
+
+    The SDK import and configuration happen here rather than at import time,
+    so importing the app stays fast; the startup warm-up calls this early.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = readiness.record("gemini", _create_model)
+    return _model
 
-# Configure Gemini
-genai.configure(api_key=settings.google_api_key)
-model = genai.GenerativeModel('gemini-2.5-flash')
+
+def _create_model():
+    import google.generativeai as genai
+
+    genai.configure(api_key=settings.google_api_key)
+    return genai.GenerativeModel(GEMINI_MODEL)
+
+
+class LLMTimeoutError(TimeoutError):
+    """Gemini did not answer within settings.llm_timeout_seconds."""
+
+
+async def _generate_content(contents):
+    """
+    Call Gemini without blocking the event loop.
+
+    Uses the SDK's async client through gemini_governor (rate limit,
+    adaptive concurrency limit, retries on quota errors). Each call is
+    bounded by settings.llm_timeout_seconds, time spent queued or backing
+    off included. Cancelling the caller cancels the call.
+
+    Raises:
+        LLMTimeoutError: If Gemini does not answer in time
+        OutboundOverloadedError: If too many Gemini calls are already queued
+    """
+    # First call: import and configure the SDK off the event loop
+    model = _model if _model is not None else await asyncio.to_thread(get_model)
+    try:
+        async with asyncio.timeout(settings.llm_timeout_seconds):
+            return await gemini_governor.call(model.generate_content_async, contents)
+    except TimeoutError:
+        print(f"⏱️  Gemini call timed out after {settings.llm_timeout_seconds}s")
+        raise LLMTimeoutError(f"Gemini did not answer within {settings.llm_timeout_seconds}s")
 
 
 async def dog_description(
@@ -33,6 +117,10 @@ async def dog_description(
             - confianza (float): Confidence score (0-1)
         
         Or False if no images or not a dog.
+
+    Raises:
+        LLMTimeoutError: If Gemini does not answer in time
+        OutboundOverloadedError: If too many Gemini calls are already queued
     
     TODO: Implementar llamada real a Gemini
     
@@ -81,25 +169,36 @@ async def dog_description(
         if description:
             print(f"📝 User description: {description}")
 
-        # Preparar imágenes para Gemini
-        image_parts = []
+        # Leer bytes de las imágenes
+        contents = []
         for img in images:
             # Reset file pointer first in case it was read before
             await img.seek(0)
-            content = await img.read()
-            # Convert to PIL Image
-            pil_image = Image.open(io.BytesIO(content))
-            image_parts.append(pil_image)
+            contents.append(await img.read())
             # Reset file pointer for potential later use
             await img.seek(0)
 
+        # Same photos + description + prompt already analyzed: skip Gemini
+        cache_key = image_cache.analysis_key(
+            [image_digest(content) for content in contents],
+            description,
+            description_cache.version
+        )
+        cached = image_cache.get_analysis(cache_key)
+        if cached is not None:
+            print(f"⚡ Cached image analysis: {cached.get('atributos', [])}")
+            return cached
+
+        # Preparar imágenes para Gemini (PIL)
+        image_parts = [Image.open(io.BytesIO(content)) for content in contents]
+
         # Construir prompt
         prompt = _build_gemini_prompt(description)
 
         # Llamar a Gemini
-        response = model.generate_content([prompt] + image_parts)
+        response = await _generate_content([prompt] + image_parts)
 
-        print(f"📊 Gemini response received")
+        print("📊 Gemini response received")
 
         # Parse JSON from response
         response_text = response.text.strip()
@@ -113,12 +212,15 @@ async def dog_description(
         response_text = response_text.strip()
 
         result = json.loads(response_text)
+        image_cache.set_analysis(cache_key, result)
 
         print(f"✅ Extracted attributes: {result.get('atributos', [])}")
         print(f"📈 Confidence: {result.get('confianza', 0)}")
 
         return result
 
+    except (LLMTimeoutError, OutboundOverloadedError):
+        raise
     except json.JSONDecodeError as e:
         print(f"❌ Error parsing Gemini JSON response: {e}")
         print(f"Response text: {response.text}")
@@ -145,6 +247,10 @@ async def extract_search_attributes(
 
     Returns:
         List[str]: List of attributes to search for
+
+    Raises:
+        LLMTimeoutError: If Gemini does not answer in time
+        OutboundOverloadedError: If too many Gemini calls are already queued
     """
     if not images and not description:
         return []
@@ -156,34 +262,45 @@ async def extract_search_attributes(
             return result.get("atributos", [])
         return []
 
-    # If only description, use Gemini to extract attributes from text
-    try:
-        print(f"🔍 Extracting search attributes from description...")
-
-        prompt = f"""
-Analiza la siguiente descripción de un perro y extrae los atributos relevantes.
-
-Descripción: {description}
+    # If only description, try the offline extractor before Gemini
+    local_attributes = []
+    if settings.local_extractor_enabled:
+        local_attributes, coverage = local_extractor.extract(description)
+        local_hit = bool(local_attributes) and coverage >= settings.local_extractor_min_coverage
+        local_extractor.record_lookup(local_hit)
+        if local_hit:
+            print(f"⚡ Local search attributes ({coverage:.0%} coverage): {local_attributes}")
+            if random.random() < settings.local_extractor_shadow_rate:
+                task = asyncio.create_task(_compare_with_gemini(description, local_attributes))
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+            return local_attributes
+
+    attributes = await _extract_attributes_with_gemini(description)
+    if local_attributes and attributes:
+        local_extractor.record_agreement(description, local_attributes, attributes)
+    return attributes
+
+
+async def _extract_attributes_with_gemini(description: str) -> List[str]:
+    """
+    Text-only attribute extraction with Gemini, through description_cache.
 
-Extrae atributos como:
-- RAZA: raza aproximada (ej: labrador, mestizo, quiltro, pastor_aleman)
-- COLOR: color(es) del pelaje (ej: amarillo, negro, cafe, blanco)
-- TAMAÑO: pequeno, mediano, grande
-- EDAD: cachorro, joven, adulto, senior
-- CARACTERÍSTICAS ESPECIALES: collar, arnes, manchas, orejas_caidas, pelo_corto, pelo_largo, etc.
+    Raises:
+        LLMTimeoutError: If Gemini does not answer in time
+        OutboundOverloadedError: If too many Gemini calls are already queued
+    """
+    cached = await asyncio.to_thread(description_cache.get, description)
+    if cached is not None:
+        print(f"⚡ Cached search attributes: {cached}")
+        return cached
 
-Formato de respuesta (JSON estricto):
-{{
-  "atributos": ["raza", "color1", "color2", "tamano", "edad", "caracteristica1", ...]
-}}
+    try:
+        print("🔍 Extracting search attributes from description...")
 
-IMPORTANTE:
-- Atributos en minúsculas, sin tildes
-- Usa guiones bajos para espacios (ej: "pastor_aleman", "pelo_largo")
-- Incluye SOLO atributos mencionados o claramente inferibles de la descripción
-"""
+        prompt = SEARCH_ATTRIBUTES_PROMPT.format(description=description)
 
-        response = model.generate_content(prompt)
+        response = await _generate_content(prompt)
         response_text = response.text.strip()
 
         # Remove markdown code blocks if present
@@ -199,8 +316,11 @@ IMPORTANTE:
         attributes = result.get("atributos", [])
 
         print(f"✅ Search attributes: {attributes}")
+        await asyncio.to_thread(description_cache.set, description, attributes)
         return attributes
 
+    except (LLMTimeoutError, OutboundOverloadedError):
+        raise
     except Exception as e:
         print(f"❌ Error extracting search attributes: {e}")
         import traceback
@@ -208,6 +328,17 @@ IMPORTANTE:
         return []
 
 
+async def _compare_with_gemini(description: str, local_attributes: List[str]) -> None:
+    """Shadow check of a local extraction against Gemini (sampled, off the request path)."""
+    try:
+        attributes = await _extract_attributes_with_gemini(description)
+    except Exception as e:
+        print(f"⚠️  Shadow Gemini extraction failed: {e}")
+        return
+    if attributes:
+        local_extractor.record_agreement(description, local_attributes, attributes)
+
+
 # Helper function para tu colega
 def _build_gemini_prompt(description: Optional[str] = None) -> str:
     """
@@ -250,4 +381,11 @@ IMPORTANTE:
 """
     
     description_part = f"Descripción del usuario: {description}" if description else ""
-    return base_prompt.format(description_part=description_part)
\ No newline at end of file
+    return base_prompt.format(description_part=description_part)
+
+
+# Cached text extractions are keyed on both prompts and the model, so any
+# prompt edit or model switch starts from an empty cache
+description_cache = DescriptionCache(
+    prompt_version(GEMINI_MODEL, SEARCH_ATTRIBUTES_PROMPT, _build_gemini_prompt("{description}"))
+)
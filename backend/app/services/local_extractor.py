@@ -0,0 +1,245 @@
+"""
+Offline Spanish attribute extractor for text-only searches.
+
+Turns descriptions like "quiltro negro grande con collar rojo" into the same
+closed vocabulary Gemini is asked for (see SEARCH_ATTRIBUTES_PROMPT), with
+an accent-stripping normalizer, a synonym lexicon and a longest-match
+phrase matcher. Coverage is the share of content words it understood; below
+settings.local_extractor_min_coverage the caller falls back to Gemini.
+"""
+from typing import Dict, List, Optional, Tuple
+import re
+import threading
+import unicodedata
+
+# Canonical attribute -> phrases (accent-free, lowercase) that mean it.
+# Single gendered adjectives/nouns ending in "o" also match their -a/-os/-as
+# forms, see _variants().
+SYNONYMS: Dict[str, List[str]] = {
+    # Breeds
+    "quiltro": ["quiltro", "kiltro", "callejero", "perro de la calle"],
+    "mestizo": ["mestizo", "mezcla", "cruza", "cruzado", "sin raza"],
+    "labrador": ["labrador", "labradora", "lab"],
+    "golden_retriever": ["golden", "golden retriever"],
+    "pastor_aleman": ["pastor aleman", "ovejero", "ovejero aleman"],
+    "border_collie": ["border collie", "border"],
+    "husky": ["husky", "husky siberiano", "siberiano"],
+    "poodle": ["poodle", "caniche"],
+    "beagle": ["beagle"],
+    "chihuahua": ["chihuahua"],
+    "bulldog": ["bulldog", "bulldog frances", "bulldog ingles"],
+    "pitbull": ["pitbull", "pit bull", "pit"],
+    "rottweiler": ["rottweiler"],
+    "boxer": ["boxer"],
+    "schnauzer": ["schnauzer"],
+    "dachshund": ["dachshund", "salchicha", "perro salchicha"],
+    "cocker": ["cocker", "cocker spaniel"],
+    "yorkshire": ["yorkshire", "yorkshire terrier", "yorki", "yorkie"],
+    "shih_tzu": ["shih tzu", "shitzu"],
+    "pug": ["pug", "carlino"],
+    "dalmata": ["dalmata"],
+    "maltes": ["maltes", "bichon maltes"],
+    "terrier": ["terrier"],
+    # Colors
+    "amarillo": ["amarillo", "dorado", "rubio", "canelo"],
+    "negro": ["negro", "negrito", "azabache"],
+    "cafe": ["cafe", "marron", "chocolate", "cafecito"],
+    "blanco": ["blanco", "blanquito"],
+    "gris": ["gris", "plomo", "plomizo"],
+    "beige": ["beige", "crema"],
+    "atigrado": ["atigrado", "barcino"],
+    "tricolor": ["tricolor"],
+    # Sizes
+    "pequeno": ["pequeno", "chico", "chiquito", "pequenito", "mini", "toy"],
+    "mediano": ["mediano", "tamano mediano", "tamano medio"],
+    "grande": ["grande", "grandes", "grandote", "enorme"],
+    # Ages
+    "cachorro": ["cachorro", "cachorrito", "bebe"],
+    "joven": ["joven", "jovenes"],
+    "adulto": ["adulto"],
+    "senior": ["senior", "viejo", "viejito", "anciano", "mayor"],
+    # Accessories
+    "collar": ["collar", "collares"],
+    "arnes": ["arnes", "pechera"],
+    "placa": ["placa", "placa de identificacion", "chapita", "medalla"],
+    "cadena": ["cadena"],
+    "ropa": ["ropa", "ropita", "chaleco", "polera", "abrigo"],
+    # Marks and condition
+    "manchas": ["manchas", "mancha", "manchado", "manchitas", "pintas", "pintado"],
+    "cicatrices": ["cicatriz", "cicatrices"],
+    "orejas_caidas": ["orejas caidas", "orejas gachas", "orejas colgando"],
+    "orejas_paradas": ["orejas paradas", "orejas erguidas", "orejas levantadas"],
+    "pelo_corto": ["pelo corto", "pelaje corto", "pelito corto"],
+    "pelo_largo": ["pelo largo", "pelaje largo", "peludo", "lanudo"],
+    "pelo_crespo": ["pelo crespo", "pelo rizado", "crespo", "rizado"],
+    "heridas": ["herido", "heridas", "lastimado"],
+    "cojera": ["cojera", "cojo", "cojea", "cojeando", "renguea"],
+    "cola_corta": ["cola corta", "sin cola", "cola cortada"],
+}
+
+# Colors an accessory can have: "collar rojo" -> collar (the color is
+# understood but not emitted; Gemini's vocabulary has no accessory colors)
+ACCESSORY_COLORS = {
+    "rojo", "azul", "verde", "negro", "cafe", "blanco", "amarillo",
+    "rosado", "morado", "naranjo", "gris", "celeste", "fucsia",
+}
+ACCESSORIES = {"collar", "arnes", "placa", "cadena", "ropa"}
+
+# Words that carry no attribute and do not count against coverage
+STOPWORDS = {
+    "perro", "perra", "perrito", "perrita", "perros", "mascota", "can",
+    "un", "una", "unos", "unas", "el", "la", "los", "las", "lo",
+    "de", "del", "con", "y", "e", "o", "u", "a", "al", "en", "que",
+    "muy", "bien", "algo", "medio", "bastante", "poco", "mas",
+    "color", "colores", "tono", "raza", "tamano", "tipo", "parecido", "parece",
+    "es", "era", "esta", "estaba", "tiene", "tenia", "lleva", "llevaba", "usa",
+    "usaba", "anda", "andaba", "se", "ve", "veia", "como", "entre",
+    "mi", "su", "sus", "busco", "buscando", "perdido", "perdida", "pelo",
+}
+
+NEGATIONS = {"sin"}
+MAX_PHRASE_WORDS = 4
+
+
+def normalize_text(text: str) -> List[str]:
+    """
+    Accent-free, lowercase words: "Quiltro CAFÉ, pequeño" -> ["quiltro", "cafe", "pequeno"].
+    """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return re.findall(r"[a-z0-9]+", stripped)
+
+
+def _variants(phrase: str) -> List[str]:
+    """A phrase plus, for single words ending in -o, its -a/-os/-as forms."""
+    if " " in phrase or not phrase.endswith("o"):
+        return [phrase]
+    stem = phrase[:-1]
+    return [phrase, stem + "a", stem + "os", stem + "as"]
+
+
+class LocalAttributeExtractor:
+    """Lexicon-based extractor with Gemini-agreement bookkeeping."""
+
+    def __init__(self, synonyms: Optional[Dict[str, List[str]]] = None):
+        """
+        Args:
+            synonyms: Canonical attribute -> phrases (default SYNONYMS)
+        """
+        self.phrases: Dict[Tuple[str, ...], str] = {}
+        for attribute, phrases in (synonyms or SYNONYMS).items():
+            for phrase in phrases:
+                for variant in _variants(phrase):
+                    self.phrases[tuple(normalize_text(variant))] = attribute
+        self.colors = {
+            tuple(normalize_text(variant)): color
+            for color in ACCESSORY_COLORS for variant in _variants(color)
+        }
+
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.local_hits = 0
+        self.comparisons = 0
+        self.exact_agreements = 0
+        self.agreement_total = 0.0
+
+    def _match(self, words: List[str], start: int, table: Dict[Tuple[str, ...], str]) -> Tuple[Optional[str], int]:
+        """Longest phrase of table starting at words[start]: (attribute, length) or (None, 0)."""
+        for length in range(min(MAX_PHRASE_WORDS, len(words) - start), 0, -1):
+            attribute = table.get(tuple(words[start:start + length]))
+            if attribute:
+                return attribute, length
+        return None, 0
+
+    def extract(self, description: str) -> Tuple[List[str], float]:
+        """
+        Extract attributes from a description.
+
+        Args:
+            description: Free-text search description (Spanish)
+
+        Returns:
+            Tuple of (attributes in order of appearance, coverage 0-1).
+            Coverage is matched content words / content words.
+        """
+        words = normalize_text(description)
+        attributes: List[str] = []
+        content_words = 0
+        matched_words = 0
+        negated = False
+
+        position = 0
+        while position < len(words):
+            attribute, length = self._match(words, position, self.phrases)
+            if not attribute:
+                word = words[position]
+                if word in NEGATIONS:
+                    negated = True
+                elif word not in STOPWORDS:
+                    content_words += 1
+                    negated = False
+                position += 1
+                continue
+
+            content_words += length
+            matched_words += length
+            position += length
+
+            # "sin collar": understood, but not an attribute of the dog
+            if not negated and attribute not in attributes:
+                attributes.append(attribute)
+
+            # "collar rojo": the color belongs to the accessory, not the coat
+            if attribute in ACCESSORIES and position < len(words):
+                color, color_length = self._match(words, position, self.colors)
+                if color:
+                    content_words += color_length
+                    matched_words += color_length
+                    position += color_length
+            negated = False
+
+        coverage = matched_words / content_words if content_words else 0.0
+        return attributes, coverage
+
+    def record_lookup(self, local_hit: bool) -> None:
+        """Count a search that tried the local extractor."""
+        with self._lock:
+            self.lookups += 1
+            if local_hit:
+                self.local_hits += 1
+
+    def record_agreement(self, description: str, local: List[str], gemini: List[str]) -> float:
+        """
+        Log and count how closely the local result matches Gemini's.
+
+        Returns:
+            Jaccard similarity of the two attribute sets
+        """
+        local_set, gemini_set = set(local), set(gemini)
+        union = local_set | gemini_set
+        agreement = len(local_set & gemini_set) / len(union) if union else 1.0
+
+        with self._lock:
+            self.comparisons += 1
+            self.agreement_total += agreement
+            if local_set == gemini_set:
+                self.exact_agreements += 1
+
+        print(f"🔤 Local vs Gemini agreement {agreement:.2f} for '{description[:60]}': local={local} gemini={gemini}")
+        return agreement
+
+    def stats(self) -> dict:
+        """Hit rate and agreement with Gemini."""
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "local_hits": self.local_hits,
+                "hit_rate": round(self.local_hits / self.lookups, 4) if self.lookups else 0.0,
+                "comparisons": self.comparisons,
+                "mean_agreement": round(self.agreement_total / self.comparisons, 4) if self.comparisons else None,
+                "exact_agreement_rate": round(self.exact_agreements / self.comparisons, 4) if self.comparisons else None,
+            }
+
+
+# Global instance
+local_extractor = LocalAttributeExtractor()
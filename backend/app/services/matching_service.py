@@ -3,16 +3,269 @@ Matching service for finding similar dogs based on attributes and image similari
 Uses Jaccard similarity, vector similarity, and distance-based filtering.
 """
 from typing import List, Dict, Optional, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy.orm import Session, selectinload, undefer
+from sqlalchemy import func, and_, or_, text, null
+import heapq
+import itertools
 import math
+import re
+import threading
 
-from app.models.dog_sighting import DogSighting
+from app.database import SessionLocal
+from app.models.dog_sighting import DogSighting, DogSightingImageEmbedding
+from app.services.embedding_index import (
+    EmbeddingIndex,
+    QUANTIZATION_SCORE_MARGIN,
+    cosine_similarities,
+    max_cosine_similarity,
+    rescore_pool,
+    to_float_array,
+)
+from app.services.attribute_index import AttributeIndex
+from app.services.vocabulary_service import vocabulary_service
+from app.services.search_cache import search_cache
 from app.config import settings
+from app.utils.readiness import readiness
 
 
 class MatchingService:
     """Service for matching dog attributes and finding similar dogs."""
+
+    # Tie-breaker so heap entries never compare DogSighting objects; negated
+    # so that, as in the stable sorts of the scan paths, earlier candidates win ties
+    _sequence = itertools.count()
+
+    def __init__(self):
+        """Create the in-memory search indexes (filled lazily from the database)."""
+        self.embedding_index = EmbeddingIndex(
+            dimension=settings.embedding_dimension,
+            dtype=settings.embedding_index_dtype,
+            slots=settings.max_images_per_sighting
+        )
+        self.coarse_index = EmbeddingIndex(
+            dimension=settings.coarse_embedding_dimension,
+            dtype=settings.embedding_index_dtype,
+            column="image_embedding_coarse"
+        )
+        self.attribute_index = AttributeIndex()
+        # (major, minor) of the pgvector extension, read on the first ANN search
+        self._pgvector_version: Optional[Tuple[int, int]] = None
+        # One load at a time per index (startup warm-up, background reloads)
+        self._load_locks = {
+            index: threading.Lock()
+            for index in (self.embedding_index, self.coarse_index, self.attribute_index)
+        }
+
+    def _enabled_indexes(self) -> list:
+        """The in-memory search indexes enabled in settings."""
+        indexes = []
+        if settings.attribute_search_mode == "index":
+            indexes.append(self.attribute_index)
+        if settings.vector_search_mode == "memory":
+            indexes.append(self.embedding_index)
+        if settings.vector_search_mode == "two_stage":
+            indexes.append(self.coarse_index)
+        return indexes
+
+    def indexes_loaded(self) -> bool:
+        """Whether every enabled in-memory index is loaded (True if none is enabled)."""
+        return all(index.loaded for index in self._enabled_indexes())
+
+    def load_indexes(self, db: Session) -> None:
+        """
+        Build the in-memory search indexes enabled in settings, unless a
+        concurrent load already made them fresh.
+        """
+        for index in self._enabled_indexes():
+            self._load_index(index, db)
+
+    def _load_index(self, index, db: Session, wait: bool = True) -> None:
+        """
+        Load an index unless another load is running (wait=False) or has just
+        made it fresh (wait=True waits for it instead).
+        """
+        lock = self._load_locks[index]
+        if not lock.acquire(blocking=wait):
+            return
+        try:
+            if index.is_stale(settings.search_index_ttl_seconds):
+                index.load(db)
+        finally:
+            lock.release()
+
+    def _reload_in_background(self, index) -> None:
+        """
+        Load or reload an index outside the request. A first load also
+        updates the "search_indexes" readiness component (a failed TTL
+        reload keeps serving the previous contents, so it does not).
+        """
+        db = SessionLocal()
+        try:
+            self._load_index(index, db, wait=False)
+        except Exception as e:
+            print(f"❌ Search index reload failed: {e}")
+            if not index.loaded:
+                readiness.mark_failed("search_indexes", e)
+        else:
+            if self.indexes_loaded() and not readiness.is_ready(["search_indexes"]):
+                readiness.mark_ready("search_indexes")
+        finally:
+            db.close()
+
+    def _tracks_writes(self, index) -> bool:
+        """Whether writes must reach an index: it is loaded or being loaded (replayed after the swap)."""
+        return index.loaded or self._load_locks[index].locked()
+
+    def _index_ready(self, index) -> bool:
+        """
+        Whether an in-memory index can serve a search.
+
+        Loads and TTL reloads run in a background thread (one at a time per
+        index), so a search never builds an index on the event loop: a stale
+        index keeps serving until the new contents are swapped in, and an
+        index that was never loaded sends the search to the database path.
+        """
+        if index.is_stale(settings.search_index_ttl_seconds) and not self._load_locks[index].locked():
+            threading.Thread(
+                target=self._reload_in_background, args=(index,), name="search-index-load", daemon=True
+            ).start()
+        return index.loaded
+
+    def on_sighting_saved(self, sighting: DogSighting) -> None:
+        """
+        Keep the in-memory indexes in sync after a sighting is created or changed.
+        Call after commit/refresh so id, status and embedding are final.
+        Indexes that were never loaded (and are not loading) are skipped;
+        their first load reads the row from the database. Cached searches covering the sighting's
+        location are dropped.
+
+        Args:
+            sighting: The persisted DogSighting
+        """
+        for index in (self.embedding_index, self.coarse_index):
+            if not self._tracks_writes(index):
+                continue
+            if sighting.status == "active":
+                # upsert drops the sighting if it has no usable embedding
+                index.upsert(
+                    sighting.id,
+                    self._sighting_embeddings(sighting) if index.slots > 1 else getattr(sighting, index.column),
+                    sighting.latitude,
+                    sighting.longitude
+                )
+            else:
+                index.remove(sighting.id)
+
+        if self._tracks_writes(self.attribute_index):
+            if sighting.status == "active":
+                self.attribute_index.upsert(
+                    sighting.id,
+                    self._sighting_token_ids(sighting),
+                    sighting.latitude,
+                    sighting.longitude
+                )
+            else:
+                self.attribute_index.remove(sighting.id)
+
+        # Drafts have never been searchable, so no cached result can change
+        if sighting.status == "draft":
+            return
+        dropped = search_cache.invalidate_near(
+            sighting.latitude, sighting.longitude, self.calculate_distance_km
+        )
+        if dropped:
+            print(f"🗑️  Invalidated {dropped} cached searches")
+
+    @staticmethod
+    def _sighting_token_ids(sighting: DogSighting) -> List[int]:
+        """
+        Vocabulary ids of a sighting's attributes, interning them for
+        sightings stored before attribute_bits existed.
+        """
+        if sighting.attribute_bits is not None:
+            return vocabulary_service.decode(sighting.attribute_bits)
+        return vocabulary_service.intern(sighting.attributes)
+
+    @staticmethod
+    def _sighting_embeddings(sighting: DogSighting) -> list:
+        """
+        Every photo embedding of a sighting, falling back to the primary
+        image_embedding for sightings stored before per-photo embeddings.
+        """
+        embeddings = [image.embedding for image in sighting.image_embeddings]
+        if not embeddings and sighting.image_embedding is not None:
+            embeddings = [sighting.image_embedding]
+        return embeddings
+
+    def _rescore(
+        self,
+        search_embedding: List[float],
+        results: List[Tuple[DogSighting, float, Optional[float]]],
+        limit: int,
+        search_embeddings: Optional[List[List[float]]] = None
+    ) -> List[Tuple[DogSighting, float, Optional[float]]]:
+        """
+        Re-rank approximate vector matches with exact cosine similarity against
+        the stored vectors (float32, or float16 under halfvec storage).
+
+        Args:
+            search_embedding: Query embedding
+            results: Candidates with image_embedding loaded and approximate scores
+            limit: Maximum results to return
+            search_embeddings: All query photo embeddings; when given, scores are
+                the max over query x sighting photo pairs (image_embeddings loaded)
+
+        Returns:
+            Candidates above min_match_score with exact scores, best first
+        """
+        if search_embeddings:
+            scores = [
+                max_cosine_similarity(search_embeddings, self._sighting_embeddings(candidate))
+                for candidate, _, _ in results
+            ]
+        else:
+            scores = cosine_similarities(
+                search_embedding, [candidate.image_embedding for candidate, _, _ in results]
+            )
+
+        rescored = [
+            (candidate, float(score), distance_km)
+            for (candidate, _, distance_km), score in zip(results, scores)
+            if score >= settings.min_match_score
+        ]
+        rescored.sort(key=lambda x: (x[1], -x[2] if x[2] is not None else 0), reverse=True)
+        return rescored[:limit]
+
+    def _load_hits(
+        self,
+        db: Session,
+        hits: List[Tuple[object, float, Optional[float]]],
+        with_embeddings: bool = False
+    ) -> List[Tuple[DogSighting, float, Optional[float]]]:
+        """
+        Replace sighting ids from an in-memory index with their database rows,
+        keeping order. Ids that are gone or no longer active are dropped.
+        """
+        if not hits:
+            return []
+
+        query = db.query(DogSighting).filter(
+            DogSighting.id.in_([sighting_id for sighting_id, _, _ in hits]),
+            DogSighting.status == "active"
+        )
+        if with_embeddings:
+            query = query.options(
+                undefer(DogSighting.image_embedding),
+                selectinload(DogSighting.image_embeddings)
+            )
+
+        sightings = {sighting.id: sighting for sighting in query}
+
+        return [
+            (sightings[sighting_id], score, distance_km)
+            for sighting_id, score, distance_km in hits
+            if sighting_id in sightings
+        ]
     
     @staticmethod
     def calculate_jaccard_similarity(set_a: set, set_b: set) -> float:
@@ -35,6 +288,53 @@ class MatchingService:
         union = len(set_a | set_b)
         
         return intersection / union if union > 0 else 0.0
+
+    @staticmethod
+    def calculate_jaccard_similarity_bits(bits_a: int, bits_b: int, extra_a: int = 0) -> float:
+        """
+        Calculate Jaccard similarity between two attribute bitsets.
+
+        Jaccard similarity = popcount(A & B) / popcount(A | B)
+
+        Args:
+            bits_a: First bitset (see VocabularyService.to_int)
+            bits_b: Second bitset
+            extra_a: Members of A without a bit (tokens missing from the
+                vocabulary); they only count towards the union
+
+        Returns:
+            float: Similarity score between 0 and 1
+        """
+        if not (bits_a or extra_a) or not bits_b:
+            return 0.0
+
+        intersection = (bits_a & bits_b).bit_count()
+        union = (bits_a | bits_b).bit_count() + extra_a
+
+        return intersection / union
+
+    def _attribute_scorer(self, search_attributes: List[str]):
+        """
+        Build a Jaccard scorer for one query, usable against any candidate.
+
+        Candidates with attribute_bits are scored by popcount; older rows
+        fall back to set Jaccard on their attribute list.
+
+        Returns:
+            Callable (DogSighting) -> float
+        """
+        search_set = set(search_attributes)
+        token_ids, unknown_tokens = vocabulary_service.lookup(search_set)
+        search_bits = vocabulary_service.to_int(vocabulary_service.encode(token_ids))
+
+        def score(candidate: DogSighting) -> float:
+            if candidate.attribute_bits is not None:
+                return self.calculate_jaccard_similarity_bits(
+                    search_bits, vocabulary_service.to_int(candidate.attribute_bits), unknown_tokens
+                )
+            return self.calculate_jaccard_similarity(search_set, set(candidate.attributes))
+
+        return score
     
     @staticmethod
     def calculate_distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -65,6 +365,103 @@ class MatchingService:
         c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
         
         return R * c
+
+    @staticmethod
+    def distance_km_sql(latitude: float, longitude: float):
+        """
+        SQL expression for the Haversine distance (km) from a point to each
+        sighting, so radius filters can run inside the database.
+
+        Args:
+            latitude, longitude: Search coordinate
+
+        Returns:
+            SQLAlchemy column expression
+        """
+        R = 6371.0
+
+        dlat = func.radians(DogSighting.latitude - latitude)
+        dlon = func.radians(DogSighting.longitude - longitude)
+
+        a = (
+            func.power(func.sin(dlat / 2), 2)
+            + func.cos(func.radians(latitude))
+            * func.cos(func.radians(DogSighting.latitude))
+            * func.power(func.sin(dlon / 2), 2)
+        )
+
+        return 2 * R * func.asin(func.least(1.0, func.sqrt(a)))
+
+    @staticmethod
+    def bounding_box_sql(latitude: float, longitude: float, radius_km: float) -> list:
+        """
+        Lat/lng bounding box around a point, usable by the
+        ix_dog_sightings_active_location index before the exact Haversine check.
+
+        Args:
+            latitude, longitude: Search coordinate
+            radius_km: Search radius
+
+        Returns:
+            List of SQLAlchemy filter expressions
+        """
+        # Exact on the sphere of distance_km_sql (R = 6371 km), so the box never
+        # cuts into the circle; longitude degrees shrink with cos(latitude)
+        angle = radius_km / 6371.0
+        lat_delta = math.degrees(angle)
+        lon_delta = math.degrees(math.asin(min(1.0, math.sin(angle) / max(math.cos(math.radians(latitude)), 0.01))))
+
+        return [
+            DogSighting.latitude.between(latitude - lat_delta, latitude + lat_delta),
+            DogSighting.longitude.between(longitude - lon_delta, longitude + lon_delta),
+        ]
+
+    def active_sightings_query(
+        self,
+        db: Session,
+        entities: list,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        radius_km: Optional[int] = None
+    ):
+        """
+        Query active sightings with the radius filter pushed into SQL.
+
+        Rows are selected as (*entities, distance_km). When a search point is
+        given, distance_km is computed by the query and rows outside the radius
+        are dropped using a bounding box followed by exact Haversine. Sightings
+        without coordinates are kept with distance_km = NULL, as before.
+
+        Args:
+            db: Database session
+            entities: Columns or models to select
+            latitude, longitude: Optional search coordinate
+            radius_km: Radius for location filtering (default from config)
+
+        Returns:
+            SQLAlchemy query
+        """
+        if radius_km is None:
+            radius_km = settings.search_radius_km
+
+        if not (latitude and longitude):
+            return db.query(*entities, null().label("distance_km")).filter(
+                DogSighting.status == "active"
+            )
+
+        distance_km = self.distance_km_sql(latitude, longitude)
+
+        return db.query(*entities, distance_km.label("distance_km")).filter(
+            DogSighting.status == "active",
+            or_(
+                DogSighting.latitude.is_(None),
+                DogSighting.longitude.is_(None),
+                and_(
+                    *self.bounding_box_sql(latitude, longitude, radius_km),
+                    distance_km <= radius_km
+                )
+            )
+        )
     
     def find_matches(
         self,
@@ -73,7 +470,8 @@ class MatchingService:
         latitude: Optional[float] = None,
         longitude: Optional[float] = None,
         radius_km: Optional[int] = None,
-        limit: int = 20
+        limit: int = 20,
+        mode: Optional[str] = None
     ) -> List[Tuple[DogSighting, float, Optional[float]]]:
         """
         Find matching dog sightings based on attributes and location.
@@ -85,48 +483,35 @@ class MatchingService:
             longitude: Optional search longitude
             radius_km: Optional radius for location filtering (default from config)
             limit: Maximum results to return
+            mode: "index" (inverted attribute index) or "scan" (all active rows).
+                Defaults to settings.attribute_search_mode.
             
         Returns:
             List of tuples: (DogSighting, match_score, distance_km)
             Sorted by match score descending
         """
-        # Use config radius if not provided
-        if radius_km is None:
-            radius_km = settings.search_radius_km
-        
-        # Query active sightings only
-        query = db.query(DogSighting).filter(
-            DogSighting.status == "active"
-        )
-        
-        # Get all candidates
-        candidates = query.all()
+        if (mode or settings.attribute_search_mode) == "index":
+            return self.find_matches_by_attributes_index(
+                db, search_attributes, latitude, longitude, radius_km, limit
+            )
+
+        # Query active sightings near the search point only
+        candidates = self.active_sightings_query(
+            db, [DogSighting], latitude, longitude, radius_km
+        ).all()
         
         # Calculate match scores
         results = []
-        search_set = set(search_attributes)
+        jaccard = self._attribute_scorer(search_attributes)
         
-        for candidate in candidates:
+        for candidate, distance_km in candidates:
             # Calculate Jaccard similarity
-            candidate_set = set(candidate.attributes)
-            match_score = self.calculate_jaccard_similarity(search_set, candidate_set)
+            match_score = jaccard(candidate)
             
             # Skip if below minimum threshold
             if match_score < settings.min_match_score:
                 continue
             
-            # Calculate distance if location provided
-            distance_km = None
-            if latitude and longitude and candidate.latitude and candidate.longitude:
-                distance_km = self.calculate_distance_km(
-                    latitude, longitude,
-                    candidate.latitude, candidate.longitude
-                )
-                
-                # Skip if outside radius
-                if distance_km > radius_km:
-                    continue
-            
             results.append((candidate, match_score, distance_km))
         
         # Sort by match score (primary) and distance (secondary)
@@ -139,6 +524,36 @@ class MatchingService:
         return results[:limit]
 
     def find_matches_by_attributes(
+        self,
+        db: Session,
+        search_attributes: List[str],
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        radius_km: Optional[int] = None,
+        limit: int = 20,
+        mode: Optional[str] = None
+    ) -> List[Tuple[DogSighting, float, Optional[float]]]:
+        """
+        Find matches using only attribute similarity.
+
+        Args:
+            mode: "index" (inverted attribute index) or "scan" (all active
+                rows). Defaults to settings.attribute_search_mode.
+        """
+        mode = mode or settings.attribute_search_mode
+
+        if mode == "scan":
+            return self.find_matches_by_attributes_scan(
+                db, search_attributes, latitude, longitude, radius_km, limit
+            )
+        if mode == "index":
+            return self.find_matches_by_attributes_index(
+                db, search_attributes, latitude, longitude, radius_km, limit
+            )
+
+        raise ValueError(f"Unknown attribute search mode: {mode}")
+
+    def find_matches_by_attributes_index(
         self,
         db: Session,
         search_attributes: List[str],
@@ -147,30 +562,58 @@ class MatchingService:
         radius_km: Optional[int] = None,
         limit: int = 20
     ) -> List[Tuple[DogSighting, float, Optional[float]]]:
-        """Find matches using only attribute similarity."""
+        """
+        Find matches through the inverted attribute index. Only sightings that
+        share enough attributes to reach min_match_score are scored, then the
+        top-k rows are loaded from the database. Until the index is loaded,
+        the search scans the database (find_matches_by_attributes_scan).
+        """
+        if not self._index_ready(self.attribute_index):
+            return self.find_matches_by_attributes_scan(
+                db, search_attributes, latitude, longitude, radius_km, limit
+            )
+
         if radius_km is None:
             radius_km = settings.search_radius_km
 
-        candidates = db.query(DogSighting).filter(DogSighting.status == "active").all()
+        token_ids, unknown_tokens = vocabulary_service.lookup(search_attributes)
+        hits = self.attribute_index.search(
+            token_ids,
+            min_score=settings.min_match_score,
+            latitude=latitude,
+            longitude=longitude,
+            radius_km=radius_km,
+            unknown_tokens=unknown_tokens
+        )
+        hits.sort(key=lambda x: (x[1], -x[2] if x[2] is not None else 0), reverse=True)
+
+        return self._load_hits(db, hits[:limit])
+
+    def find_matches_by_attributes_scan(
+        self,
+        db: Session,
+        search_attributes: List[str],
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        radius_km: Optional[int] = None,
+        limit: int = 20
+    ) -> List[Tuple[DogSighting, float, Optional[float]]]:
+        """Find matches using only attribute similarity (scans active rows within the radius)."""
+        candidates = self.active_sightings_query(
+            db, [DogSighting], latitude, longitude, radius_km
+        ).all()
         results = []
-        search_attr_set = set(search_attributes)
+        jaccard = self._attribute_scorer(search_attributes)
 
-        for candidate in candidates:
+        for candidate, distance_km in candidates:
             if not candidate.attributes:
                 continue
 
-            candidate_set = set(candidate.attributes)
-            score = self.calculate_jaccard_similarity(search_attr_set, candidate_set)
+            score = jaccard(candidate)
 
             if score < settings.min_match_score:
                 continue
 
-            distance_km = None
-            if latitude and longitude and candidate.latitude and candidate.longitude:
-                distance_km = self.calculate_distance_km(latitude, longitude, candidate.latitude, candidate.longitude)
-                if distance_km > radius_km:
-                    continue
-
             results.append((candidate, score, distance_km))
 
         results.sort(key=lambda x: (x[1], -x[2] if x[2] is not None else 0), reverse=True)
@@ -183,35 +626,396 @@ class MatchingService:
         latitude: Optional[float] = None,
         longitude: Optional[float] = None,
         radius_km: Optional[int] = None,
+        limit: int = 20,
+        mode: Optional[str] = None,
+        coarse_embedding: Optional[List[float]] = None,
+        search_embeddings: Optional[List[List[float]]] = None
+    ) -> List[Tuple[DogSighting, float, Optional[float]]]:
+        """
+        Find matches using only vector similarity.
+
+        Args:
+            mode: "ann" (pgvector HNSW index), "memory" (in-process NumPy
+                index), "two_stage" (coarse index + full re-scoring) or
+                "exact" (Python scan). Defaults to settings.vector_search_mode.
+            coarse_embedding: Query embedding at settings.coarse_embedding_dimension,
+                required by "two_stage" (falls back to "ann" without it)
+            search_embeddings: Embeddings of every query photo. Every mode then
+                scores a sighting by its best query photo x sighting photo pair
+                (max-similarity); without them only search_embedding is used.
+        """
+        mode = mode or settings.vector_search_mode
+
+        if mode == "two_stage" and coarse_embedding is None:
+            print("⚠️  No coarse query embedding, falling back to ann vector search")
+            mode = "ann"
+
+        if mode == "exact":
+            return self.find_matches_by_vectors_exact(
+                db, search_embedding, latitude, longitude, radius_km, limit,
+                search_embeddings=search_embeddings
+            )
+        if mode == "ann":
+            return self.find_matches_by_vectors_ann(
+                db, search_embedding, latitude, longitude, radius_km, limit,
+                search_embeddings=search_embeddings
+            )
+        if mode == "memory":
+            return self.find_matches_by_vectors_memory(
+                db, search_embeddings or [search_embedding], latitude, longitude, radius_km, limit
+            )
+        if mode == "two_stage":
+            return self.find_matches_by_vectors_two_stage(
+                db, search_embedding, coarse_embedding, latitude, longitude, radius_km, limit,
+                search_embeddings=search_embeddings
+            )
+
+        raise ValueError(f"Unknown vector search mode: {mode}")
+
+    def find_matches_by_vectors_ann(
+        self,
+        db: Session,
+        search_embedding: List[float],
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        radius_km: Optional[int] = None,
+        limit: int = 20,
+        ef_search: Optional[int] = None,
+        search_embeddings: Optional[List[List[float]]] = None
+    ) -> List[Tuple[DogSighting, float, Optional[float]]]:
+        """
+        Find matches with ordered cosine distance (<=>) queries served by the
+        HNSW indexes on the per-photo embeddings and on image_embedding. Status,
+        score and radius filters run in the same SQL statements.
+
+        The per-photo query matches any photo of a sighting and keeps each
+        sighting's best distance; the image_embedding query also covers
+        sightings whose photo rows have not been backfilled yet.
+
+        A plain HNSW scan stops after ef_search neighbours and filters them
+        afterwards, so a small radius would leave few or no rows. Radius
+        searches therefore use pgvector's iterative scan (settings.hnsw_iterative_scan)
+        or, when it is unavailable or off, an exact ORDER BY over the rows
+        inside the bounding box.
+
+        Args:
+            ef_search: HNSW candidate list size (default settings.hnsw_ef_search).
+                Higher values improve recall at the cost of latency.
+            search_embeddings: Embeddings of every query photo. Each runs its
+                own HNSW queries and the union is re-scored by max-similarity
+                over every query photo x sighting photo pair.
+        """
+        # Several photo rows can belong to one sighting, so fetch enough of
+        # them to still fill the limit after keeping the best per sighting
+        photo_limit = limit * settings.max_images_per_sighting
+
+        # ef_search must be at least the LIMIT or the index returns fewer rows
+        ef_search = max(ef_search or settings.hnsw_ef_search, photo_limit)
+        db.execute(
+            text("SELECT set_config('hnsw.ef_search', :ef_search, true)"),
+            {"ef_search": str(ef_search)}
+        )
+        exact_order = bool(latitude and longitude) and not self._iterative_scan(db)
+        max_distance = 1 - settings.min_match_score
+
+        candidates = {}
+        for query_embedding in search_embeddings or [search_embedding]:
+            photo_distance = DogSightingImageEmbedding.embedding.cosine_distance(query_embedding)
+            sighting_distance = DogSighting.image_embedding.cosine_distance(query_embedding)
+
+            photo_query = self.active_sightings_query(
+                db,
+                [DogSighting, photo_distance.label("cosine_distance")],
+                latitude, longitude, radius_km
+            ).join(
+                DogSightingImageEmbedding,
+                DogSightingImageEmbedding.sighting_id == DogSighting.id
+            ).filter(photo_distance <= max_distance)
+
+            sighting_query = self.active_sightings_query(
+                db,
+                [DogSighting, sighting_distance.label("cosine_distance")],
+                latitude, longitude, radius_km
+            ).filter(
+                DogSighting.image_embedding.isnot(None),
+                sighting_distance <= max_distance
+            )
+
+            for query, distance, query_limit in (
+                (photo_query, photo_distance, photo_limit),
+                (sighting_query, sighting_distance, limit),
+            ):
+                if search_embeddings:
+                    query = query.options(
+                        undefer(DogSighting.image_embedding),
+                        selectinload(DogSighting.image_embeddings)
+                    )
+
+                # "+ 0" hides the expression from the HNSW index: the planner then
+                # filters by the location index and sorts the survivors exactly
+                order = distance + 0 if exact_order else distance
+                for candidate, cosine, km in query.order_by(order).limit(query_limit):
+                    score = max(0.0, min(1.0, 1 - cosine))
+                    if candidate.id not in candidates or score > candidates[candidate.id][1]:
+                        candidates[candidate.id] = (candidate, score, km)
+
+        if search_embeddings:
+            return self._rescore(
+                search_embedding, list(candidates.values()), limit, search_embeddings=search_embeddings
+            )
+        # relaxed_order may return neighbours slightly out of order
+        return sorted(candidates.values(), key=lambda result: -result[1])
+
+    def _iterative_scan(self, db: Session) -> bool:
+        """
+        Enable pgvector's iterative HNSW scan for this transaction, so filtered
+        searches keep walking the graph until LIMIT rows pass the filters.
+
+        Returns:
+            bool: False if it is disabled in settings or pgvector is older than 0.8
+        """
+        if settings.hnsw_iterative_scan == "off":
+            return False
+        if self._pgvector_version is None:
+            version = db.execute(
+                text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            ).scalar() or "0.0"
+            major, minor = (re.findall(r"\d+", version) + ["0", "0"])[:2]
+            self._pgvector_version = (int(major), int(minor))
+        if self._pgvector_version < (0, 8):
+            return False
+
+        db.execute(
+            text(
+                "SELECT set_config('hnsw.iterative_scan', :mode, true), "
+                "set_config('hnsw.max_scan_tuples', :max_scan_tuples, true)"
+            ),
+            {"mode": settings.hnsw_iterative_scan, "max_scan_tuples": str(settings.hnsw_max_scan_tuples)}
+        )
+        return True
+
+    def find_matches_by_vectors_memory(
+        self,
+        db: Session,
+        search_embeddings: List[List[float]],
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        radius_km: Optional[int] = None,
         limit: int = 20
     ) -> List[Tuple[DogSighting, float, Optional[float]]]:
-        """Find matches using only vector similarity."""
+        """
+        Find matches by scoring the in-memory embedding index, then load only
+        the top-k rows from the database.
+
+        Every query photo is scored against every sighting photo in one batched
+        matrix product; a sighting's score is its best pair. Until the index
+        is loaded, the search runs on the HNSW index (find_matches_by_vectors_ann).
+        """
+        if not self._index_ready(self.embedding_index):
+            return self.find_matches_by_vectors_ann(
+                db, search_embeddings[0], latitude, longitude, radius_km, limit,
+                search_embeddings=search_embeddings
+            )
+
         if radius_km is None:
             radius_km = settings.search_radius_km
 
-        candidates = db.query(DogSighting).filter(
-            DogSighting.status == "active",
+        # Quantized index scores are approximate: over-fetch and re-score with
+        # the stored vectors, unless those are no more precise than the index
+        # (a float16 index over halfvec storage)
+        quantized = self.embedding_index.quantized and not (
+            settings.embedding_index_dtype == "float16" and settings.embedding_storage == "halfvec"
+        )
+        min_score = settings.min_match_score
+        if quantized:
+            min_score -= QUANTIZATION_SCORE_MARGIN
+
+        hits = self.embedding_index.search(
+            search_embeddings,
+            limit=max(limit, settings.rescore_pool_size) if quantized else limit,
+            min_score=min_score,
+            latitude=latitude,
+            longitude=longitude,
+            radius_km=radius_km
+        )
+
+        if quantized:
+            # Only hits close enough to the cut-off can change places: load and
+            # re-score those instead of the whole pool
+            return self._rescore(
+                search_embeddings[0],
+                self._load_hits(db, rescore_pool(hits, limit), with_embeddings=True),
+                limit,
+                search_embeddings=search_embeddings
+            )
+        return self._load_hits(db, hits)
+
+    def find_matches_by_vectors_two_stage(
+        self,
+        db: Session,
+        search_embedding: List[float],
+        coarse_embedding: List[float],
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        radius_km: Optional[int] = None,
+        limit: int = 20,
+        search_embeddings: Optional[List[List[float]]] = None
+    ) -> List[Tuple[DogSighting, float, Optional[float]]]:
+        """
+        Coarse-to-fine search: scan the short in-memory embeddings of every
+        active sighting, then re-score only the best coarse_candidate_pool
+        candidates with their full vectors loaded from the database (every
+        photo against every query photo when search_embeddings is given).
+        Until the coarse index is loaded, the search runs on the HNSW index.
+        """
+        if not self._index_ready(self.coarse_index):
+            return self.find_matches_by_vectors_ann(
+                db, search_embedding, latitude, longitude, radius_km, limit,
+                search_embeddings=search_embeddings
+            )
+
+        if radius_km is None:
+            radius_km = settings.search_radius_km
+
+        # Coarse scores are only a filter; the threshold is applied after re-scoring
+        hits = self.coarse_index.search(
+            coarse_embedding,
+            limit=max(limit, settings.coarse_candidate_pool),
+            min_score=0.0,
+            latitude=latitude,
+            longitude=longitude,
+            radius_km=radius_km
+        )
+
+        candidates = [
+            result for result in self._load_hits(db, hits, with_embeddings=True)
+            if result[0].image_embedding is not None
+        ]
+        return self._rescore(search_embedding, candidates, limit, search_embeddings=search_embeddings)
+
+    def find_matches_by_vectors_exact(
+        self,
+        db: Session,
+        search_embedding: List[float],
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        radius_km: Optional[int] = None,
+        limit: int = 20,
+        search_embeddings: Optional[List[List[float]]] = None
+    ) -> List[Tuple[DogSighting, float, Optional[float]]]:
+        """
+        Find matches using only vector similarity (exact scan, cosine computed in Python).
+        With search_embeddings, a sighting scores its best query photo x photo pair.
+        """
+        query = self.active_sightings_query(
+            db, [DogSighting], latitude, longitude, radius_km
+        ).filter(
             DogSighting.image_embedding.isnot(None)
-        ).all()
+        ).options(
+            undefer(DogSighting.image_embedding)
+        )
+        if search_embeddings:
+            query = query.options(selectinload(DogSighting.image_embeddings))
+        candidates = query.all()
 
         results = []
-        for candidate in candidates:
-            score = self.calculate_cosine_similarity(search_embedding, candidate.image_embedding)
+        for candidate, distance_km in candidates:
+            if search_embeddings:
+                score = max_cosine_similarity(search_embeddings, self._sighting_embeddings(candidate))
+            else:
+                score = self.calculate_cosine_similarity(
+                    search_embedding, to_float_array(candidate.image_embedding)
+                )
 
             if score < settings.min_match_score:
                 continue
 
-            distance_km = None
-            if latitude and longitude and candidate.latitude and candidate.longitude:
-                distance_km = self.calculate_distance_km(latitude, longitude, candidate.latitude, candidate.longitude)
-                if distance_km > radius_km:
-                    continue
-
             results.append((candidate, score, distance_km))
 
         results.sort(key=lambda x: (x[1], -x[2] if x[2] is not None else 0), reverse=True)
         return results[:limit]
 
+    @staticmethod
+    def _push_top_k(heap: list, limit: int, key: tuple, item: tuple) -> None:
+        """
+        Keep the `limit` largest items (by key) in a min-heap of
+        (key, -sequence, item) entries. Among equal keys the earliest pushed
+        item ranks highest and is the last to be evicted.
+        """
+        entry = (key, -next(MatchingService._sequence), item)
+        if len(heap) < limit:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+    @staticmethod
+    def _sorted_top_k(heap: list) -> List[Tuple[DogSighting, float, Optional[float]]]:
+        """Drain a top-k heap into results sorted by key descending."""
+        return [item for _, _, item in sorted(heap, reverse=True)]
+
+    def find_matches_hybrid(
+        self,
+        db: Session,
+        search_attributes: List[str],
+        search_embedding: List[float],
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        radius_km: Optional[int] = None,
+        limit: int = 20,
+        search_embeddings: Optional[List[List[float]]] = None
+    ) -> Tuple[
+        List[Tuple[DogSighting, float, Optional[float]]],
+        List[Tuple[DogSighting, float, Optional[float]]]
+    ]:
+        """
+        Score attributes and embeddings in one pass over a single candidate query.
+
+        Equivalent to find_matches_by_attributes_scan + find_matches_by_vectors_exact,
+        but loads the active rows once and keeps a bounded top-k heap per signal
+        instead of sorting every match.
+
+        Returns:
+            Tuple of (attribute_results, vector_results), each sorted by score
+            descending and ready for merge_search_results
+        """
+        query = self.active_sightings_query(
+            db, [DogSighting], latitude, longitude, radius_km
+        ).options(
+            undefer(DogSighting.image_embedding)
+        )
+        if search_embeddings:
+            query = query.options(selectinload(DogSighting.image_embeddings))
+        candidates = query.all()
+
+        jaccard = self._attribute_scorer(search_attributes)
+        attribute_heap = []
+        vector_heap = []
+
+        for candidate, distance_km in candidates:
+            # Same ordering as the scan paths: score desc, then closest first
+            distance_key = -distance_km if distance_km is not None else 0
+
+            if candidate.attributes:
+                score = jaccard(candidate)
+                if score >= settings.min_match_score:
+                    self._push_top_k(
+                        attribute_heap, limit, (score, distance_key), (candidate, score, distance_km)
+                    )
+
+            if candidate.image_embedding is not None:
+                if search_embeddings:
+                    score = max_cosine_similarity(search_embeddings, self._sighting_embeddings(candidate))
+                else:
+                    score = self.calculate_cosine_similarity(
+                        search_embedding, to_float_array(candidate.image_embedding)
+                    )
+                if score >= settings.min_match_score:
+                    self._push_top_k(
+                        vector_heap, limit, (score, distance_key), (candidate, score, distance_km)
+                    )
+
+        return self._sorted_top_k(attribute_heap), self._sorted_top_k(vector_heap)
+
     def merge_search_results(
         self,
         attribute_results: List[Tuple[DogSighting, float, Optional[float]]],
@@ -264,24 +1068,38 @@ class MatchingService:
         latitude: Optional[float] = None,
         longitude: Optional[float] = None,
         radius_km: Optional[int] = None,
-        limit: int = 20
+        limit: int = 20,
+        coarse_embedding: Optional[List[float]] = None,
+        search_embeddings: Optional[List[List[float]]] = None
     ) -> List[Tuple[DogSighting, float, Optional[float]]]:
         """
         Find matches using separate attribute + vector search, then merge.
         Uses Reciprocal Rank Fusion for combining results.
+
+        When both signals are present and vector search would scan the table
+        anyway (vector_search_mode == "exact"), both scores are computed in a
+        single pass over the candidates (see find_matches_hybrid).
         """
         attribute_results = []
         vector_results = []
 
-        if search_attributes:
-            attribute_results = self.find_matches_by_attributes(
-                db, search_attributes, latitude, longitude, radius_km, limit
+        if search_attributes and search_embedding is not None and settings.vector_search_mode == "exact":
+            attribute_results, vector_results = self.find_matches_hybrid(
+                db, search_attributes, search_embedding, latitude, longitude, radius_km, limit,
+                search_embeddings=search_embeddings
             )
+        else:
+            if search_attributes:
+                attribute_results = self.find_matches_by_attributes(
+                    db, search_attributes, latitude, longitude, radius_km, limit
+                )
 
-        if search_embedding is not None:
-            vector_results = self.find_matches_by_vectors(
-                db, search_embedding, latitude, longitude, radius_km, limit
-            )
+            if search_embedding is not None:
+                vector_results = self.find_matches_by_vectors(
+                    db, search_embedding, latitude, longitude, radius_km, limit,
+                    coarse_embedding=coarse_embedding,
+                    search_embeddings=search_embeddings
+                )
 
         if len(attribute_results) > 0 and len(vector_results) > 0:
             return self.merge_search_results(attribute_results, vector_results, limit)
@@ -0,0 +1,229 @@
+"""
+Outbound call governor for Gemini and Vertex AI.
+
+Each provider gets a token bucket (requests per second), an AIMD concurrency
+limit that halves on quota errors (429 / RESOURCE_EXHAUSTED) and creeps back
+up on success, a bounded queue of callers waiting for a slot, and jittered
+exponential retries of throttled calls. Bursts wait a little longer instead
+of failing; only an overflowing queue is rejected.
+"""
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict
+import asyncio
+import random
+import time
+
+from app.config import settings
+
+
+class OutboundOverloadedError(RuntimeError):
+    """Too many calls are already queued for a provider."""
+
+
+def is_throttle_error(error: BaseException) -> bool:
+    """
+    Whether an exception is a provider quota / rate limit error.
+
+    Covers google.api_core ResourceExhausted / TooManyRequests (code 429)
+    without importing it, and HTTP errors whose response status is 429.
+    Messages are not inspected: "429" can appear in unrelated text.
+    """
+    if getattr(error, "code", None) == 429:
+        return True
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    return getattr(getattr(error, "response", None), "status_code", None) == 429
+
+
+class TokenBucket:
+    """Requests-per-second limit with bursts of up to `burst` calls."""
+
+    def __init__(self, rate_per_second: float, burst: int):
+        self.rate = rate_per_second
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def take(self) -> float:
+        """
+        Wait for a token.
+
+        Returns:
+            Seconds spent waiting (0.0 if a token was available)
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return waited
+            delay = (1 - self.tokens) / self.rate
+            await asyncio.sleep(delay)
+            waited += delay
+
+
+class OutboundGovernor:
+    """Rate limit, adaptive concurrency limit, queue and retries for one provider."""
+
+    def __init__(
+        self,
+        name: str,
+        rate_per_second: float,
+        burst: int,
+        max_concurrency: int,
+        min_concurrency: int = 1,
+        max_queue: int = 100,
+        max_retries: int = 3,
+        retry_base_seconds: float = 0.5
+    ):
+        self.name = name
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.min_limit = max(1, min_concurrency)
+        self.max_limit = max(self.min_limit, max_concurrency)
+        self.limit = float(self.max_limit)
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+
+        self.in_flight = 0
+        self._waiters = deque()
+        self._last_decrease = 0.0
+
+        # Metrics
+        self.calls = 0
+        self.throttle_events = 0
+        self.retries = 0
+        self.rejected = 0
+        self.rate_limited_waits = 0
+        self.peak_queue_depth = 0
+
+    async def _acquire_slot(self) -> None:
+        """Take a concurrency slot, queueing (bounded) if none is free."""
+        if not self._waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise OutboundOverloadedError(
+                f"{self.name}: {len(self._waiters)} calls already waiting"
+            )
+
+        # _release_slot hands the slot over by resolving the future
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.peak_queue_depth = max(self.peak_queue_depth, len(self._waiters))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                self._waiters.remove(future)
+            else:
+                self._release_slot()
+            raise
+
+    def _release_slot(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        """Hand free slots to queued callers, oldest first."""
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def _on_success(self) -> None:
+        # Additive increase: about +1 slot per `limit` successful calls
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def _on_throttle(self) -> None:
+        self.throttle_events += 1
+        # Multiplicative decrease, at most once per retry interval so one
+        # burst of 429s does not collapse the limit to the minimum
+        now = time.monotonic()
+        if now - self._last_decrease >= self.retry_base_seconds:
+            self.limit = max(self.min_limit, self.limit / 2)
+            self._last_decrease = now
+            print(f"🚦 {self.name} throttled: concurrency limit {self.limit:.1f}")
+
+    async def call(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) under this provider's limits.
+
+        fn is called again for each retry, so pass the coroutine function,
+        not a coroutine.
+
+        Raises:
+            OutboundOverloadedError: If the wait queue is full
+            Exception: Whatever fn raised, after retries for throttle errors
+        """
+        attempt = 0
+        while True:
+            await self._acquire_slot()
+            try:
+                if await self.bucket.take():
+                    self.rate_limited_waits += 1
+                self.calls += 1
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                if not is_throttle_error(e):
+                    raise
+                self._on_throttle()
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                self._on_success()
+                return result
+            finally:
+                self._release_slot()
+
+            # Full jitter: spread retries of the same burst apart
+            delay = random.uniform(0, self.retry_base_seconds * 2 ** attempt)
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, concurrency limit and throttle counters."""
+        return {
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+            "peak_queue_depth": self.peak_queue_depth,
+            "calls": self.calls,
+            "throttle_events": self.throttle_events,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "rate_limited_waits": self.rate_limited_waits,
+        }
+
+
+# Global instances, one per provider
+gemini_governor = OutboundGovernor(
+    "gemini",
+    rate_per_second=settings.gemini_rate_per_second,
+    burst=settings.gemini_burst,
+    max_concurrency=settings.llm_max_concurrency,
+    max_queue=settings.outbound_max_queue,
+    max_retries=settings.outbound_max_retries,
+    retry_base_seconds=settings.outbound_retry_base_seconds,
+)
+vertex_governor = OutboundGovernor(
+    "vertex",
+    rate_per_second=settings.vertex_rate_per_second,
+    burst=settings.vertex_burst,
+    max_concurrency=settings.vertex_max_concurrency,
+    max_queue=settings.outbound_max_queue,
+    max_retries=settings.outbound_max_retries,
+    retry_base_seconds=settings.outbound_retry_base_seconds,
+)
@@ -0,0 +1,129 @@
+"""
+Search result cache.
+Caches ranked search results per (attributes, embedding, geo cell, radius, limit)
+and drops exactly the entries whose search area contains a written sighting.
+"""
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+import hashlib
+import math
+import numpy as np
+
+from app.config import settings
+from app.utils.ttl_cache import TTLCache
+
+# Kilometers per degree of latitude
+KM_PER_DEGREE = 111.32
+
+
+class SearchCache:
+    """TTL/LRU cache of search results with location-aware invalidation."""
+
+    def __init__(self):
+        self._cache = TTLCache(
+            max_entries=settings.search_cache_max_entries,
+            ttl_seconds=settings.search_cache_ttl_seconds
+        )
+        # Worst-case offset between a cached search point and a later one in
+        # the same geo cell (the cell diagonal)
+        self._cell_slack_km = KM_PER_DEGREE * 10 ** -settings.search_cache_geo_precision * math.sqrt(2)
+
+    @staticmethod
+    def embedding_fingerprint(embeddings: Optional[List[List[float]]]) -> Optional[str]:
+        """Stable hash of the query embeddings (None for text-only searches)."""
+        if not embeddings:
+            return None
+        digest = hashlib.sha1()
+        for embedding in embeddings:
+            digest.update(np.asarray(embedding, dtype=np.float32).tobytes())
+        return digest.hexdigest()
+
+    def make_key(
+        self,
+        search_attributes: List[str],
+        search_embeddings: Optional[List[List[float]]],
+        latitude: Optional[float],
+        longitude: Optional[float],
+        radius_km: Optional[int],
+        limit: int
+    ) -> Hashable:
+        """
+        Build the cache key for a search.
+
+        Attributes are order-insensitive, coordinates are rounded to
+        settings.search_cache_geo_precision decimals and the default radius
+        is made explicit so equivalent searches share an entry.
+        """
+        cell = None
+        if latitude and longitude:
+            precision = settings.search_cache_geo_precision
+            cell = (round(latitude, precision), round(longitude, precision))
+
+        return (
+            tuple(sorted(set(search_attributes or []))),
+            self.embedding_fingerprint(search_embeddings),
+            cell,
+            radius_km if radius_km is not None else settings.search_radius_km,
+            limit,
+        )
+
+    def get(self, key: Hashable) -> Any:
+        """Cached results for key, or None."""
+        entry = self._cache.get(key)
+        return entry[1] if entry is not None else None
+
+    def set(
+        self,
+        key: Hashable,
+        results: Any,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None
+    ) -> None:
+        """
+        Store search results.
+
+        Args:
+            key: Key from make_key
+            results: Formatted search results
+            latitude, longitude: Search point the results were computed for
+        """
+        center = (latitude, longitude) if latitude and longitude else None
+        self._cache.set(key, (center, results))
+
+    def invalidate_near(
+        self,
+        latitude: Optional[float],
+        longitude: Optional[float],
+        distance_fn: Callable[[float, float, float, float], float]
+    ) -> int:
+        """
+        Drop every cached search that could include a sighting at this point.
+
+        Searches without a location match everything, and sightings without
+        coordinates are kept by every search (see active_sightings_query).
+
+        Args:
+            latitude, longitude: Location of the created/changed sighting
+            distance_fn: Callable (lat1, lon1, lat2, lon2) -> km
+
+        Returns:
+            int: Number of entries dropped
+        """
+        if not (latitude and longitude):
+            return self._cache.invalidate()
+
+        def covers(key: Tuple, value: Tuple) -> bool:
+            center, _ = value
+            if center is None:
+                return True
+            radius_km = key[3]
+            return distance_fn(center[0], center[1], latitude, longitude) <= radius_km + self._cell_slack_km
+
+        return self._cache.invalidate(covers)
+
+    def stats(self) -> dict:
+        """Hit/miss counters for the health endpoint."""
+        return self._cache.stats()
+
+
+# Global instance
+search_cache = SearchCache()
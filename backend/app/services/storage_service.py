@@ -1,22 +1,67 @@
 """
 Storage service for uploading images to Google Cloud Storage.
 """
-from google.cloud import storage
 from fastapi import UploadFile
+import asyncio
+import threading
 import uuid
 from datetime import datetime
 from typing import List
 
 from app.config import settings
+from app.utils.readiness import readiness
 
 
 class StorageService:
     """Service for managing image uploads to GCS."""
     
     def __init__(self):
-        """Initialize GCS client."""
-        self.client = storage.Client(project=settings.gcp_project_id)
-        self.bucket = self.client.bucket(settings.gcs_bucket_name)
+        """The GCS client is created on first use (see get_bucket)."""
+        self._bucket = None
+        self._lock = threading.Lock()
+    
+    def get_bucket(self):
+        """
+        GCS bucket handle, creating the client (and importing the SDK) on
+        first use.
+        """
+        if self._bucket is None:
+            with self._lock:
+                if self._bucket is None:
+                    self._bucket = readiness.record("storage", self._create_bucket)
+        return self._bucket
+    
+    def _create_bucket(self):
+        from google.cloud import storage
+        
+        client = storage.Client(project=settings.gcp_project_id)
+        return client.bucket(settings.gcs_bucket_name)
+    
+    async def _get_bucket_async(self):
+        """get_bucket() without blocking the event loop on the first call."""
+        if self._bucket is not None:
+            return self._bucket
+        return await asyncio.to_thread(self.get_bucket)
+    
+    def validate_image(self, content: bytes, content_type: str) -> None:
+        """
+        Check size and format before anything is uploaded.
+        
+        Args:
+            content: Image bytes
+            content_type: MIME type of the image
+            
+        Raises:
+            ValueError: If file is too large or invalid format
+        """
+        file_size_mb = len(content) / (1024 * 1024)
+        
+        if file_size_mb > settings.max_image_size_mb:
+            raise ValueError(f"Image too large. Max size: {settings.max_image_size_mb}MB")
+        
+        valid_formats = ["image/jpeg", "image/jpg", "image/png", "image/webp"]
+        if content_type not in valid_formats:
+            raise ValueError(f"Invalid format. Allowed: {', '.join(valid_formats)}")
     
     async def upload_image(self, file: UploadFile) -> str:
         """
@@ -31,25 +76,19 @@ class StorageService:
         Raises:
             ValueError: If file is too large or invalid format
         """
-        # Validate file size
         file_content = await file.read()
-        file_size_mb = len(file_content) / (1024 * 1024)
-        
-        if file_size_mb > settings.max_image_size_mb:
-            raise ValueError(f"Image too large. Max size: {settings.max_image_size_mb}MB")
-        
-        # Validate file format
-        valid_formats = ["image/jpeg", "image/jpg", "image/png", "image/webp"]
-        if file.content_type not in valid_formats:
-            raise ValueError(f"Invalid format. Allowed: {', '.join(valid_formats)}")
+        self.validate_image(file_content, file.content_type)
         
         # Generate unique filename
         file_extension = file.filename.split(".")[-1] if "." in file.filename else "jpg"
         filename = f"{uuid.uuid4()}_{int(datetime.now().timestamp())}.{file_extension}"
         
         # Upload to GCS
-        blob = self.bucket.blob(f"dog_sightings/{filename}")
-        blob.upload_from_string(
+        bucket = await self._get_bucket_async()
+        blob = bucket.blob(f"dog_sightings/{filename}")
+        # The GCS client is blocking: keep it off the event loop
+        await asyncio.to_thread(
+            blob.upload_from_string,
             file_content,
             content_type=file.content_type
         )
@@ -59,7 +98,10 @@ class StorageService:
     
     async def upload_multiple_images(self, files: List[UploadFile]) -> List[str]:
         """
-        Upload multiple images to GCS.
+        Upload multiple images to GCS concurrently.
+        
+        If any upload fails, the ones that succeeded are deleted before the
+        error is raised.
         
         Args:
             files: List of FastAPI UploadFile objects
@@ -75,14 +117,21 @@ class StorageService:
                 f"Too many images. Max: {settings.max_images_per_sighting}"
             )
         
-        urls = []
-        for file in files:
+        async def upload(file: UploadFile) -> str:
             # Reset file pointer for each upload
             await file.seek(0)
-            url = await self.upload_image(file)
-            urls.append(url)
+            return await self.upload_image(file)
+        
+        results = await asyncio.gather(*[upload(file) for file in files], return_exceptions=True)
+        
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            for result in results:
+                if isinstance(result, str):
+                    await self.delete_image(result)
+            raise errors[0]
         
-        return urls
+        return results
     
     async def delete_image(self, image_url: str) -> bool:
         """
@@ -98,8 +147,9 @@ class StorageService:
             # Extract blob name from URL
             # URL format: https://storage.googleapis.com/bucket-name/path/to/file.jpg
             blob_name = image_url.split(f"{settings.gcs_bucket_name}/")[-1]
-            blob = self.bucket.blob(blob_name)
-            blob.delete()
+            bucket = await self._get_bucket_async()
+            blob = bucket.blob(blob_name)
+            await asyncio.to_thread(blob.delete)
             return True
         except Exception as e:
             print(f"Error deleting image: {e}")
@@ -0,0 +1,126 @@
+"""
+Attribute vocabulary service.
+Interns attribute tokens to integer ids and packs attribute sets into bitsets
+so Jaccard similarity becomes popcount over AND/OR.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+import threading
+
+from app.database import engine
+from app.models.attribute_vocabulary import AttributeToken
+
+
+class VocabularyService:
+    """In-process token -> id cache backed by the attribute_vocabulary table."""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def load(self) -> int:
+        """
+        Load the whole vocabulary into memory.
+
+        Returns:
+            int: Number of known tokens
+        """
+        with engine.connect() as conn:
+            rows = conn.execute(select(AttributeToken.token, AttributeToken.id)).all()
+
+        with self._lock:
+            self._ids.update({token: token_id for token, token_id in rows})
+        return len(self._ids)
+
+    def _fetch(self, conn, tokens: List[str]) -> None:
+        """Cache ids of the given tokens that exist in the table."""
+        rows = conn.execute(
+            select(AttributeToken.token, AttributeToken.id).where(AttributeToken.token.in_(tokens))
+        ).all()
+        with self._lock:
+            self._ids.update({token: token_id for token, token_id in rows})
+
+    def lookup(self, tokens: Iterable[str]) -> Tuple[List[int], int]:
+        """
+        Resolve tokens to ids without creating new ones (for search queries).
+
+        Cache misses are checked against the table once, since other instances
+        may have interned them.
+
+        Args:
+            tokens: Attribute tokens
+
+        Returns:
+            Tuple of (ids of known tokens, number of unknown tokens)
+        """
+        tokens = set(tokens or [])
+        missing = [token for token in tokens if token not in self._ids]
+        if missing:
+            with engine.connect() as conn:
+                self._fetch(conn, missing)
+
+        ids = [self._ids[token] for token in tokens if token in self._ids]
+        return ids, len(tokens) - len(ids)
+
+    def intern(self, tokens: Iterable[str]) -> List[int]:
+        """
+        Resolve tokens to ids, adding unseen tokens to the vocabulary.
+
+        Runs in its own short transaction so cached ids never refer to a
+        rolled-back insert.
+
+        Args:
+            tokens: Attribute tokens (e.g. from dog_description)
+
+        Returns:
+            List[int]: One id per distinct token
+        """
+        tokens = set(tokens or [])
+        missing = [token for token in tokens if token not in self._ids]
+        if missing:
+            with engine.begin() as conn:
+                conn.execute(
+                    insert(AttributeToken)
+                    .values([{"token": token} for token in missing])
+                    .on_conflict_do_nothing(index_elements=["token"])
+                )
+                self._fetch(conn, missing)
+            print(f"🔤 Interned {len(missing)} attribute tokens")
+
+        return [self._ids[token] for token in tokens]
+
+    def encode_attributes(self, tokens: Iterable[str]) -> bytes:
+        """Intern tokens and pack them into a bitset for DogSighting.attribute_bits."""
+        return self.encode(self.intern(tokens))
+
+    @staticmethod
+    def encode(ids: Iterable[int]) -> bytes:
+        """Pack token ids into a little-endian bitset (bit i set = token id i present)."""
+        bits = 0
+        for token_id in ids:
+            bits |= 1 << token_id
+        return bits.to_bytes((bits.bit_length() + 7) // 8 or 1, "little")
+
+    @staticmethod
+    def decode(data: Optional[bytes]) -> List[int]:
+        """Unpack a bitset into token ids."""
+        bits = VocabularyService.to_int(data)
+        ids = []
+        while bits:
+            lowest = bits & -bits
+            ids.append(lowest.bit_length() - 1)
+            bits ^= lowest
+        return ids
+
+    @staticmethod
+    def to_int(data: Optional[bytes]) -> int:
+        """Bitset as a Python int (0 for no attributes)."""
+        return int.from_bytes(data, "little") if data else 0
+
+
+# Global instance
+vocabulary_service = VocabularyService()
@@ -1,11 +1,13 @@
 """
 Utility for converting base64 images to file-like objects.
 """
+import asyncio
 import base64
 import io
-import mimetypes
 from typing import List
-from fastapi import UploadFile
+
+from app.config import settings
+from app.utils.image_preprocessing import EXTENSIONS, preprocess_image
 
 
 class Base64UploadFile:
@@ -23,6 +25,14 @@ class Base64UploadFile:
         self.filename = filename
         self._file = io.BytesIO(self.content)
 
+    def preprocess(self) -> None:
+        """Normalize the image with preprocess_image (blocking; run it in a worker thread)."""
+        self.content, content_type = preprocess_image(self.content)
+        if content_type:
+            self.content_type = content_type
+            self.filename = f"{self.filename.rsplit('.', 1)[0]}.{EXTENSIONS[content_type]}"
+        self._file = io.BytesIO(self.content)
+
     async def read(self) -> bytes:
         """Read file content."""
         return self._file.read()
@@ -32,10 +42,12 @@ class Base64UploadFile:
         self._file.seek(position)
 
 
-def convert_base64_to_upload_files(base64_images: List[str]) -> List[Base64UploadFile]:
+async def convert_base64_to_upload_files(base64_images: List[str]) -> List[Base64UploadFile]:
     """
     Convert list of base64 strings to Base64UploadFile objects.
 
+    Images are preprocessed concurrently in worker threads, off the event loop.
+
     Args:
         base64_images: List of base64-encoded image strings
 
@@ -54,4 +66,6 @@ def convert_base64_to_upload_files(base64_images: List[str]) -> List[Base64Uploa
         filename = f"image_{i}.{extension}"
         files.append(Base64UploadFile(base64_str, filename))
 
+    if settings.image_preprocessing_enabled:
+        await asyncio.gather(*[asyncio.to_thread(file.preprocess) for file in files])
     return files
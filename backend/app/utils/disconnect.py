@@ -0,0 +1,44 @@
+"""
+Cancel in-flight work when the HTTP client goes away.
+"""
+from typing import Awaitable, TypeVar
+from fastapi import HTTPException, Request
+import asyncio
+
+T = TypeVar("T")
+
+# Non-standard status used by nginx for "client closed request"; never
+# reaches the client, but shows up in access logs
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T], poll_interval: float = 0.5) -> T:
+    """
+    Await a coroutine, cancelling it if the client disconnects first.
+
+    Args:
+        request: The incoming request
+        awaitable: Work to run (e.g. a Gemini call)
+        poll_interval: Seconds between disconnect checks
+
+    Returns:
+        The awaitable's result
+
+    Raises:
+        HTTPException: 499 if the client disconnected (the work is cancelled)
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                print("🔌 Client disconnected, cancelling request work")
+                raise HTTPException(
+                    status_code=CLIENT_CLOSED_REQUEST,
+                    detail="Client closed request"
+                )
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,85 @@
+"""
+Image normalization before any external call (GCS, Gemini, Vertex).
+Mobile-camera photos are often 3-5 MB at 4000px; the models do not need that.
+"""
+from typing import Optional, Tuple
+from PIL import Image, ImageOps
+import io
+
+from app.config import settings
+
+CONTENT_TYPES = {
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+}
+
+EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/webp": "webp",
+}
+
+
+def preprocess_image(
+    image_bytes: bytes,
+    max_edge: Optional[int] = None,
+    output_format: Optional[str] = None,
+    quality: Optional[int] = None
+) -> Tuple[bytes, Optional[str]]:
+    """
+    Downsize, orient and re-encode an image.
+
+    Applies the EXIF orientation to the pixels, shrinks the long edge to
+    max_edge (never enlarges), drops EXIF/ICC/GPS metadata and re-encodes.
+    Images that already satisfy all of that are returned as-is, so calling
+    this twice is a no-op.
+    Bytes that PIL cannot decode are returned unchanged so the caller's own
+    validation (and Gemini's "es_perro") still decides.
+
+    Args:
+        image_bytes: Decoded upload
+        max_edge: Long edge in pixels (default settings.image_max_edge_px)
+        output_format: "JPEG" or "WEBP" (default settings.image_output_format)
+        quality: Encoder quality 1-100 (default settings.image_quality)
+
+    Returns:
+        Tuple of (image bytes, content type), content type None if unchanged
+    """
+    max_edge = max_edge or settings.image_max_edge_px
+    output_format = (output_format or settings.image_output_format).upper()
+    quality = quality or settings.image_quality
+
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+
+        # Already normalized (e.g. preprocessed upload): re-encoding would only lose quality
+        if (
+            image.format == output_format
+            and image.mode == "RGB"
+            and max(image.size) <= max_edge
+            and "exif" not in image.info
+            and "icc_profile" not in image.info
+        ):
+            return image_bytes, CONTENT_TYPES[output_format]
+
+        image = ImageOps.exif_transpose(image)
+
+        # JPEG has no alpha: flatten transparent PNG/WebP onto white
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+        # Metadata is only written when passed explicitly (exif=, icc_profile=)
+        output = io.BytesIO()
+        image.save(output, format=output_format, quality=quality, optimize=True)
+    except Exception as e:
+        print(f"⚠️  Image preprocessing skipped: {e}")
+        return image_bytes, None
+
+    return output.getvalue(), CONTENT_TYPES[output_format]
+
@@ -0,0 +1,128 @@
+"""
+Startup and warm-up tracking for the readiness endpoint.
+Records which dependencies are warm, how long each took, and the time from
+module import to the first response served.
+
+The lazy client getters record themselves through the shared `readiness`
+instance, so a dependency created on first use (or after a failed warm-up)
+is reported as ready too.
+"""
+from typing import Callable, Dict, Iterable, Optional, TypeVar
+import asyncio
+import time
+
+T = TypeVar("T")
+
+
+class Readiness:
+    """Warm-up state of each dependency ("pending", "warming", "ready", "failed")."""
+
+    def __init__(self, import_started: float):
+        """
+        Args:
+            import_started: time.perf_counter() taken before the app's imports
+                (main.py replaces it with its own, earlier, reading)
+        """
+        self.import_started = import_started
+        self.components: Dict[str, dict] = {}
+        self.imported_seconds: Optional[float] = None
+        self.startup_seconds: Optional[float] = None
+        self.first_response_seconds: Optional[float] = None
+
+    def _since_import(self) -> float:
+        return round(time.perf_counter() - self.import_started, 3)
+
+    def mark_imported(self) -> None:
+        self.imported_seconds = self._since_import()
+        print(f"⏱️  App imported in {self.imported_seconds}s")
+
+    def mark_started(self) -> None:
+        self.startup_seconds = self._since_import()
+        print(f"⏱️  Startup finished {self.startup_seconds}s after import")
+
+    def mark_response(self) -> None:
+        """Record the first response (later calls are no-ops)."""
+        if self.first_response_seconds is None:
+            self.first_response_seconds = self._since_import()
+            print(f"⏱️  First response {self.first_response_seconds}s after import")
+
+    def pending(self, *names: str) -> None:
+        """Declare components that will be warmed up later."""
+        for name in names:
+            self.components.setdefault(name, {"state": "pending"})
+
+    def record(self, name: str, create: Callable[[], T]) -> T:
+        """
+        Run a blocking function that creates/loads a dependency and record
+        the outcome. Lazy getters wrap their first-use creation in this.
+
+        Args:
+            name: Component name reported by status()
+            create: Function that creates/loads the dependency
+
+        Returns:
+            Whatever create returns
+
+        Raises:
+            Exception: Whatever create raises (recorded as "failed" first)
+        """
+        self.components[name] = {"state": "warming"}
+        started = time.perf_counter()
+        try:
+            result = create()
+        except Exception as e:
+            self.mark_failed(name, e, round(time.perf_counter() - started, 3))
+            raise
+
+        self.mark_ready(name, round(time.perf_counter() - started, 3))
+        return result
+
+    def mark_ready(self, name: str, seconds: Optional[float] = None) -> None:
+        """Record a component as ready (seconds: how long it took, if known)."""
+        self.components[name] = {"state": "ready", "seconds": seconds}
+        print(f"✅ {name} ready" + (f" in {seconds}s" if seconds is not None else ""))
+
+    def mark_failed(self, name: str, error: Exception, seconds: Optional[float] = None) -> None:
+        """Record a failed component (a later mark_ready or record replaces it)."""
+        self.components[name] = {"state": "failed", "seconds": seconds, "error": str(error)}
+        print(f"❌ {name} failed: {error}")
+
+    async def run(self, name: str, warm_up: Callable[[], object], required: bool = False) -> bool:
+        """
+        record() a blocking warm-up function in a worker thread.
+
+        Args:
+            name: Component name reported by status()
+            warm_up: Function that creates/loads the dependency
+            required: Re-raise failures (startup must not continue without it)
+
+        Returns:
+            bool: True if the component is ready
+        """
+        try:
+            await asyncio.to_thread(self.record, name, warm_up)
+        except Exception:
+            if required:
+                raise
+            return False
+        return True
+
+    def is_ready(self, names: Optional[Iterable[str]] = None) -> bool:
+        """Whether the given components (default: all declared) are ready."""
+        names = self.components.keys() if names is None else names
+        return all(self.components.get(name, {}).get("state") == "ready" for name in names)
+
+    def status(self) -> dict:
+        """Component states and timings since import."""
+        return {
+            "components": dict(self.components),
+            "timings": {
+                "imported_seconds": self.imported_seconds,
+                "startup_seconds": self.startup_seconds,
+                "first_response_seconds": self.first_response_seconds,
+            },
+        }
+
+
+# Shared by main.py (startup, /api/ready) and the lazy client getters
+readiness = Readiness(time.perf_counter())
@@ -0,0 +1 @@
+"""Offline benchmarks for the search paths (run from backend/ with python -m benchmarks.<name>)."""
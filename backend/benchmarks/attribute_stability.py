@@ -0,0 +1,141 @@
+"""
+Attribute stability of image preprocessing.
+
+Sends each photo in a folder to dog_description once as the original
+upload and once per preprocessing variant (long edge x quality x format),
+then reports how much the extracted attributes drift from the original:
+attribute Jaccard, es_perro agreement, bytes sent and Gemini latency.
+
+Needs real Gemini credentials (GOOGLE_API_KEY / .env); nothing else is
+called. Photos are sent one at a time, one Gemini call per photo and variant.
+
+Usage (from backend/):
+    python -m benchmarks.attribute_stability photos/ --max-edges 512 768 1024 1536 --qualities 75 85
+"""
+from typing import List, Optional
+import argparse
+import asyncio
+import io
+import os
+import time
+import numpy as np
+from fastapi import UploadFile
+
+from benchmarks.common import latency_summary, run_metadata, write_results
+
+PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+async def describe(image_bytes: bytes, filename: str) -> dict:
+    """One dog_description call on raw bytes; returns attributes, es_perro and latency."""
+    from app.services.llm_service import dog_description
+
+    upload = UploadFile(file=io.BytesIO(image_bytes), filename=filename)
+    started = time.perf_counter()
+    result = await dog_description([upload])
+    seconds = time.perf_counter() - started
+
+    if not result:
+        return {"es_perro": False, "attributes": set(), "seconds": seconds}
+    return {
+        "es_perro": bool(result.get("es_perro")),
+        "attributes": set(result.get("atributos", [])),
+        "seconds": seconds,
+    }
+
+
+def jaccard(a: set, b: set) -> float:
+    """Jaccard index, 1.0 when both sets are empty."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+async def run(args) -> dict:
+    from app.utils.image_preprocessing import preprocess_image
+
+    photos = sorted(
+        os.path.join(args.folder, name) for name in os.listdir(args.folder)
+        if name.lower().endswith(PHOTO_EXTENSIONS)
+    )
+    if not photos:
+        raise SystemExit(f"No photos found in {args.folder}")
+
+    variants = [
+        {"max_edge": max_edge, "quality": quality, "format": output_format}
+        for output_format in args.formats
+        for max_edge in args.max_edges
+        for quality in args.qualities
+    ]
+    original_bytes = []
+    original_seconds = []
+    variant_results = [
+        {"params": variant, "jaccard": [], "es_perro_agree": [], "bytes": [], "seconds": []}
+        for variant in variants
+    ]
+
+    for photo in photos:
+        with open(photo, "rb") as f:
+            image_bytes = f.read()
+        filename = os.path.basename(photo)
+
+        original = await describe(image_bytes, filename)
+        original_bytes.append(len(image_bytes))
+        original_seconds.append(original["seconds"])
+        print(f"🔄 {filename}: {len(image_bytes) / 1024:.0f} KB, {sorted(original['attributes'])}")
+
+        for variant, result in zip(variants, variant_results):
+            processed, _ = preprocess_image(
+                image_bytes,
+                max_edge=variant["max_edge"],
+                output_format=variant["format"],
+                quality=variant["quality"]
+            )
+            described = await describe(processed, filename)
+            result["jaccard"].append(jaccard(original["attributes"], described["attributes"]))
+            result["es_perro_agree"].append(original["es_perro"] == described["es_perro"])
+            result["bytes"].append(len(processed))
+            result["seconds"].append(described["seconds"])
+
+    summaries = []
+    for result in variant_results:
+        summary = {
+            "params": result["params"],
+            "attribute_jaccard_mean": round(float(np.mean(result["jaccard"])), 4),
+            "attribute_jaccard_min": round(float(np.min(result["jaccard"])), 4),
+            "es_perro_agreement": round(float(np.mean(result["es_perro_agree"])), 4),
+            "mean_kb": round(float(np.mean(result["bytes"])) / 1024, 1),
+            "latency_ms": latency_summary(result["seconds"]),
+        }
+        print(
+            f"✅ {summary['params']}: jaccard {summary['attribute_jaccard_mean']} "
+            f"(min {summary['attribute_jaccard_min']}), es_perro {summary['es_perro_agreement']}, "
+            f"{summary['mean_kb']} KB, p50 {summary['latency_ms']['p50']} ms"
+        )
+        summaries.append(summary)
+
+    return {
+        "photos": len(photos),
+        "original": {
+            "mean_kb": round(float(np.mean(original_bytes)) / 1024, 1),
+            "latency_ms": latency_summary(original_seconds),
+        },
+        "variants": summaries,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="Folder of dog (and non-dog) photos")
+    parser.add_argument("--max-edges", type=int, nargs="+", default=[512, 768, 1024, 1536])
+    parser.add_argument("--qualities", type=int, nargs="+", default=[85])
+    parser.add_argument("--formats", nargs="+", default=["JPEG"], choices=["JPEG", "WEBP"])
+    parser.add_argument("--output", default="attribute_stability.json")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    write_results(args.output, {"meta": run_metadata(args), **results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""
+Benchmark MatchingService search paths on synthetic sightings.
+
+For each data set size, runs every search mode over the same synthetic
+searches and reports p50/p95/p99 latency, QPS, rows scanned per search and
+peak Python memory (tracemalloc) as JSON.
+
+Two backends:
+- memory (default): no database. Index modes use the real AttributeIndex /
+  EmbeddingIndex; scan modes run the service's own scoring functions over
+  the rows inside the search radius, i.e. the Python cost of the SQL paths
+  without the fetch. Rows scanned = rows scored in Python.
+- postgres (--database-url): inserts the sightings into that database and
+  calls the real MatchingService methods. Rows scanned = rows returned by
+  Postgres to the app. Use a scratch database: benchmark rows are deleted
+  afterwards (unless --keep), but in-memory indexes also load any other
+  active sightings.
+
+Usage (from backend/):
+    python -m benchmarks.bench_matching --sizes 10000 100000 --queries 100
+    python -m benchmarks.bench_matching --sizes 10000 --database-url postgresql://localhost/lostdogs_bench
+"""
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+import argparse
+import math
+import time
+import tracemalloc
+import numpy as np
+
+from benchmarks.common import configure_environment, latency_summary, run_metadata, write_results
+from benchmarks.database import delete_sightings, insert_sightings
+from benchmarks.synthetic import VOCABULARY, SyntheticSearches, SyntheticSightings, load_embedding_set
+
+MEMORY_MODES = [
+    "attributes_scan",
+    "attributes_index",
+    "vectors_exact",
+    "vectors_memory",
+    "vectors_two_stage",
+    "merge",
+]
+POSTGRES_MODES = [
+    "find_matches",
+    "attributes_scan",
+    "attributes_index",
+    "vectors_exact",
+    "vectors_ann",
+    "vectors_memory",
+    "vectors_two_stage",
+    "merge",
+]
+
+# A search returns (results, rows_scanned)
+SearchFn = Callable[[int], Tuple[list, int]]
+
+
+def measure(search: SearchFn, queries: int, memory_queries: int) -> dict:
+    """
+    Run a search function over every query and summarize it.
+
+    Latency is measured without tracemalloc (it slows allocation down);
+    peak memory comes from a separate pass over the first memory_queries.
+    """
+    search(0)  # warm-up (lazy index loads, first-call caches)
+
+    latencies = []
+    rows_scanned = []
+    result_counts = []
+    for query in range(queries):
+        started = time.perf_counter()
+        results, rows = search(query)
+        latencies.append(time.perf_counter() - started)
+        rows_scanned.append(rows)
+        result_counts.append(len(results))
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    for query in range(min(memory_queries, queries)):
+        search(query)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "queries": queries,
+        "latency_ms": latency_summary(latencies),
+        "qps": round(queries / sum(latencies), 2) if sum(latencies) else None,
+        "rows_scanned": {
+            "mean": round(float(np.mean(rows_scanned)), 1),
+            "max": int(np.max(rows_scanned)),
+        },
+        "results": {"mean": round(float(np.mean(result_counts)), 2)},
+        "peak_memory_kb": round((peak - baseline) / 1024, 1),
+    }
+
+
+class MemoryBackend:
+    """In-process stand-in: real in-memory indexes plus Python scans over arrays."""
+
+    def __init__(self, sightings: SyntheticSightings, searches: SyntheticSearches, args):
+        from app.config import settings
+        from app.services.attribute_index import AttributeIndex
+        from app.services.embedding_index import EmbeddingIndex
+        from app.services.matching_service import MatchingService
+        from app.services.vocabulary_service import VocabularyService
+
+        self.sightings = sightings
+        self.searches = searches
+        self.radius_km = args.radius or settings.search_radius_km
+        self.limit = args.limit
+        self.min_score = settings.min_match_score
+        self.rescore_pool = settings.coarse_candidate_pool
+        self.service = MatchingService
+        self.build_seconds: Dict[str, float] = {}
+
+        # Local vocabulary ids (no database): bit i = VOCABULARY[i - 1]
+        self.token_ids = {token: token_id for token_id, token in enumerate(VOCABULARY, 1)}
+        self.bits = [
+            VocabularyService.to_int(VocabularyService.encode(self._ids(attributes)))
+            for attributes in sightings.attributes
+        ]
+        self.rows = {sighting_id: row for row, sighting_id in enumerate(sightings.ids)}
+
+        started = time.perf_counter()
+        self.attribute_index = AttributeIndex(initial_capacity=sightings.count)
+        for row, sighting_id in enumerate(sightings.ids):
+            latitude, longitude = sightings.location(row)
+            self.attribute_index.upsert(sighting_id, self._ids(sightings.attributes[row]), latitude, longitude)
+        self.build_seconds["attribute_index"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        self.embedding_index = EmbeddingIndex(
+            dimension=sightings.dimension, dtype=args.dtype, initial_capacity=sightings.count
+        )
+        for row, sighting_id in enumerate(sightings.ids):
+            self.embedding_index.upsert(sighting_id, sightings.embeddings[row], *sightings.location(row))
+        self.build_seconds["embedding_index"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        self.coarse_index = EmbeddingIndex(
+            dimension=sightings.coarse_embeddings.shape[1], dtype=args.dtype, initial_capacity=sightings.count
+        )
+        for row, sighting_id in enumerate(sightings.ids):
+            self.coarse_index.upsert(sighting_id, sightings.coarse_embeddings[row], *sightings.location(row))
+        self.build_seconds["coarse_index"] = time.perf_counter() - started
+
+        self.index_memory_mb = {
+            "embedding_index": round(self.embedding_index.memory_bytes / 2 ** 20, 1),
+            "coarse_index": round(self.coarse_index.memory_bytes / 2 ** 20, 1),
+        }
+
+    def _ids(self, attributes: List[str]) -> List[int]:
+        return [self.token_ids[token] for token in attributes if token in self.token_ids]
+
+    def _rows_in_radius(self, query: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows the SQL radius filter would return, with their distances."""
+        from app.services.embedding_index import haversine_km
+
+        latitude, longitude = self.searches.location(query)
+        if latitude is None:
+            return np.arange(self.sightings.count), np.full(self.sightings.count, np.nan)
+        distances = haversine_km(latitude, longitude, self.sightings.latitudes, self.sightings.longitudes)
+        rows = np.flatnonzero(~(distances > self.radius_km))
+        return rows, distances[rows]
+
+    @staticmethod
+    def _top(results: list, limit: int) -> list:
+        results.sort(key=lambda x: (x[1], -x[2] if x[2] is not None else 0), reverse=True)
+        return results[:limit]
+
+    def attributes_scan(self, query: int):
+        rows, distances = self._rows_in_radius(query)
+        token_ids = self._ids(self.searches.attributes[query])
+        unknown = len(self.searches.attributes[query]) - len(token_ids)
+        jaccard_bits = self.service.calculate_jaccard_similarity_bits
+        search_bits = sum(1 << token_id for token_id in token_ids)
+
+        results = []
+        for row, distance in zip(rows.tolist(), distances.tolist()):
+            score = jaccard_bits(search_bits, self.bits[row], unknown)
+            if score >= self.min_score:
+                results.append((self.sightings.ids[row], score, None if math.isnan(distance) else distance))
+        return self._top(results, self.limit), len(rows)
+
+    def attributes_index(self, query: int):
+        latitude, longitude = self.searches.location(query)
+        stats = {}
+        results = self.attribute_index.search(
+            self._ids(self.searches.attributes[query]),
+            min_score=self.min_score,
+            latitude=latitude,
+            longitude=longitude,
+            radius_km=self.radius_km,
+            stats=stats
+        )
+        return self._top(results, self.limit), stats["candidates"]
+
+    def vectors_exact(self, query: int):
+        rows, distances = self._rows_in_radius(query)
+        search_embedding = self.searches.embeddings[query]
+
+        results = []
+        for row, distance in zip(rows.tolist(), distances.tolist()):
+            score = self.service.calculate_cosine_similarity(search_embedding, self.sightings.embeddings[row])
+            if score >= self.min_score:
+                results.append((self.sightings.ids[row], score, None if math.isnan(distance) else distance))
+        return self._top(results, self.limit), len(rows)
+
+    def vectors_memory(self, query: int):
+        latitude, longitude = self.searches.location(query)
+        results = self.embedding_index.search(
+            self.searches.embeddings[query], self.limit, self.min_score,
+            latitude, longitude, self.radius_km
+        )
+        return results, len(self.embedding_index)
+
+    def vectors_two_stage(self, query: int):
+        from app.services.embedding_index import cosine_similarities
+
+        latitude, longitude = self.searches.location(query)
+        candidates = self.coarse_index.search(
+            self.searches.coarse_embeddings[query], self.rescore_pool, 0.0,
+            latitude, longitude, self.radius_km
+        )
+        vectors = [self.sightings.embeddings[self.rows[sighting_id]] for sighting_id, _, _ in candidates]
+        scores = cosine_similarities(self.searches.embeddings[query], vectors)
+
+        results = [
+            (sighting_id, float(score), distance)
+            for (sighting_id, _, distance), score in zip(candidates, scores)
+            if score >= self.min_score
+        ]
+        return self._top(results, self.limit), len(self.coarse_index) + len(candidates)
+
+    def prepare_merge(self, queries: int) -> SearchFn:
+        """Precompute both result lists so only the RRF merge is timed."""
+        as_rows = lambda results: [(SimpleNamespace(id=sighting_id), score, distance) for sighting_id, score, distance in results]
+        inputs = [
+            (as_rows(self.attributes_index(query)[0]), as_rows(self.vectors_memory(query)[0]))
+            for query in range(queries)
+        ]
+        merge = self.service().merge_search_results
+
+        def search(query: int):
+            attribute_results, vector_results = inputs[query]
+            return merge(attribute_results, vector_results, self.limit), len(attribute_results) + len(vector_results)
+
+        return search
+
+    def search_fn(self, mode: str, queries: int) -> SearchFn:
+        if mode == "merge":
+            return self.prepare_merge(queries)
+        return getattr(self, mode)
+
+    def close(self) -> None:
+        pass
+
+
+class PostgresBackend:
+    """Real MatchingService methods against a Postgres database."""
+
+    def __init__(self, sightings: SyntheticSightings, searches: SyntheticSearches, args):
+        from sqlalchemy import event
+
+        from app.config import settings
+        from app.database import SessionLocal, engine, init_db
+        from app.services.matching_service import MatchingService
+
+        self.sightings = sightings
+        self.searches = searches
+        self.radius_km = args.radius or settings.search_radius_km
+        self.limit = args.limit
+        self.keep = args.keep
+        self.build_seconds: Dict[str, float] = {}
+        self.index_memory_mb: Dict[str, float] = {}
+
+        init_db()
+        self.db = SessionLocal()
+        self.service = MatchingService()
+
+        # Count rows Postgres hands back to the app
+        self.rows_fetched = 0
+
+        def count_rows(conn, cursor, statement, parameters, context, executemany):
+            if cursor.description is not None and cursor.rowcount > 0:
+                self.rows_fetched += cursor.rowcount
+
+        self._listener = count_rows
+        self._engine = engine
+        event.listen(engine, "after_cursor_execute", count_rows)
+
+        self.build_seconds["insert"] = insert_sightings(self.db, sightings)
+
+        for name, index in (
+            ("attribute_index", self.service.attribute_index),
+            ("embedding_index", self.service.embedding_index),
+            ("coarse_index", self.service.coarse_index),
+        ):
+            started = time.perf_counter()
+            index.load(self.db)
+            self.build_seconds[name] = time.perf_counter() - started
+        self.index_memory_mb = {
+            "embedding_index": round(self.service.embedding_index.memory_bytes / 2 ** 20, 1),
+            "coarse_index": round(self.service.coarse_index.memory_bytes / 2 ** 20, 1),
+        }
+
+    def _counted(self, call: Callable[[int], list]) -> SearchFn:
+        def search(query: int):
+            self.rows_fetched = 0
+            results = call(query)
+            self.db.rollback()  # end the read transaction like a request would
+            return results, self.rows_fetched
+        return search
+
+    def _args(self, query: int) -> dict:
+        latitude, longitude = self.searches.location(query)
+        return {
+            "latitude": latitude,
+            "longitude": longitude,
+            "radius_km": self.radius_km,
+            "limit": self.limit,
+        }
+
+    def search_fn(self, mode: str, queries: int) -> SearchFn:
+        service, db, searches = self.service, self.db, self.searches
+        embedding = lambda query: searches.embeddings[query].tolist()
+
+        if mode == "find_matches":
+            return self._counted(lambda q: service.find_matches(db, searches.attributes[q], **self._args(q)))
+        if mode.startswith("attributes_"):
+            attribute_mode = mode.split("_", 1)[1]
+            return self._counted(lambda q: service.find_matches_by_attributes(
+                db, searches.attributes[q], mode=attribute_mode, **self._args(q)
+            ))
+        if mode.startswith("vectors_"):
+            vector_mode = mode.split("_", 1)[1]
+            return self._counted(lambda q: service.find_matches_by_vectors(
+                db, embedding(q), mode=vector_mode,
+                coarse_embedding=searches.coarse_embeddings[q].tolist(), **self._args(q)
+            ))
+        if mode == "merge":
+            inputs = [
+                (
+                    service.find_matches_by_attributes(db, searches.attributes[q], mode="index", **self._args(q)),
+                    service.find_matches_by_vectors(db, embedding(q), mode="ann", **self._args(q)),
+                )
+                for q in range(queries)
+            ]
+            return lambda q: (
+                service.merge_search_results(inputs[q][0], inputs[q][1], self.limit),
+                len(inputs[q][0]) + len(inputs[q][1])
+            )
+
+        raise ValueError(f"Unknown benchmark mode: {mode}")
+
+    def close(self) -> None:
+        from sqlalchemy import event
+
+        event.remove(self._engine, "after_cursor_execute", self._listener)
+        if not self.keep:
+            delete_sightings(self.db)
+        self.db.close()
+
+
+def run(args) -> dict:
+    """Benchmark every requested size and mode."""
+    backend_name = "postgres" if args.database_url else "memory"
+    modes = args.modes or (POSTGRES_MODES if args.database_url else MEMORY_MODES)
+    results = []
+    embedding_set = load_embedding_set(args.embeddings) if args.embeddings else None
+
+    for size in args.sizes:
+        print(f"🔄 Generating {size} synthetic sightings...")
+        sightings = SyntheticSightings(size, seed=args.seed, embedding_set=embedding_set)
+        searches = SyntheticSearches(sightings, args.queries, seed=args.seed + 1)
+
+        backend_class = PostgresBackend if args.database_url else MemoryBackend
+        backend = backend_class(sightings, searches, args)
+        try:
+            for mode in modes:
+                entry = {"backend": backend_name, "size": sightings.count, "mode": mode}
+                if mode == "vectors_exact" and sightings.count > args.exact_max_rows:
+                    print(f"⏭️  {mode} @ {size}: skipped (above --exact-max-rows)")
+                    results.append({**entry, "skipped": "size above --exact-max-rows"})
+                    continue
+
+                stats = measure(backend.search_fn(mode, args.queries), args.queries, args.memory_queries)
+                results.append({
+                    **entry,
+                    **stats,
+                    "build_seconds": {name: round(value, 3) for name, value in backend.build_seconds.items()},
+                    "index_memory_mb": backend.index_memory_mb,
+                })
+                latency = stats["latency_ms"]
+                print(
+                    f"✅ {mode} @ {size}: p50 {latency['p50']} ms, p95 {latency['p95']} ms, "
+                    f"p99 {latency['p99']} ms, {stats['rows_scanned']['mean']} rows/search"
+                )
+        finally:
+            backend.close()
+
+    return {"meta": run_metadata(args), "results": results}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--modes", nargs="+", help="Subset of modes (default: all for the backend)")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--radius", type=int, help="Search radius in km (default: SEARCH_RADIUS_KM)")
+    parser.add_argument("--dtype", choices=["float32", "float16", "int8"], default="float32",
+                        help="In-memory embedding index dtype (memory backend)")
+    parser.add_argument("--exact-max-rows", type=int, default=5000,
+                        help="Skip vectors_exact (pure-Python cosine) above this size")
+    parser.add_argument("--memory-queries", type=int, default=5,
+                        help="Queries traced with tracemalloc for peak memory")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embeddings", help="Recorded embedding set (.npz, see load_embedding_set)")
+    parser.add_argument("--database-url", help="Benchmark the real service against this Postgres database")
+    parser.add_argument("--keep", action="store_true", help="Keep benchmark rows in Postgres")
+    parser.add_argument("--output", default="bench_matching.json")
+    args = parser.parse_args(argv)
+
+    configure_environment(args.database_url)
+    write_results(args.output, run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Helpers shared by the benchmark scripts.
+"""
+from typing import Dict, List, Optional
+import json
+import os
+import platform
+import sys
+import time
+import numpy as np
+
+# Settings the app refuses to start without. Benchmarks never call GCP or
+# Gemini, so placeholders are enough when no .env is present.
+PLACEHOLDER_SETTINGS = {
+    "DATABASE_URL": "postgresql://localhost/benchmark",
+    "GCP_PROJECT_ID": "benchmark",
+    "GCS_BUCKET_NAME": "benchmark",
+    "GOOGLE_API_KEY": "benchmark",
+}
+
+
+def configure_environment(database_url: Optional[str] = None) -> None:
+    """
+    Prepare settings before any app module is imported.
+
+    Args:
+        database_url: Postgres URL to benchmark against (overrides DATABASE_URL)
+    """
+    if database_url:
+        os.environ["DATABASE_URL"] = database_url
+    for name, value in PLACEHOLDER_SETTINGS.items():
+        os.environ.setdefault(name, value)
+    os.environ.setdefault("DEBUG", "false")
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/mean latency in milliseconds."""
+    if not seconds:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0}
+    millis = np.asarray(seconds) * 1000
+    return {
+        "p50": round(float(np.percentile(millis, 50)), 3),
+        "p95": round(float(np.percentile(millis, 95)), 3),
+        "p99": round(float(np.percentile(millis, 99)), 3),
+        "mean": round(float(millis.mean()), 3),
+    }
+
+
+def run_metadata(args) -> dict:
+    """Environment and arguments recorded with every result file."""
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": {
+            key: value for key, value in vars(args).items()
+            if key != "database_url"
+        },
+    }
+
+
+def write_results(path: str, payload: dict) -> None:
+    """Write a result file (JSON, so runs can be diffed and compared)."""
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2, default=str)
+    print(f"📄 Results written to {path}")
@@ -0,0 +1,71 @@
+"""
+Load synthetic sightings into Postgres for benchmarks (use a scratch database).
+
+App modules are imported inside the functions so configure_environment()
+can point DATABASE_URL at the benchmark database first.
+"""
+import time
+
+from benchmarks.synthetic import VOCABULARY, SyntheticSightings
+
+# Written to user_description so benchmark rows can be told apart and deleted
+BENCHMARK_TAG = "__benchmark__"
+
+
+def insert_sightings(db, sightings: SyntheticSightings, chunk_size: int = 2000) -> float:
+    """
+    Insert synthetic sightings as active DogSighting rows, each with one
+    per-photo embedding row like an ingested single-photo report.
+
+    Args:
+        db: Database session
+        sightings: Synthetic data set
+        chunk_size: Rows per INSERT
+
+    Returns:
+        float: Seconds spent inserting
+    """
+    from sqlalchemy import insert
+
+    from app.models.dog_sighting import DogSighting, DogSightingImageEmbedding
+    from app.services.vocabulary_service import vocabulary_service
+
+    print(f"📦 Inserting {sightings.count} benchmark sightings...")
+    vocabulary_service.intern(VOCABULARY)
+    started = time.perf_counter()
+
+    for start in range(0, sightings.count, chunk_size):
+        rows = []
+        for row in range(start, min(start + chunk_size, sightings.count)):
+            latitude, longitude = sightings.location(row)
+            rows.append({
+                "id": sightings.ids[row],
+                "image_urls": ["https://example.com/benchmark.jpg"],
+                "user_description": BENCHMARK_TAG,
+                "attributes": sightings.attributes[row],
+                "attribute_bits": vocabulary_service.encode_attributes(sightings.attributes[row]),
+                "image_embedding": sightings.embeddings[row],
+                "image_embedding_coarse": sightings.coarse_embeddings[row],
+                "latitude": latitude,
+                "longitude": longitude,
+                "status": "active",
+            })
+        db.execute(insert(DogSighting.__table__), rows)
+        db.execute(insert(DogSightingImageEmbedding.__table__), [
+            {"sighting_id": row["id"], "position": 0, "embedding": row["image_embedding"]}
+            for row in rows
+        ])
+        db.commit()
+
+    return time.perf_counter() - started
+
+
+def delete_sightings(db) -> None:
+    """Delete every benchmark row."""
+    from app.models.dog_sighting import DogSighting
+
+    db.query(DogSighting).filter(
+        DogSighting.user_description == BENCHMARK_TAG
+    ).delete(synchronize_session=False)
+    db.commit()
+    print("🗑️  Benchmark sightings deleted")
@@ -0,0 +1,317 @@
+"""
+Recall-vs-latency evaluation for approximate vector search.
+
+Computes the exact top-k for a fixed set of synthetic (or recorded, see
+--embeddings) query embeddings (same semantics as MatchingService.calculate_cosine_similarity: cosine
+clipped to [0, 1], at least min_match_score), then sweeps approximate
+settings and reports recall@k, QPS and latency for each one.
+
+In-process sweeps (always):
+- memory: EmbeddingIndex dtype (float32 / float16 / int8) x re-score pool
+- two_stage: coarse dimension x coarse candidate pool. Synthetic short
+  embeddings are a noisy projection of the full ones (see
+  benchmarks/synthetic.py); record real ones for meaningful numbers.
+
+Postgres sweeps (--database-url, scratch database only):
+- hnsw: hnsw.ef_search through find_matches_by_vectors_ann
+- hnsw_radius (--radius-km): the same with each query's search point and a
+  small radius, against a radius-filtered ground truth, with the iterative
+  scan on and off. A plain HNSW scan filters only its ef_search neighbours,
+  so its recall drops with the radius; the service must still fill k.
+- ivfflat: ivfflat.probes on a temporary IVFFlat index. The HNSW index is
+  dropped inside a transaction that is rolled back afterwards.
+
+Other searches run without a location filter so only the index is measured.
+
+Usage (from backend/):
+    python -m benchmarks.recall --size 50000 --queries 200 --k 20
+    python -m benchmarks.recall --embeddings recorded.npz --coarse-dimensions 256
+    python -m benchmarks.recall --size 50000 --database-url postgresql://localhost/lostdogs_bench \\
+        --ef-search 20 40 80 160 --ivf-lists 100 --probes 1 5 10 20
+"""
+from typing import Callable, List, Optional, Set
+import argparse
+import time
+import uuid
+import numpy as np
+
+from benchmarks.common import configure_environment, latency_summary, run_metadata, write_results
+from benchmarks.database import delete_sightings, insert_sightings
+from benchmarks.synthetic import SyntheticSearches, SyntheticSightings, load_embedding_set
+
+IVF_INDEX_NAME = "ix_dog_sightings_image_embedding_ivfflat_benchmark"
+
+# A search returns the ids of its top-k results, best first
+SearchFn = Callable[[int], List[uuid.UUID]]
+
+
+def ground_truth(
+    sightings: SyntheticSightings,
+    searches: SyntheticSearches,
+    k: int,
+    min_score: float,
+    block_rows: int = 65536,
+    radius_km: Optional[float] = None
+) -> List[Set[uuid.UUID]]:
+    """
+    Exact top-k ids per query.
+
+    Embeddings are unit length, so cosine is a dot product; it is checked
+    against calculate_cosine_similarity on a sample before use. With
+    radius_km, sightings farther than that from a query's search point score
+    0 (sightings without coordinates stay in, as in the service).
+    """
+    from app.services.embedding_index import haversine_km
+
+    from app.services.matching_service import MatchingService
+
+    scores = np.empty((searches.count, sightings.count), dtype=np.float32)
+    for start in range(0, sightings.count, block_rows):
+        stop = min(start + block_rows, sightings.count)
+        scores[:, start:stop] = searches.embeddings @ sightings.embeddings[start:stop].T
+    np.clip(scores, 0.0, 1.0, out=scores)
+
+    sample = range(min(50, sightings.count))
+    expected = [MatchingService.calculate_cosine_similarity(searches.embeddings[0], sightings.embeddings[row]) for row in sample]
+    if not np.allclose(scores[0, :len(expected)], expected, atol=1e-4):
+        raise RuntimeError("Ground truth does not match calculate_cosine_similarity")
+
+    if radius_km is not None:
+        for query in range(searches.count):
+            latitude, longitude = searches.location(query)
+            if latitude is not None:
+                distances = haversine_km(latitude, longitude, sightings.latitudes, sightings.longitudes)
+                scores[query, distances > radius_km] = 0.0
+
+    truth = []
+    for query in range(searches.count):
+        row_scores = scores[query]
+        top = np.argpartition(-row_scores, k - 1)[:k] if sightings.count > k else np.arange(sightings.count)
+        truth.append({sightings.ids[row] for row in top if row_scores[row] >= min_score})
+    return truth
+
+
+def evaluate(method: str, params: dict, search: SearchFn, truth: List[Set[uuid.UUID]], k: int) -> dict:
+    """Run every query through search and compare with the ground truth."""
+    search(0)  # warm-up
+
+    latencies = []
+    recalls = []
+    for query, expected in enumerate(truth):
+        started = time.perf_counter()
+        found = search(query)
+        latencies.append(time.perf_counter() - started)
+        if expected:
+            recalls.append(len(expected & set(found[:k])) / len(expected))
+
+    result = {
+        "method": method,
+        "params": params,
+        f"recall_at_{k}": round(float(np.mean(recalls)), 4) if recalls else None,
+        "qps": round(len(truth) / sum(latencies), 2),
+        "latency_ms": latency_summary(latencies),
+    }
+    print(
+        f"✅ {method} {params}: recall@{k} {result[f'recall_at_{k}']}, "
+        f"{result['qps']} QPS, p95 {result['latency_ms']['p95']} ms"
+    )
+    return result
+
+
+def _rescored(sightings: SyntheticSightings, searches: SyntheticSearches, rows: dict, k: int, min_score: float):
+    """Re-score candidate ids with exact float32 cosine, like MatchingService._rescore."""
+    from app.services.embedding_index import cosine_similarities
+
+    def rescore(query: int, hits: list) -> List[uuid.UUID]:
+        vectors = [sightings.embeddings[rows[sighting_id]] for sighting_id, _, _ in hits]
+        scores = cosine_similarities(searches.embeddings[query], vectors)
+        order = np.argsort(-scores, kind="stable")
+        return [hits[i][0] for i in order if scores[i] >= min_score][:k]
+
+    return rescore
+
+
+def memory_sweeps(sightings, searches, truth, args, min_score: float) -> List[dict]:
+    """EmbeddingIndex dtype x re-score pool, and two-stage coarse dimension x pool."""
+    from app.services.embedding_index import EmbeddingIndex, QUANTIZATION_SCORE_MARGIN, rescore_pool
+
+    rows = {sighting_id: row for row, sighting_id in enumerate(sightings.ids)}
+    rescore = _rescored(sightings, searches, rows, args.k, min_score)
+    results = []
+
+    for dtype in args.dtypes:
+        index = EmbeddingIndex(dimension=sightings.dimension, dtype=dtype, initial_capacity=sightings.count)
+        for row, sighting_id in enumerate(sightings.ids):
+            index.upsert(sighting_id, sightings.embeddings[row])
+
+        pools = [0] + ([pool for pool in args.rescore_pools if pool > args.k] if index.quantized else [])
+        for pool in pools:
+            if pool:
+                search = lambda query, pool=pool: rescore(query, rescore_pool(index.search(
+                    searches.embeddings[query], pool, min_score - QUANTIZATION_SCORE_MARGIN
+                ), args.k))
+            else:
+                search = lambda query: [hit[0] for hit in index.search(searches.embeddings[query], args.k, min_score)]
+            results.append(evaluate(
+                "memory", {"dtype": dtype, "rescore_pool": pool,
+                           "index_mb": round(index.memory_bytes / 2 ** 20, 1)},
+                search, truth, args.k
+            ))
+
+    for dimension in args.coarse_dimensions:
+        coarse_index = EmbeddingIndex(dimension=dimension, initial_capacity=sightings.count)
+        coarse = sightings.coarse(dimension)
+        coarse_queries = searches.coarse(dimension)
+        for row, sighting_id in enumerate(sightings.ids):
+            coarse_index.upsert(sighting_id, coarse[row])
+
+        for pool in args.coarse_pools:
+            search = lambda query, pool=pool: rescore(
+                query, coarse_index.search(coarse_queries[query], max(args.k, pool), 0.0)
+            )
+            results.append(evaluate(
+                "two_stage", {"coarse_dimension": dimension, "coarse_pool": pool,
+                              "recorded": sightings.recorded_coarse(dimension),
+                              "index_mb": round(coarse_index.memory_bytes / 2 ** 20, 1)},
+                search, truth, args.k
+            ))
+
+    return results
+
+
+def postgres_sweeps(sightings, searches, truth, args) -> List[dict]:
+    """HNSW ef_search and IVFFlat probes against the real database."""
+    from sqlalchemy import text
+
+    from app.config import settings
+    from app.database import SessionLocal, init_db
+    from app.models.dog_sighting import DogSighting
+    from app.services.matching_service import MatchingService
+
+    init_db()
+    db = SessionLocal()
+    service = MatchingService()
+    results = []
+    embedding = lambda query: searches.embeddings[query].tolist()
+
+    try:
+        insert_sightings(db, sightings)
+        db.execute(text("ANALYZE dog_sightings"))
+        db.commit()
+
+        for ef_search in args.ef_search:
+            def search(query: int, ef_search=ef_search) -> List[uuid.UUID]:
+                hits = service.find_matches_by_vectors_ann(db, embedding(query), limit=args.k, ef_search=ef_search)
+                db.rollback()
+                return [sighting.id for sighting, _, _ in hits]
+
+            results.append(evaluate("hnsw", {"ef_search": ef_search, "m": settings.hnsw_m}, search, truth, args.k))
+
+        if args.radius_km:
+            radius_truth = ground_truth(sightings, searches, args.k, settings.min_match_score, radius_km=args.radius_km)
+            iterative_scan = settings.hnsw_iterative_scan
+            try:
+                for mode in [iterative_scan, "off"] if iterative_scan != "off" else ["off"]:
+                    settings.hnsw_iterative_scan = mode
+                    for ef_search in args.ef_search:
+                        def search(query: int, ef_search=ef_search) -> List[uuid.UUID]:
+                            latitude, longitude = searches.location(query)
+                            hits = service.find_matches_by_vectors_ann(
+                                db, embedding(query), latitude, longitude, args.radius_km,
+                                limit=args.k, ef_search=ef_search
+                            )
+                            db.rollback()
+                            return [sighting.id for sighting, _, _ in hits]
+
+                        results.append(evaluate(
+                            "hnsw_radius",
+                            {"ef_search": ef_search, "radius_km": args.radius_km, "iterative_scan": mode},
+                            search, radius_truth, args.k
+                        ))
+            finally:
+                settings.hnsw_iterative_scan = iterative_scan
+
+        for lists in args.ivf_lists:
+            # DDL is transactional: the rollback below restores the HNSW index
+            print(f"🔄 Building IVFFlat index (lists={lists})...")
+            db.execute(text("DROP INDEX IF EXISTS ix_dog_sightings_image_embedding_hnsw"))
+            db.execute(text(
+                f"CREATE INDEX {IVF_INDEX_NAME} ON dog_sightings "
+                f"USING ivfflat (image_embedding {settings.embedding_storage}_cosine_ops) WITH (lists = {lists})"
+            ))
+            try:
+                for probes in args.probes:
+                    db.execute(text("SELECT set_config('ivfflat.probes', :probes, true)"), {"probes": str(probes)})
+
+                    def search(query: int) -> List[uuid.UUID]:
+                        cosine_distance = DogSighting.image_embedding.cosine_distance(embedding(query))
+                        rows = db.query(DogSighting.id).filter(
+                            DogSighting.status == "active",
+                            DogSighting.image_embedding.isnot(None),
+                            cosine_distance <= 1 - settings.min_match_score
+                        ).order_by(cosine_distance).limit(args.k).all()
+                        return [sighting_id for sighting_id, in rows]
+
+                    results.append(evaluate("ivfflat", {"lists": lists, "probes": probes}, search, truth, args.k))
+            finally:
+                db.rollback()
+    finally:
+        if not args.keep:
+            delete_sightings(db)
+        db.close()
+
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--dtypes", nargs="+", default=["float32", "float16", "int8"])
+    parser.add_argument("--rescore-pools", type=int, nargs="+", default=[50, 100, 200])
+    parser.add_argument("--coarse-dimensions", type=int, nargs="+", default=[128, 256, 512])
+    parser.add_argument("--coarse-pools", type=int, nargs="+", default=[25, 50, 100, 300, 1000])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[20, 40, 80, 160, 320])
+    parser.add_argument("--ivf-lists", type=int, nargs="*", default=[],
+                        help="IVFFlat list counts to build (e.g. sqrt(size)); none by default")
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 5, 10, 20, 40])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embeddings", help="Recorded embedding set (.npz, see load_embedding_set)")
+    parser.add_argument("--database-url", help="Also sweep HNSW/IVFFlat in this Postgres database")
+    parser.add_argument("--radius-km", type=float, default=2.0,
+                        help="Radius of the hnsw_radius sweep (0 to skip)")
+    parser.add_argument("--keep", action="store_true", help="Keep benchmark rows in Postgres")
+    parser.add_argument("--output", default="recall.json")
+    args = parser.parse_args(argv)
+
+    configure_environment(args.database_url)
+    from app.config import settings
+
+    print(f"🔄 Generating {args.size} synthetic sightings and {args.queries} queries...")
+    embedding_set = load_embedding_set(args.embeddings) if args.embeddings else None
+    sightings = SyntheticSightings(args.size, seed=args.seed, embedding_set=embedding_set)
+    searches = SyntheticSearches(sightings, args.queries, seed=args.seed + 1)
+
+    started = time.perf_counter()
+    truth = ground_truth(sightings, searches, args.k, settings.min_match_score)
+    truth_seconds = time.perf_counter() - started
+
+    results = memory_sweeps(sightings, searches, truth, args, settings.min_match_score)
+    if args.database_url:
+        results += postgres_sweeps(sightings, searches, truth, args)
+
+    write_results(args.output, {
+        "meta": run_metadata(args),
+        "ground_truth": {
+            "k": args.k,
+            "min_score": settings.min_match_score,
+            "queries_with_matches": sum(1 for expected in truth if expected),
+            "seconds": round(truth_seconds, 3),
+        },
+        "results": results,
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+Synthetic sightings and searches for benchmarks.
+
+Sightings are grouped in "dog look" clusters that share attributes and an
+embedding direction, so searches have real matches at realistic similarity
+levels (~0.3 between unrelated dogs, ~0.75 within a cluster, ~0.9 for
+another photo of the same dog).
+
+Short (two-stage) embeddings are a noisy random projection of the full
+vectors, not a prefix: the short model output is a different vector that
+only roughly preserves similarities. Recorded embeddings (load_embedding_set)
+replace the synthetic vectors when available; attributes and locations stay
+synthetic.
+"""
+from typing import Dict, List, Optional
+import uuid
+import numpy as np
+
+# Santiago center and spread (~9 km standard deviation)
+SANTIAGO_LATITUDE = -33.4489
+SANTIAGO_LONGITUDE = -70.6693
+LOCATION_SPREAD_DEGREES = 0.08
+
+# Vocabulary from the Gemini prompts in app/services/llm_service.py
+BREEDS = ["quiltro", "mestizo", "labrador", "pastor_aleman"]
+BREED_WEIGHTS = [0.4, 0.3, 0.18, 0.12]
+COLORS = ["amarillo", "negro", "cafe", "blanco"]
+SIZES = ["pequeno", "mediano", "grande"]
+AGES = ["cachorro", "joven", "adulto", "senior"]
+FEATURES = [
+    "collar", "arnes", "placa", "cadena",
+    "manchas", "cicatrices", "orejas_caidas",
+    "pelo_corto", "pelo_largo", "heridas", "cojera",
+]
+VOCABULARY = BREEDS + COLORS + SIZES + AGES + FEATURES
+
+# Embedding mix: shared component, cluster component, per-dog noise
+GLOBAL_WEIGHT = 0.6
+CLUSTER_WEIGHT = 0.7
+NOISE_WEIGHT = 0.5
+QUERY_NOISE_WEIGHT = 0.3
+# Detail the short embedding loses on top of the projection (per vector)
+COARSE_NOISE_WEIGHT = 0.35
+
+
+def _unit(rng: np.random.Generator, rows: int, dimension: int) -> np.ndarray:
+    """Random unit vectors."""
+    vectors = rng.standard_normal((rows, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length."""
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def project_coarse(
+    embeddings: np.ndarray,
+    dimension: int,
+    projection_seed: int,
+    noise_seed: int,
+    block_rows: int = 16384
+) -> np.ndarray:
+    """
+    Synthetic short embeddings: a random Gaussian projection of the full
+    vectors plus independent per-vector noise.
+
+    Args:
+        embeddings: Full unit vectors, one per row
+        dimension: Short embedding dimension
+        projection_seed: Seed of the projection ("the model"); sightings and
+            searches must share it
+        noise_seed: Seed of the per-vector noise
+        block_rows: Rows projected at a time (bounds temporary memory)
+    """
+    projection = np.random.default_rng([projection_seed, dimension]).standard_normal(
+        (embeddings.shape[1], dimension)
+    ).astype(np.float32) / np.sqrt(dimension)
+    rng = np.random.default_rng([noise_seed, dimension])
+
+    coarse = np.empty((len(embeddings), dimension), dtype=np.float32)
+    for start in range(0, len(embeddings), block_rows):
+        stop = min(start + block_rows, len(embeddings))
+        coarse[start:stop] = normalize(
+            embeddings[start:stop] @ projection
+            + COARSE_NOISE_WEIGHT * _unit(rng, stop - start, dimension)
+        )
+    return coarse
+
+
+def load_embedding_set(path: str) -> Dict[str, np.ndarray]:
+    """
+    Recorded embeddings (.npz) to benchmark with instead of synthetic vectors.
+
+    Arrays (rows need not be normalized):
+        embeddings: Full sighting embeddings, (sightings, dimension)
+        coarse_<d>: Optional short sighting embeddings of dimension d, same rows
+        queries: Optional full query embeddings, (queries, dimension); queries
+            are synthesized from the sightings when missing
+        query_coarse_<d>: Optional short query embeddings, same rows as queries
+
+    Short embeddings are used only when recorded for both the sightings and
+    the queries; otherwise both fall back to project_coarse.
+    """
+    with np.load(path) as data:
+        arrays = {name: np.asarray(data[name], dtype=np.float32) for name in data.files}
+    if "embeddings" not in arrays:
+        raise ValueError(f"{path} has no 'embeddings' array")
+    return arrays
+
+
+class SyntheticSightings:
+    """Column-oriented synthetic sightings (row i of every array is one sighting)."""
+
+    def __init__(
+        self,
+        count: int,
+        dimension: int = 1408,
+        coarse_dimension: int = 256,
+        clusters: Optional[int] = None,
+        missing_location_rate: float = 0.05,
+        seed: int = 0,
+        block_rows: int = 16384,
+        embedding_set: Optional[Dict[str, np.ndarray]] = None
+    ):
+        """
+        Args:
+            count: Number of sightings (at most the recorded rows with embedding_set)
+            dimension: Full embedding dimension (ignored with embedding_set)
+            coarse_dimension: Short embedding dimension (two-stage search)
+            clusters: Number of look-alike groups (default ~count / 50)
+            missing_location_rate: Share of sightings without coordinates
+            seed: RNG seed, so runs are reproducible
+            block_rows: Rows generated at a time (bounds temporary memory)
+            embedding_set: Recorded embeddings from load_embedding_set
+        """
+        rng = np.random.default_rng(seed)
+        if embedding_set is not None:
+            count = min(count, len(embedding_set["embeddings"]))
+            dimension = embedding_set["embeddings"].shape[1]
+        clusters = clusters or max(1, count // 50)
+
+        self.count = count
+        self.dimension = dimension
+        self.seed = seed
+        self.block_rows = block_rows
+        self.embedding_set = embedding_set
+        self.ids = [uuid.UUID(int=int(value)) for value in rng.integers(1, 2 ** 63, size=count)]
+        self.cluster_of = rng.integers(0, clusters, size=count)
+
+        # Per-cluster look: breed, color(s), size
+        cluster_breeds = rng.choice(len(BREEDS), size=clusters, p=BREED_WEIGHTS)
+        cluster_colors = rng.integers(0, len(COLORS), size=(clusters, 2))
+        cluster_sizes = rng.integers(0, len(SIZES), size=clusters)
+
+        self.attributes: List[List[str]] = []
+        for row in range(count):
+            cluster = self.cluster_of[row]
+            attributes = {
+                BREEDS[cluster_breeds[cluster]],
+                COLORS[cluster_colors[cluster, 0]],
+                SIZES[cluster_sizes[cluster]],
+                AGES[rng.integers(len(AGES))],
+            }
+            if rng.random() < 0.5:
+                attributes.add(COLORS[cluster_colors[cluster, 1]])
+            attributes.update(rng.choice(FEATURES, size=rng.integers(0, 4), replace=False).tolist())
+            self.attributes.append(sorted(attributes))
+
+        self.latitudes = rng.normal(SANTIAGO_LATITUDE, LOCATION_SPREAD_DEGREES, size=count)
+        self.longitudes = rng.normal(SANTIAGO_LONGITUDE, LOCATION_SPREAD_DEGREES, size=count)
+        missing = rng.random(count) < missing_location_rate
+        self.latitudes[missing] = np.nan
+        self.longitudes[missing] = np.nan
+
+        if embedding_set is not None:
+            self.embeddings = normalize(embedding_set["embeddings"][:count])
+        else:
+            shared = _unit(rng, 1, dimension)
+            centroids = _unit(rng, clusters, dimension)
+            self.embeddings = np.empty((count, dimension), dtype=np.float32)
+            for start in range(0, count, block_rows):
+                stop = min(start + block_rows, count)
+                self.embeddings[start:stop] = normalize(
+                    GLOBAL_WEIGHT * shared
+                    + CLUSTER_WEIGHT * centroids[self.cluster_of[start:stop]]
+                    + NOISE_WEIGHT * _unit(rng, stop - start, dimension)
+                )
+
+        self.coarse_embeddings = self.coarse(coarse_dimension)
+
+    def recorded_coarse(self, dimension: int) -> bool:
+        """
+        Whether short embeddings of this dimension were recorded for both the
+        sightings and the queries (they must come from the same model).
+        """
+        names = {"queries", f"coarse_{dimension}", f"query_coarse_{dimension}"}
+        return self.embedding_set is not None and names <= self.embedding_set.keys()
+
+    def coarse(self, dimension: int) -> np.ndarray:
+        """Short embeddings of every sighting (recorded, or project_coarse)."""
+        if self.recorded_coarse(dimension):
+            return normalize(self.embedding_set[f"coarse_{dimension}"][:self.count])
+        return project_coarse(self.embeddings, dimension, self.seed, self.seed, self.block_rows)
+
+    def location(self, row: int):
+        """(latitude, longitude) of a sighting, or (None, None)."""
+        if np.isnan(self.latitudes[row]):
+            return None, None
+        return float(self.latitudes[row]), float(self.longitudes[row])
+
+
+class SyntheticSearches:
+    """
+    Searches for sightings already in the data set: another photo of the same
+    dog, a slightly different description and a nearby search point.
+
+    With recorded query embeddings, each query targets its most similar
+    sighting (for the description and search point).
+    """
+
+    def __init__(
+        self,
+        sightings: SyntheticSightings,
+        count: int,
+        missing_location_rate: float = 0.2,
+        seed: int = 1
+    ):
+        rng = np.random.default_rng(seed)
+        recorded = (sightings.embedding_set or {}).get("queries")
+        if recorded is not None:
+            count = min(count, len(recorded))
+        self.count = count
+        self.seed = seed
+        self.sightings = sightings
+
+        if recorded is not None:
+            self.embeddings = normalize(recorded[:count])
+            self.targets = np.empty(count, dtype=np.int64)
+            best = np.full(count, -np.inf, dtype=np.float32)
+            for start in range(0, sightings.count, sightings.block_rows):
+                stop = min(start + sightings.block_rows, sightings.count)
+                scores = self.embeddings @ sightings.embeddings[start:stop].T
+                block_best = scores.max(axis=1)
+                better = block_best > best
+                self.targets[better] = start + scores.argmax(axis=1)[better]
+                best[better] = block_best[better]
+        else:
+            self.targets = rng.integers(0, sightings.count, size=count)
+
+        self.attributes: List[List[str]] = []
+        for row in self.targets:
+            attributes = set(sightings.attributes[row])
+            # Owners forget a detail and add one the finder did not report
+            if len(attributes) > 2 and rng.random() < 0.5:
+                attributes.discard(str(rng.choice(sorted(attributes))))
+            if rng.random() < 0.5:
+                attributes.add(str(rng.choice(FEATURES)))
+            self.attributes.append(sorted(attributes))
+
+        if recorded is None:
+            self.embeddings = normalize(
+                sightings.embeddings[self.targets]
+                + QUERY_NOISE_WEIGHT * _unit(rng, count, sightings.dimension)
+            )
+        self.coarse_embeddings = self.coarse(sightings.coarse_embeddings.shape[1])
+
+        # Within ~1 km of where the dog was seen
+        self.latitudes = np.where(
+            np.isnan(sightings.latitudes[self.targets]),
+            SANTIAGO_LATITUDE,
+            sightings.latitudes[self.targets]
+        ) + rng.normal(0, 0.01, size=count)
+        self.longitudes = np.where(
+            np.isnan(sightings.longitudes[self.targets]),
+            SANTIAGO_LONGITUDE,
+            sightings.longitudes[self.targets]
+        ) + rng.normal(0, 0.01, size=count)
+        missing = rng.random(count) < missing_location_rate
+        self.latitudes[missing] = np.nan
+        self.longitudes[missing] = np.nan
+
+    def coarse(self, dimension: int) -> np.ndarray:
+        """Short embeddings of every query (recorded, or the sightings' projection with independent noise)."""
+        if self.sightings.recorded_coarse(dimension):
+            return normalize(self.sightings.embedding_set[f"query_coarse_{dimension}"][:self.count])
+        return project_coarse(self.embeddings, dimension, self.sightings.seed, self.seed, self.sightings.block_rows)
+
+    def location(self, query: int):
+        """(latitude, longitude) of a search, or (None, None)."""
+        if np.isnan(self.latitudes[query]):
+            return None, None
+        return float(self.latitudes[query]), float(self.longitudes[query])
@@ -2,16 +2,22 @@
 Lost Dogs Finder - FastAPI Backend
 Main application with all endpoints.
 """
-from fastapi import FastAPI, Depends, HTTPException, status
+# Taken before any other import so readiness timings cover the whole import
+import time
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import text, func
 from typing import Optional
+import asyncio
 import uuid
 
 from app.config import settings
-from app.database import get_db, init_db
-from app.models.dog_sighting import DogSighting
+from app.database import get_db, init_db, SessionLocal
+from app.models.dog_sighting import DogSighting, DogSightingImageEmbedding
 from app.schemas.dog_sighting import (
     DogSightingCreate,
     DogSightingResponse,
@@ -21,10 +27,33 @@ from app.schemas.dog_sighting import (
 )
 from app.schemas.search import SearchRequest, SearchResponse
 from app.services.storage_service import storage_service
-from app.services.llm_service import dog_description, extract_search_attributes
+from app.services.llm_service import dog_description, extract_search_attributes, description_cache, get_model, LLMTimeoutError
 from app.services.matching_service import matching_service
 from app.services.embedding_service import embedding_service
+from app.services.vocabulary_service import vocabulary_service
+from app.services.search_cache import search_cache
+from app.services.image_cache import image_cache
+from app.services.local_extractor import local_extractor
+from app.services.outbound_governor import gemini_governor, vertex_governor, OutboundOverloadedError
 from app.utils.base64_handler import convert_base64_to_upload_files
+from app.utils.disconnect import cancel_on_disconnect
+from app.utils.readiness import readiness
+
+
+# Fire-and-forget tasks (cleanups, warm-ups), referenced until done so they are not collected
+_background_tasks = set()
+
+# Which dependencies are warm, and import -> startup -> first response timings
+readiness.import_started = IMPORT_STARTED
+WARMUP_COMPONENTS = ("gemini", "storage", "embeddings", "search_indexes")
+
+
+def _spawn(coro) -> asyncio.Task:
+    """Run a coroutine in the background, keeping a reference until it is done."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
 
 
 def format_search_results(results):
@@ -66,22 +95,113 @@ app.add_middleware(
 # Startup & Shutdown Events
 # ============================================================================
 
+@app.middleware("http")
+async def record_first_response(request: Request, call_next):
+    """Note when the first response is served (cold start metric)."""
+    response = await call_next(request)
+    readiness.mark_response()
+    return response
+
+
+@app.exception_handler(LLMTimeoutError)
+async def llm_timeout_handler(request: Request, exc: LLMTimeoutError):
+    """Gemini did not answer in time: 504."""
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content={"detail": "El análisis con IA tardó demasiado. Intenta nuevamente."}
+    )
+
+
+@app.exception_handler(OutboundOverloadedError)
+async def outbound_overloaded_handler(request: Request, exc: OutboundOverloadedError):
+    """Too many Gemini/Vertex calls queued: 503, retry shortly."""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Hay demasiadas solicitudes en este momento. Intenta nuevamente en unos segundos."},
+        headers={"Retry-After": "5"}
+    )
+
+
+def _load_vocabulary() -> None:
+    print(f"🔤 Attribute vocabulary: {vocabulary_service.load()} tokens")
+
+
+def _load_search_indexes() -> None:
+    db = SessionLocal()
+    try:
+        matching_service.load_indexes(db)
+    finally:
+        db.close()
+
+
+async def _warm_up_clients() -> None:
+    """Create the external clients; each getter records its own readiness (failures included)."""
+    await asyncio.gather(
+        asyncio.to_thread(get_model),
+        asyncio.to_thread(storage_service.get_bucket),
+        asyncio.to_thread(embedding_service.get_backend),
+        return_exceptions=True,
+    )
+
+
+async def _finish_warm_up(*warm_ups) -> None:
+    await asyncio.gather(*warm_ups)
+    print(f"🔥 Warm-up finished {readiness.status()['timings']}")
+
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database on startup."""
+    """
+    Initialize the database, then warm up the external clients according to
+    settings.startup_warmup. Clients are created lazily on first use anyway,
+    so warm-up failures are reported by /api/ready instead of stopping the app
+    (the getters record their own state, so a later successful first use
+    turns a failed component ready). If the database step fails, the
+    client warm-up is cancelled before the error propagates.
+    """
+    readiness.mark_imported()
     print("🚀 Starting Lost Dogs Finder API....")
     print(f"📍 Environment: {settings.environment}")
     print(f"🗄️  Database: {settings.database_url.split('@')[-1]}")
     print(f"☁️  GCS Bucket: {settings.gcs_bucket_name}")
+    print(f"🔥 Warm-up: {settings.startup_warmup}")
+
+    readiness.pending(*WARMUP_COMPONENTS)
+    if matching_service.indexes_loaded():
+        # No in-memory index enabled: nothing to load
+        readiness.mark_ready("search_indexes")
+    warm_up = None
+    if settings.startup_warmup in ("blocking", "background"):
+        # Client warm-ups need no database: start them alongside init_db
+        warm_up = asyncio.create_task(_warm_up_clients())
 
-    init_db()
-    print("✅ Database initialized")
+    try:
+        await readiness.run("database", init_db, required=True)
+        await asyncio.gather(
+            readiness.run("vocabulary", _load_vocabulary, required=True),
+            # Old cache rows are only dead weight: never fatal
+            readiness.run("description_cache", description_cache.purge_stale),
+        )
+    except BaseException:
+        if warm_up is not None:
+            warm_up.cancel()
+        raise
+
+    if warm_up is not None:
+        indexes = readiness.run("search_indexes", _load_search_indexes)
+        if settings.startup_warmup == "blocking":
+            await asyncio.gather(warm_up, indexes)
+        else:
+            _spawn(_finish_warm_up(warm_up, indexes))
+
+    readiness.mark_started()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown."""
     print("👋 Shutting down Lost Dogs Finder API...")
+    await embedding_service.close()
 
 
 # ============================================================================
@@ -97,11 +217,10 @@ async def health_check(db: Session = Depends(get_db)):
         db.execute(text("SELECT 1"))
         db_status = "connected"
 
-        total_sightings = db.query(DogSighting).filter(DogSighting.status == "active").count()
-        with_embeddings = db.query(DogSighting).filter(
-            DogSighting.status == "active",
-            DogSighting.image_embedding.isnot(None)
-        ).count()
+        total_sightings, with_embeddings = db.query(
+            func.count(DogSighting.id),
+            func.count(DogSighting.id).filter(DogSighting.image_embedding.isnot(None))
+        ).filter(DogSighting.status == "active").one()
 
     except Exception as e:
         db_status = f"error: {str(e)}"
@@ -118,10 +237,143 @@ async def health_check(db: Session = Depends(get_db)):
             "total_sightings": total_sightings,
             "with_embeddings": with_embeddings,
             "percentage": round(with_embeddings / total_sightings * 100, 1) if total_sightings > 0 else 0
+        },
+        "search_cache": search_cache.stats(),
+        "description_cache": description_cache.stats(),
+        "image_cache": image_cache.stats(),
+        "local_extractor": local_extractor.stats(),
+        "outbound": {
+            "gemini": gemini_governor.stats(),
+            "vertex": vertex_governor.stats()
         }
     }
 
 
+@app.get("/api/ready", tags=["Health"])
+async def readiness_check(response: Response, full: bool = False):
+    """
+    Readiness probe: 200 once the database is initialized, 503 before.
+
+    With ?full=true it also waits for the warm-up (Gemini, GCS, embedding
+    backend, search indexes); with STARTUP_WARMUP=lazy, for their first use.
+    The body lists each dependency's state and the import -> startup -> first
+    response timings.
+    """
+    required = ["database", "vocabulary"] + (list(WARMUP_COMPONENTS) if full else [])
+    ready = readiness.is_ready(required)
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+    return {
+        "status": "ready" if ready else "starting",
+        "warm": readiness.is_ready(WARMUP_COMPONENTS),
+        "warmup_mode": settings.startup_warmup,
+        **readiness.status()
+    }
+
+
+async def _discard_uploads(upload_task: asyncio.Task) -> None:
+    """Delete whatever an upload task stored once it finishes."""
+    try:
+        image_urls = await upload_task
+    except BaseException:
+        # upload_multiple_images already cleaned up after itself
+        return
+    for url in image_urls:
+        await storage_service.delete_image(url)
+
+
+async def ingest_sighting(
+    sighting: DogSightingCreate,
+    request: Request,
+    db: Session,
+    sighting_status: str
+) -> DogSighting:
+    """
+    Shared ingest path of create_sighting and create_draft_sighting.
+
+    GCS uploads, Gemini validation and Vertex embeddings start together, so
+    a report takes as long as the slowest of them instead of their sum. If
+    Gemini rejects the photos, times out or the client disconnects, the
+    embeddings are cancelled and the uploads are deleted in the background.
+
+    Raises:
+        HTTPException: 400 if the photos do not show a dog, 499 on disconnect
+        LLMTimeoutError: If Gemini does not answer in time
+        OutboundOverloadedError: If too many Gemini calls are already queued
+        ValueError: If an image is too large or has an invalid format
+    """
+    if len(sighting.images) > settings.max_images_per_sighting:
+        raise ValueError(f"Too many images. Max: {settings.max_images_per_sighting}")
+    print(f"📤 Converting {len(sighting.images)} base64 images...")
+    images = await convert_base64_to_upload_files(sighting.images)
+    for image in images:
+        storage_service.validate_image(image.content, image.content_type)
+
+    print(f"🚀 Uploading {len(images)} images, extracting attributes and generating embeddings...")
+    upload_task = asyncio.create_task(storage_service.upload_multiple_images(images))
+    # Embed the decoded, normalized bytes: no GCS round trip, no second decode
+    embedding_task = asyncio.create_task(embedding_service.generate_image_embeddings(
+        [image.content for image in images]
+    ))
+
+    try:
+        llm_result = await cancel_on_disconnect(request, dog_description(images, sighting.description))
+
+        if not llm_result or llm_result.get("es_perro") == False:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Las imágenes no parecen mostrar un perro. Por favor, sube imágenes claras de un perro."
+            )
+
+        attributes = llm_result.get("atributos", [])
+        print(f"✅ Extracted attributes: {attributes}")
+
+        image_urls, photo_embeddings = await asyncio.gather(upload_task, embedding_task)
+    except BaseException:
+        # Nothing will reference the uploads or embeddings
+        embedding_task.cancel()
+        _spawn(_discard_uploads(upload_task))
+        raise
+
+    print(f"✅ Images uploaded: {image_urls}")
+    image_embedding = photo_embeddings[0]["full"]
+    if image_embedding is not None:
+        print(f"✅ Embedding generated: {len(image_embedding)} dimensions")
+    else:
+        print("⚠️  Failed to generate embedding, continuing without it")
+
+    new_sighting = DogSighting(
+        image_urls=image_urls,
+        user_description=sighting.description,
+        attributes=attributes,
+        attribute_bits=vocabulary_service.encode_attributes(attributes),
+        image_embedding=image_embedding,
+        image_embedding_coarse=photo_embeddings[0]["coarse"],
+        image_embeddings=[
+            DogSightingImageEmbedding(position=position, embedding=embeddings["full"])
+            for position, embeddings in enumerate(photo_embeddings)
+            if embeddings["full"] is not None
+        ],
+        latitude=sighting.latitude,
+        longitude=sighting.longitude,
+        location_address=sighting.location_address,
+        neighborhood=sighting.neighborhood,
+        contact_name=sighting.contact_name,
+        contact_phone=sighting.contact_phone,
+        contact_email=sighting.contact_email,
+        status=sighting_status
+    )
+
+    db.add(new_sighting)
+    db.commit()
+    db.refresh(new_sighting)
+
+    matching_service.on_sighting_saved(new_sighting)
+
+    return new_sighting
+
+
 # ============================================================================
 # Dog Sighting Endpoints
 # ============================================================================
@@ -134,6 +386,7 @@ async def health_check(db: Session = Depends(get_db)):
 )
 async def create_sighting(
     sighting: DogSightingCreate,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """
@@ -144,59 +397,13 @@ async def create_sighting(
     - LLM automatically extracts dog attributes
     """
     try:
-        print(f"📤 Converting {len(sighting.images)} base64 images...")
-        images = convert_base64_to_upload_files(sighting.images)
-
-        print(f"📤 Uploading {len(images)} images to GCS...")
-        image_urls = await storage_service.upload_multiple_images(images)
-        print(f"✅ Images uploaded: {image_urls}")
-
-        print("🤖 Extracting dog attributes with LLM...")
-        llm_result = await dog_description(images, sighting.description)
-
-        if not llm_result or llm_result.get("es_perro") == False:
-            for url in image_urls:
-                await storage_service.delete_image(url)
-
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Las imágenes no parecen mostrar un perro. Por favor, sube imágenes claras de un perro."
-            )
-
-        attributes = llm_result.get("atributos", [])
-        print(f"✅ Extracted attributes: {attributes}")
-
-        print("🔢 Generating image embedding...")
-        image_embedding = await embedding_service.generate_embedding(image_urls[0])
-        if image_embedding is not None:
-            print(f"✅ Embedding generated: {len(image_embedding)} dimensions")
-        else:
-            print("⚠️  Failed to generate embedding, continuing without it")
-
-        new_sighting = DogSighting(
-            image_urls=image_urls,
-            user_description=sighting.description,
-            attributes=attributes,
-            image_embedding=image_embedding,
-            latitude=sighting.latitude,
-            longitude=sighting.longitude,
-            location_address=sighting.location_address,
-            neighborhood=sighting.neighborhood,
-            contact_name=sighting.contact_name,
-            contact_phone=sighting.contact_phone,
-            contact_email=sighting.contact_email,
-            status="active"
-        )
-
-        db.add(new_sighting)
-        db.commit()
-        db.refresh(new_sighting)
+        new_sighting = await ingest_sighting(sighting, request, db, "active")
 
         print(f"✅ Sighting created with ID: {new_sighting.id}")
 
         return DogSightingResponse.from_orm_model(new_sighting)
 
-    except HTTPException:
+    except (HTTPException, LLMTimeoutError, OutboundOverloadedError):
         raise
     except Exception as e:
         print(f"❌ Error creating sighting: {e}")
@@ -214,6 +421,7 @@ async def create_sighting(
 )
 async def create_draft_sighting(
     sighting: DogSightingCreate,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """
@@ -226,59 +434,13 @@ async def create_draft_sighting(
     - Returns draft ID for sharing via bot
     """
     try:
-        print(f"📤 Converting {len(sighting.images)} base64 images...")
-        images = convert_base64_to_upload_files(sighting.images)
-
-        print(f"📤 Uploading {len(images)} images to GCS...")
-        image_urls = await storage_service.upload_multiple_images(images)
-        print(f"✅ Images uploaded: {image_urls}")
-
-        print("🤖 Extracting dog attributes with LLM...")
-        llm_result = await dog_description(images, sighting.description)
-
-        if not llm_result or llm_result.get("es_perro") == False:
-            for url in image_urls:
-                await storage_service.delete_image(url)
-
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Las imágenes no parecen mostrar un perro. Por favor, sube imágenes claras de un perro."
-            )
-
-        attributes = llm_result.get("atributos", [])
-        print(f"✅ Extracted attributes: {attributes}")
-
-        print("🔢 Generating image embedding...")
-        image_embedding = await embedding_service.generate_embedding(image_urls[0])
-        if image_embedding is not None:
-            print(f"✅ Embedding generated: {len(image_embedding)} dimensions")
-        else:
-            print("⚠️  Failed to generate embedding, continuing without it")
-
-        new_sighting = DogSighting(
-            image_urls=image_urls,
-            user_description=sighting.description,
-            attributes=attributes,
-            image_embedding=image_embedding,
-            latitude=sighting.latitude,
-            longitude=sighting.longitude,
-            location_address=sighting.location_address,
-            neighborhood=sighting.neighborhood,
-            contact_name=sighting.contact_name,
-            contact_phone=sighting.contact_phone,
-            contact_email=sighting.contact_email,
-            status="draft"
-        )
-
-        db.add(new_sighting)
-        db.commit()
-        db.refresh(new_sighting)
+        new_sighting = await ingest_sighting(sighting, request, db, "draft")
 
         print(f"✅ Draft sighting created with ID: {new_sighting.id}")
 
         return DogSightingResponse.from_orm_model(new_sighting)
 
-    except HTTPException:
+    except (HTTPException, LLMTimeoutError, OutboundOverloadedError):
         raise
     except Exception as e:
         print(f"❌ Error creating draft sighting: {e}")
@@ -294,6 +456,7 @@ async def create_draft_sighting(
     tags=["Search"]
 )
 async def search_sightings(
+    request: Request,
     description: Optional[str] = None,
     latitude: Optional[float] = None,
     longitude: Optional[float] = None,
@@ -312,7 +475,9 @@ async def search_sightings(
     """
     try:
         print(f"🔍 Searching with description: {description}")
-        search_attrs = await extract_search_attributes(description=description)
+        search_attrs = await cancel_on_disconnect(
+            request, extract_search_attributes(description=description)
+        )
 
         if not search_attrs:
             raise HTTPException(
@@ -322,18 +487,23 @@ async def search_sightings(
 
         print(f"🔍 Search attributes: {search_attrs}")
 
-        results = matching_service.find_matches_with_vectors(
-            db=db,
-            search_attributes=search_attrs,
-            search_embedding=None,
-            latitude=latitude,
-            longitude=longitude,
-            radius_km=radius,
-            limit=limit
-        )
-
-        search_results = format_search_results(results)
-        print(f"✅ Found {len(search_results)} matches")
+        cache_key = search_cache.make_key(search_attrs, None, latitude, longitude, radius, limit)
+        search_results = search_cache.get(cache_key)
+        if search_results is None:
+            results = matching_service.find_matches_with_vectors(
+                db=db,
+                search_attributes=search_attrs,
+                search_embedding=None,
+                latitude=latitude,
+                longitude=longitude,
+                radius_km=radius,
+                limit=limit
+            )
+            search_results = format_search_results(results)
+            search_cache.set(cache_key, search_results, latitude, longitude)
+            print(f"✅ Found {len(search_results)} matches")
+        else:
+            print(f"⚡ Cached search: {len(search_results)} matches")
         
         return SearchResponse(
             results=search_results,
@@ -341,7 +511,7 @@ async def search_sightings(
             total_results=len(search_results)
         )
     
-    except HTTPException:
+    except (HTTPException, LLMTimeoutError, OutboundOverloadedError):
         raise
     except Exception as e:
         print(f"❌ Error searching: {e}")
@@ -358,6 +528,7 @@ async def search_sightings(
 )
 async def search_sightings_with_image(
     search_request: SearchRequest,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """
@@ -377,13 +548,13 @@ async def search_sightings_with_image(
         images = None
         if search_request.images:
             print(f"🔍 Converting {len(search_request.images)} base64 images...")
-            images = convert_base64_to_upload_files(search_request.images)
+            images = await convert_base64_to_upload_files(search_request.images)
 
         print(f"🔍 Searching with {len(images) if images else 0} images and description")
-        search_attrs = await extract_search_attributes(
+        search_attrs = await cancel_on_disconnect(request, extract_search_attributes(
             images=images,
             description=search_request.description
-        )
+        ))
 
         if not search_attrs:
             raise HTTPException(
@@ -394,24 +565,48 @@ async def search_sightings_with_image(
         print(f"🔍 Search attributes: {search_attrs}")
 
         search_embedding = None
+        search_embeddings = []
+        coarse_embedding = None
         if images:
-            print("🔢 Generating search embedding from image...")
-            search_embedding = await embedding_service.generate_embedding(search_request.images[0])
+            print(f"🔢 Generating search embeddings from {len(images)} images...")
+            photo_embeddings = await embedding_service.generate_image_embeddings(
+                [image.content for image in images]
+            )
+            search_embeddings = [
+                embeddings["full"] for embeddings in photo_embeddings
+                if embeddings["full"] is not None
+            ]
+            search_embedding = search_embeddings[0] if search_embeddings else None
+            coarse_embedding = photo_embeddings[0]["coarse"]
             if search_embedding is not None:
-                print(f"✅ Search embedding generated")
-
-        results = matching_service.find_matches_with_vectors(
-            db=db,
-            search_attributes=search_attrs,
-            search_embedding=search_embedding,
-            latitude=search_request.latitude,
-            longitude=search_request.longitude,
-            radius_km=search_request.radius,
-            limit=search_request.limit
+                print(f"✅ Search embeddings generated: {len(search_embeddings)}")
+
+        cache_key = search_cache.make_key(
+            search_attrs,
+            search_embeddings,
+            search_request.latitude,
+            search_request.longitude,
+            search_request.radius,
+            search_request.limit
         )
-
-        search_results = format_search_results(results)
-        print(f"✅ Found {len(search_results)} matches")
+        search_results = search_cache.get(cache_key)
+        if search_results is None:
+            results = matching_service.find_matches_with_vectors(
+                db=db,
+                search_attributes=search_attrs,
+                search_embedding=search_embedding,
+                latitude=search_request.latitude,
+                longitude=search_request.longitude,
+                radius_km=search_request.radius,
+                limit=search_request.limit,
+                coarse_embedding=coarse_embedding,
+                search_embeddings=search_embeddings
+            )
+            search_results = format_search_results(results)
+            search_cache.set(cache_key, search_results, search_request.latitude, search_request.longitude)
+            print(f"✅ Found {len(search_results)} matches")
+        else:
+            print(f"⚡ Cached search: {len(search_results)} matches")
 
         return SearchResponse(
             results=search_results,
@@ -419,7 +614,7 @@ async def search_sightings_with_image(
             total_results=len(search_results)
         )
 
-    except HTTPException:
+    except (HTTPException, LLMTimeoutError, OutboundOverloadedError):
         raise
     except Exception as e:
         print(f"❌ Error searching: {e}")
@@ -505,10 +700,14 @@ async def complete_draft_sighting(
         sighting.location_address = completion.location_address
         sighting.neighborhood = completion.neighborhood
         sighting.status = "active"
+        if sighting.attribute_bits is None:
+            sighting.attribute_bits = vocabulary_service.encode_attributes(sighting.attributes)
 
         db.commit()
         db.refresh(sighting)
 
+        matching_service.on_sighting_saved(sighting)
+
         print(f"✅ Draft sighting {sighting_id} completed and activated")
 
         return DogSightingResponse.from_orm_model(sighting)
@@ -548,6 +747,7 @@ async def get_recent_sightings(
     - Pagination with limit/offset
     """
     try:
+        # image_embedding is deferred on the model, so feed rows skip it
         query = db.query(DogSighting).filter(
             DogSighting.status == status_filter
         )
@@ -557,7 +757,7 @@ async def get_recent_sightings(
                 DogSighting.neighborhood.ilike(f"%{neighborhood}%")
             )
 
-        total = query.count()
+        total = query.with_entities(func.count(DogSighting.id)).scalar()
         sightings = query.order_by(
             DogSighting.created_at.desc()
         ).offset(offset).limit(limit).all()
@@ -591,7 +791,16 @@ async def get_map_sightings(db: Session = Depends(get_db)):
     Returns minimal data: location, photo, and description.
     """
     try:
-        sightings = db.query(DogSighting).filter(
+        # Only the columns the map needs (PostgreSQL arrays are 1-indexed)
+        sightings = db.query(
+            DogSighting.id,
+            DogSighting.latitude,
+            DogSighting.longitude,
+            DogSighting.image_urls[1].label("photo"),
+            DogSighting.user_description,
+            DogSighting.attributes,
+            DogSighting.created_at
+        ).filter(
             DogSighting.status == "active",
             DogSighting.latitude.isnot(None),
             DogSighting.longitude.isnot(None)
@@ -602,7 +811,7 @@ async def get_map_sightings(db: Session = Depends(get_db)):
                 "id": str(sighting.id),
                 "latitude": sighting.latitude,
                 "longitude": sighting.longitude,
-                "photo": sighting.image_urls[0] if sighting.image_urls else None,
+                "photo": sighting.photo,
                 "description": sighting.user_description or ", ".join(sighting.attributes[:3]) if sighting.attributes else "Perro encontrado",
                 "timestamp": sighting.created_at
             }